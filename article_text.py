@@ -0,0 +1,185 @@
+""" article_text.py
+
+    Plaintext of Wikipedia articles, read from the same html
+    the links are extracted from.
+
+    The BERT hopper needs, at every hop, the candidate links
+    of an article and its text. `get_links_and_text` gets
+    the html of the article once (see page_source.py) and
+    returns both: the links `extract_links_all` finds in it
+    (or in the link table and link index) and the article
+    text (headings, paragraphs and list items of the article
+    body, without references, tables, thumbnails or
+    navigation boxes), one sentence per line.
+
+    Caches storing only lead fragments (STORE_LEAD_FRAGMENTS)
+    keep the compressed text of each article alongside its
+    fragment (STORE_ARTICLE_TEXT), so the full text is still
+    served from them. Articles from a cache or dump index
+    storing fragments without their text, or downloaded in
+    "lead" fetch mode, only have the text of their lead: a
+    warning is printed once in these configurations.
+
+    Running this file prints the links and the first
+    sentences of test.html.
+"""
+
+from bs4 import BeautifulSoup
+
+from extraction import extract_links, extract_links_all
+from page_source import get_cache, get_dump, get_fetch_mode, get_page_html, get_page_text
+
+# elements of the article body that are not part of its text
+NON_TEXT_SELECTOR = ", ".join(
+    [
+        "style",
+        "script",
+        "table",
+        "figure",
+        "sup.reference",
+        "span.mw-editsection",
+        "div.thumb",
+        "div.hatnote",
+        "div.navbox",
+        "div.reflist",
+        "div.mw-references-wrap",
+        "ol.references",
+        ".noprint",
+        ".mw-empty-elt",
+    ]
+)
+
+# elements the text is read from, in document order
+TEXT_ELEMENTS = ["h2", "h3", "h4", "p", "li"]
+
+# the lead-only text warning was printed
+_WARNED_LEAD_ONLY = False
+
+
+def html_to_text(html: str, soup: BeautifulSoup = None) -> str:
+    """Return the plaintext of the article body of some html
+
+    soup: the html parsed with html.parser, to share one parse with
+          other readers (default: parsed here) (elements are removed
+          from it)
+
+    Headings are written as "== Heading ==" lines, like the
+    plaintext extracts of the Wikipedia API.
+    """
+
+    if soup is None:
+        soup = BeautifulSoup(html, "html.parser")
+
+    body = soup.find("div", class_="mw-parser-output") or soup
+    for element in body.select(NON_TEXT_SELECTOR):
+        element.decompose()
+
+    lines = []
+    for element in body.find_all(TEXT_ELEMENTS):
+        # the text of nested list items is in their parent item
+        if element.find_parent(["p", "li"]) is not None:
+            continue
+
+        text = " ".join(element.get_text().split())
+        if not text:
+            continue
+
+        if element.name in ("h2", "h3", "h4"):
+            marks = "=" * int(element.name[1])
+            text = f"{marks} {text} {marks}"
+
+        lines.append(text)
+
+    return "\n".join(lines)
+
+
+def split_sentences(text: str) -> str:
+    """Return a text with one sentence per line"""
+
+    import nltk
+
+    sentences = nltk.sent_tokenize(text)  # this gives us a list of sentences
+    return "\n".join(sentences)
+
+
+# =============================================================================
+# LINKS AND TEXT
+# =============================================================================
+
+
+def get_links_and_text(page_url: str, session=None, limit: int = None) -> tuple:
+    """
+    Get the links and the text of a Wikipedia article with a single fetch
+    page_url: url of the Wikipedia article
+    session: requests session used for downloads (optional)
+    limit: max number of links returned (None: all links found)
+
+    Returns:
+        (links, text): the (link, link_text) tuples of `extract_links_all`
+        and the text of the article, one sentence per line
+        ((None, None) if the article is not available)
+    """
+
+    html = get_page_html(page_url, session)
+    if html is None:
+        print(f"Extraction failed: no data (url: {page_url})")
+        return (None, None)
+
+    links = extract_links_all(page_url, session, limit, html)
+    if not isinstance(links, list):
+        return (None, None)
+
+    ### text stored with the lead fragment, or read from the html
+
+    text = get_page_text(page_url)
+    if text is None:
+        _warn_lead_only_text()
+        text = html_to_text(html)
+
+    return (links, split_sentences(text))
+
+
+def lead_only_text_reason() -> str:
+    """Return why the page source only has the text of the lead of
+    articles (None if it has their full text)"""
+
+    if get_fetch_mode() == "lead":
+        return 'FETCH_MODE = "lead" downloads the lead section only'
+
+    dump = get_dump()
+    if dump is not None:
+        return "the dump index stores lead fragments" if dump.lead_only else None
+
+    cache = get_cache()
+    if cache is not None and cache.lead_only and not cache.store_text:
+        return "the page cache stores lead fragments without STORE_ARTICLE_TEXT"
+
+    return None
+
+
+def _warn_lead_only_text() -> None:
+    global _WARNED_LEAD_ONLY
+
+    if _WARNED_LEAD_ONLY:
+        return
+
+    reason = lead_only_text_reason()
+    if reason is not None:
+        print(f"WARNING: article text is the text of the lead only ({reason})")
+        _WARNED_LEAD_ONLY = True
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+if __name__ == "__main__":
+    with open("test.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    text = html_to_text(html)
+
+    print(f"Links of test.html: {extract_links(html, 5)}")
+    print(f"Text of test.html ({len(text)} characters):")
+    for line in text.split("\n")[:5]:
+        print(f"    {line}")
@@ -0,0 +1,130 @@
+""" async_fetch.py
+
+    Asyncio fetch layer. Lets many traversals have their
+    Wikipedia requests in flight at the same time instead
+    of idling on round-trips one request at a time.
+
+    The blocking fetch functions of the project run on a
+    bounded pool of worker threads, sharing the pooled
+    session of http_client.py. At most `max_concurrency`
+    calls run at once and at most `HTTP_POOL_MAXSIZE`
+    connections are kept open to Wikipedia.
+
+    Usage:
+        fetcher = AsyncFetcher()
+        links = await fetcher.extract_links_all(url)
+        pageids = await fetcher.gather(
+            [fetcher.url_to_pageid(u) for u in urls]
+        )
+
+    Running this file extracts the links of a few articles
+    concurrently.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from config import FETCH_MAX_CONCURRENCY
+from http_client import get_session
+from helpers import url_to_pageid
+from extraction import extract_links_all
+from dataset_collection import get_random_pages
+
+
+# =============================================================================
+# ASYNC FETCHER
+# =============================================================================
+
+
+class AsyncFetcher:
+    """Runs the blocking fetch functions concurrently under a concurrency limit"""
+
+    def __init__(self, max_concurrency: int = FETCH_MAX_CONCURRENCY, session=None):
+        self.max_concurrency = max_concurrency
+
+        # bounded connection pool (shared with the rest of the process by default)
+        self.session = session if session is not None else get_session()
+
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = None
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking call in the worker pool, respecting the concurrency limit"""
+
+        # created lazily so that it is bound to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs)
+            )
+
+    async def gather(self, coros: list) -> list:
+        """Await a list of coroutines concurrently, results in order"""
+        return await asyncio.gather(*coros)
+
+    # ====================================================================================
+    # FETCHERS
+    # ====================================================================================
+
+    async def get(self, url: str, params: dict = None) -> requests.Response:
+        return await self.run(self.session.get, url, params=params)
+
+    async def url_to_pageid(self, wiki_url: str) -> str:
+        return await self.run(url_to_pageid, wiki_url, session=self.session)
+
+    async def extract_links_all(self, page_url: str, limit: int = None) -> list:
+        return await self.run(
+            extract_links_all, page_url, session=self.session, limit=limit
+        )
+
+    async def get_random_pages(self, n: int) -> list:
+        return await self.run(get_random_pages, n, session=self.session)
+
+    async def url_to_page_obj(self, url: str, link_i: int):
+        from philhopper import url_to_page_obj
+
+        return await self.run(url_to_page_obj, url, link_i, session=self.session)
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    from helpers import print_list_pretty
+
+    test_urls = [
+        "https://en.wikipedia.org/wiki/Science",
+        "https://en.wikipedia.org/wiki/Knowledge",
+        "https://en.wikipedia.org/wiki/Mathematics",
+        "https://en.wikipedia.org/wiki/Python_(programming_language)",
+    ]
+
+    async def test():
+        fetcher = AsyncFetcher()
+
+        start = time.time()
+        results = await fetcher.gather(
+            [fetcher.extract_links_all(url) for url in test_urls]
+        )
+        end = time.time()
+
+        for url, links in zip(test_urls, results):
+            print(f"\n{url}")
+            print_list_pretty(links[:5])
+
+        print(f"\nExtracted links of {len(test_urls)} articles in {end - start:.2f} seconds")
+        fetcher.close()
+
+    asyncio.run(test())
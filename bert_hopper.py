@@ -1,13 +1,11 @@
-import requests
-import wikipedia # wrapper around the Wikipedia API
-import nltk
 import os
 import csv
 
 from helpers import *
 from config import *
-from extraction import extract_links_all
+from article_text import get_links_and_text
 from dataset_collection import get_random_pages
+from http_client import get_session
 
 import csv
 
@@ -21,24 +19,6 @@ url_sim = url + '/similarity'
 
 N_LINKS = 20
 
-# ==================================================================================
-# EXTRACT
-# ==================================================================================
-
-def txt_of(page_name: str) -> str:
-    pn = reduce_full_url(encode_fix(page_name))
-    content = None
-    try: 
-        content = wikipedia.page(title=pn).content
-    except:
-        content = wikipedia.page(pageid=url_to_pageid(pn)).content
-    return content
-
-
-def postprocess_wiki_content(content: str) -> str:
-    sentences = nltk.sent_tokenize(content) # this gives us a list of sentences
-    return "\n".join(sentences)
-
 # ==================================================================================
 # SIMILARITY
 # ==================================================================================
@@ -50,7 +30,8 @@ def most_similar_to_phil(words: list, text: str) -> dict:
         ret = None
 
         for _ in range(max_tries):
-            r = requests.post(url_sim, json={'text': text, 'words': words})
+            # no read timeout: embedding a long article can take a while
+            r = get_session().post(url_sim, json={'text': text, 'words': words}, timeout=(HTTP_CONNECT_TIMEOUT, None))
             ret = r.json()
 
             if ret is not None:
@@ -91,19 +72,17 @@ def bert_hopper(start_url: str, verbose: int = 2) -> list:
 
     current_url = start_url
     for hop in range(MAX_HOPS):
-        # get list of urls of links from starting article
-        links = extract_links_all(current_url)[:N_LINKS]
-        words = [link[1].lower().strip() for link in links]
-
-        # get wiki article text (for BERT)
-        article_txt = txt_of(current_url)
+        # get list of urls of links and wiki article text (for BERT),
+        # from a single fetch of the article (see article_text.py)
+        links, article_txt = get_links_and_text(current_url, limit=N_LINKS)
         if article_txt is None:
             print(f"ERROR: Couldn't extract text from {current_url}")
             break
+        words = [link[1].lower().strip() for link in links]
+
         last_word = words[-1]
         last_occurrence = article_txt.rfind(last_word) # last occurrence of last_word in article
         article_txt = article_txt[:last_occurrence]
-        article_txt = postprocess_wiki_content(article_txt)
 
         # get most similar word to "Philosophy"
         sim = most_similar_to_phil(words, article_txt)
@@ -343,19 +322,17 @@ def bert_hopper_record(start_url: str, verbose: int = 2) -> list:
 
     current_url = start_url
     for hop in range(MAX_HOPS):
-        # get list of urls of links from starting article
-        links = extract_links_all(current_url)[:N_LINKS]
-        words = [link[1].lower().strip() for link in links]
-
-        # get wiki article text (for BERT)
-        article_txt = txt_of(current_url)
+        # get list of urls of links and wiki article text (for BERT),
+        # from a single fetch of the article (see article_text.py)
+        links, article_txt = get_links_and_text(current_url, limit=N_LINKS)
         if article_txt is None:
             print(f"ERROR: Couldn't extract text from {current_url}")
             break
+        words = [link[1].lower().strip() for link in links]
+
         last_word = words[-1]
         last_occurrence = article_txt.rfind(last_word) # last occurrence of last_word in article
         article_txt = article_txt[:last_occurrence]
-        article_txt = postprocess_wiki_content(article_txt)
 
         # get most similar word to "Philosophy"
         sim = most_similar_to_phil(words, article_txt)
@@ -0,0 +1,418 @@
+""" compare_extractors.py
+
+    Differential test harness of the link extractors.
+
+    Every extraction path (BeautifulSoup, streaming parser,
+    lxml, link index) must select exactly the links of the
+    original extractor, or hop counts silently change. The
+    reference is a verbatim copy of that extractor (with its
+    `parenthetic_contents` check), sharing no code with the
+    engines under test. This script runs the reference and
+    the engines over a corpus of
+    saved pages, with and without a link limit (the
+    streaming parser stops early when it has a limit), and
+    reports:
+        - every page where an engine returns other links,
+          with the first rank that differs
+        - the time of each engine on each page, and its
+          speedup over the reference
+
+    Corpora: test.html, the page cache, a dump index,
+    a directory of .html files.
+
+    Usage:
+        python compare_extractors.py [--cache [<db>]] [--dump <db>] [--dir <directory>]
+                                     [--engines <name> ...] [--pages <n>] [--runs <n>]
+    Without corpus option, test.html is compared.
+"""
+
+import argparse
+import collections
+import os
+import statistics
+import time
+
+from config import MAX_LINK_EXTRACT, PAGE_CACHE_PATH, PAGE_CACHE_MAX_BYTES
+from bs4 import BeautifulSoup
+
+from extraction import PARSER_BACKENDS, get_parser_backend
+
+# engine the others are compared to
+REFERENCE = "baseline"
+
+# link limits every page is extracted with
+LIMITS = (None, MAX_LINK_EXTRACT)
+
+# an engine returning other links than the reference
+Mismatch = collections.namedtuple(
+    "Mismatch", ["page", "engine", "limit", "rank", "expected", "found"]
+)
+
+
+# =============================================================================
+# REFERENCE
+# =============================================================================
+
+
+def parenthetic_contents(string: str):
+    """Generate parenthesized contents in string as pairs (level, contents)"""
+    stack = []
+    for i, c in enumerate(string):
+        if c == "(":
+            stack.append(i)
+        elif c == ")" and stack:
+            start = stack.pop()
+            yield (len(stack), string[start + 1 : i])
+
+
+def baseline_links_from_html(data: str, limit: int = None) -> list:
+    """The original extractor (`extract_links_all` of the first extraction.py),
+    on html instead of a url, as an engine
+
+    Kept verbatim: do not share code with extraction.py here.
+    """
+
+    soup = BeautifulSoup(data, "html.parser")
+
+    ### clean up the html
+
+    # remove thumbnails
+    for div in soup.find_all("div", {"class": "thumb"}):
+        div.decompose()
+    # remove sidebars
+    for div in soup.find_all("table", {"class": "sidebar"}):
+        div.decompose()
+    # remove all tables
+    for table in soup.find_all("table"):
+        table.decompose()
+    # remove notes at the top (class: hatnote)
+    for div in soup.find_all("div", {"class": "hatnote"}):
+        div.decompose()
+
+    ### find paragraphs in html
+
+    # find containers with classes specific classes
+    containers = soup.find_all(
+        "div", {"class": ["mw-parser-output", "mw-body-content", "vector-body"]}
+    )
+
+    if containers is None:
+        print(f"Extraction failed: no containers")
+        return (None, None, None)
+
+    # list of paragraphs inside containers
+    ps = []
+
+    for container in containers:
+        ps += container.find_all("p")
+
+    links = []
+
+    ### extract links from paragraphs
+
+    # look in first x paragraphs
+    max_paras = 3
+    x = max_paras if len(ps) > max_paras else len(ps)
+
+    for paragraph_n in range(0, x):
+        # get contents of parentheses
+        nested_paren_contents = list(parenthetic_contents(str(ps[paragraph_n])))
+        strs_in_paren = [
+            s[1] for s in nested_paren_contents
+        ]  # get second element of each tuple (level, contents)
+
+        # for all anchor tags inside the current paragraph
+        for a in ps[paragraph_n].find_all("a"):
+            if a.has_attr("href") and a["href"].startswith("/wiki/"):
+
+                # check if the anchor tag is inside parentheses
+                in_paren = False
+                for para in strs_in_paren:
+                    if str(a) in para:
+                        in_paren = True
+                        break
+
+                if not in_paren:
+                    links.append(a)
+
+    ### if no links found, try a different strategy
+
+    if len(links) == 0:
+        # try another link searching strategy:
+        # look for anchor tags that have an href attribute
+        # starting with 'wiki/' and are not inside parentheses
+        for a in soup.find_all("a"):
+            if a.has_attr("href") and a["href"].startswith("/wiki/"):
+                links.append(a)
+
+        # check for parentheses
+        nested_paren_contents = list(parenthetic_contents(str(soup)))
+        strs_in_paren = [s[1] for s in nested_paren_contents]
+
+        for a in links:
+            in_para = False
+            for para in strs_in_paren:
+                if str(a) in para:
+                    in_para = True
+                    break
+
+            if in_para:
+                links.remove(a)
+
+    ### little post-processing and cleanup
+    ret = [(a["href"], a.text.strip()) for a in links]
+    for l in ret:
+
+        # remove links that are not links to articles
+        if "wikipedia:" in l[0].lower(): # and "how?" in l[1].lower()
+            ret.remove(l)
+
+    ### done, return (link, link_text) tuples
+
+    return ret[:limit] if limit is not None else ret
+
+
+# =============================================================================
+# ENGINES
+# =============================================================================
+
+
+def _index_links_from_html(data: str, limit: int = None) -> list:
+    """The links of the link index (link_index.py) as an engine"""
+
+    from link_index import IndexedPage, index_html
+
+    return IndexedPage("", "", index_html(data)).link_tuples(limit)
+
+
+def get_engines(names: list = None) -> dict:
+    """Return the extraction functions of engines: name -> function(html, limit)
+
+    names: engines to load (None: every parser backend and the link index,
+           skipping the ones whose dependencies are missing)
+    """
+
+    available = list(PARSER_BACKENDS) + ["index"]
+
+    engines = {}
+    for name in names or available:
+        try:
+            if name == "index":
+                engines[name] = _index_links_from_html
+            else:
+                engines[name] = get_parser_backend(name)
+        except ImportError as e:
+            if names:
+                raise
+            print(f"Skipping engine {name}: {e}")
+
+    return engines
+
+
+def first_difference(expected, found) -> int:
+    """Return the first rank where two extraction results differ (None if equal)"""
+
+    if expected == found:
+        return None
+
+    if not isinstance(expected, list) or not isinstance(found, list):
+        return 0
+
+    for rank, (a, b) in enumerate(zip(expected, found)):
+        if a != b:
+            return rank
+
+    return min(len(expected), len(found))
+
+
+# =============================================================================
+# CORPORA
+# =============================================================================
+
+
+def iter_test_page(path: str = "test.html"):
+    """Iterate (name, html) of test.html"""
+
+    with open(path, "r", encoding="utf-8") as f:
+        yield (os.path.basename(path), f.read())
+
+
+def iter_directory_pages(directory: str):
+    """Iterate (name, html) of the .html files of a directory"""
+
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".html"):
+            with open(os.path.join(directory, file_name), "r", encoding="utf-8") as f:
+                yield (file_name, f.read())
+
+
+def iter_cache_pages(db_path: str = PAGE_CACHE_PATH):
+    """Iterate (title, html) of the articles of a page cache"""
+
+    from page_cache import PageCache
+
+    for _, title, html in PageCache(db_path, PAGE_CACHE_MAX_BYTES).iter_pages():
+        yield (title, html)
+
+
+def iter_dump_pages(db_path: str):
+    """Iterate (title, html) of the articles of a dump index"""
+
+    from wikidump import WikiDump
+
+    for _, title, html in WikiDump(db_path).iter_articles():
+        yield (title, html or "")
+
+
+# =============================================================================
+# COMPARISON
+# =============================================================================
+
+
+class ExtractorComparison:
+    """Runs engines against the reference extractor and collects the results"""
+
+    def __init__(self, engines: dict, limits: tuple = LIMITS, runs: int = 1):
+        """
+        engines: name -> extraction function(html, limit)
+        limits: link limits every page is extracted with
+        runs: extractions per page and engine (the fastest is timed)
+        """
+
+        self.engines = engines
+        self.limits = limits
+        self.runs = runs
+
+        self.n_pages = 0
+        self.mismatches = []
+        self.times = {name: [] for name in [REFERENCE] + list(engines)}  # seconds per page
+
+    def _timed(self, function, html: str, limit: int):
+        best = None
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            links = function(html, limit)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return links, best
+
+    def compare_page(self, name: str, html: str, verbose: bool = True) -> list:
+        """Compare the engines on one page, return its mismatches
+
+        verbose: print the page even if every engine agrees
+        """
+
+        self.n_pages += 1
+        page_times = collections.Counter()
+        mismatches = []
+
+        for limit in self.limits:
+            expected, elapsed = self._timed(baseline_links_from_html, html, limit)
+            page_times[REFERENCE] += elapsed
+
+            for engine, function in self.engines.items():
+                try:
+                    found, elapsed = self._timed(function, html, limit)
+                except Exception as e:
+                    found, elapsed = f"{type(e).__name__}: {e}", 0.0
+                page_times[engine] += elapsed
+
+                rank = first_difference(expected, found)
+                if rank is not None:
+                    mismatches.append(
+                        Mismatch(name, engine, limit, rank, _at(expected, rank), _at(found, rank))
+                    )
+
+        for engine, elapsed in page_times.items():
+            self.times[engine].append(elapsed)
+        self.mismatches += mismatches
+
+        if verbose or mismatches:
+            speedups = ", ".join(
+                f"{engine} x{_speedup(page_times[REFERENCE], page_times[engine]):.1f}"
+                for engine in self.engines
+            )
+            status = f"{len(mismatches)} MISMATCHES" if mismatches else "ok"
+            print(
+                f"[{status}] {name}: {page_times[REFERENCE] * 1000:.1f} ms ({speedups})"
+            )
+            for m in mismatches:
+                print(
+                    f"    {m.engine} (limit {m.limit}) rank {m.rank}: expected {m.expected}, found {m.found}"
+                )
+
+        return mismatches
+
+    def run(self, pages, max_pages: int = None, verbose: bool = True) -> None:
+        """Compare the engines on a stream of (name, html) pages"""
+
+        for name, html in pages:
+            if max_pages is not None and self.n_pages >= max_pages:
+                break
+            self.compare_page(name, html, verbose)
+
+    def print_report(self):
+        print("Extractor comparison:")
+        print(f"    pages = {self.n_pages}")
+        print(f"    limits = {list(self.limits)}")
+
+        reference_total = sum(self.times[REFERENCE])
+        print(f"    {REFERENCE} (reference): {reference_total:.2f} s")
+
+        for engine in self.engines:
+            total = sum(self.times[engine])
+            n_mismatches = len({m.page for m in self.mismatches if m.engine == engine})
+            per_page = [
+                _speedup(r, t) for r, t in zip(self.times[REFERENCE], self.times[engine])
+            ]
+            median = statistics.median(per_page) if per_page else 0.0
+            print(
+                f"    {engine}: {total:.2f} s, x{_speedup(reference_total, total):.1f} overall,"
+                f" x{median:.1f} median per page, {n_mismatches} mismatching pages"
+            )
+
+
+def _at(links, rank: int):
+    """The link at a rank of an extraction result (the result itself if not a list)"""
+
+    if not isinstance(links, list):
+        return links
+
+    return links[rank] if rank < len(links) else None
+
+
+def _speedup(reference_time: float, engine_time: float) -> float:
+    return reference_time / engine_time if engine_time > 0 else float("inf")
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2].strip())
+    parser.add_argument("--cache", nargs="?", const=PAGE_CACHE_PATH, help="page cache db")
+    parser.add_argument("--dump", help="dump index db")
+    parser.add_argument("--dir", help="directory of .html files")
+    parser.add_argument("--engines", nargs="+", help="engines compared to the reference")
+    parser.add_argument("--pages", type=int, help="max number of pages")
+    parser.add_argument("--runs", type=int, default=1, help="extractions per page, fastest timed")
+    parser.add_argument("--quiet", action="store_true", help="print mismatching pages only")
+    args = parser.parse_args()
+
+    corpora = []
+    if args.cache:
+        corpora.append(iter_cache_pages(args.cache))
+    if args.dump:
+        corpora.append(iter_dump_pages(args.dump))
+    if args.dir:
+        corpora.append(iter_directory_pages(args.dir))
+    if not corpora:
+        corpora.append(iter_test_page())
+
+    comparison = ExtractorComparison(get_engines(args.engines), runs=args.runs)
+    for pages in corpora:
+        comparison.run(pages, args.pages, verbose=not args.quiet)
+
+    comparison.print_report()
@@ -19,6 +19,94 @@ N = 15
 
 DEFAULT_SQLITE_DB_NAME = "traversal_tree.db"
 
+# memo of finished chains: traversals stop at the first known page
+# (see dao.py) (None: walk every chain to its end)
+HOP_MEMO_DB_PATH = "hop_memo.db"
+
+# link graph of the shortest hop counts reported next to the strategies
+# (see optimal_hops.py): .npz, link table or link index (None: not reported)
+OPTIMAL_HOPS_GRAPH_PATH = None
+
+# link graph of the exact outcome of the RANDOM strategy, solved instead
+# of sampled (see random_walk.py) (None: not reported)
+RANDOM_WALK_GRAPH_PATH = None
+RANDOM_WALK_SOLVER = "iterative"  # "iterative" (GMRES) or "direct" (sparse LU, small graphs)
+
+# SQLite index of a local Wikipedia dump (see wikidump.py)
+DEFAULT_DUMP_DB_NAME = "wikidump.db"
+
+# serve article html from this dump index instead of the live site
+# (None: fetch articles from Wikipedia)
+WIKI_DUMP_DB_PATH = None
+
+# precomputed first links of the articles of a dump (see link_table.py)
+DEFAULT_LINK_TABLE_NAME = "link_table.db"
+
+# answer link extractions from this link table instead of parsing html
+# (None: extract links from the html of the articles)
+LINK_TABLE_PATH = None
+
+# multi-process link extraction over dumps and caches (see extraction_pool.py)
+EXTRACTION_PROCESSES = None  # worker processes (None: one per core)
+EXTRACTION_CHUNK_SIZE = 64  # pages sent to a worker at a time
+EXTRACTION_CHUNKS_IN_FLIGHT = None  # max chunks queued (None: two per worker)
+
+# on-disk cache of article html shared by all extractors (see page_cache.py)
+# (None: no cache)
+PAGE_CACHE_PATH = "page_cache.db"
+PAGE_CACHE_MAX_BYTES = 2 * 1024**3  # 2 GB, least recently used pages are evicted
+PAGE_CACHE_ONLY = False  # never download, serve cached pages only
+PAGE_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds, older pages are revalidated (None: never)
+PAGE_CACHE_ACCESS_GRANULARITY = 3600  # seconds, last access times are updated at most this often
+
+# store only the compressed lead fragment of articles in the page cache
+# and in dump indexes, ~100x smaller than the full html (see lead_fragment.py)
+# (costs a full parse of every stored article)
+STORE_LEAD_FRAGMENTS = False
+
+# with lead fragments, also keep the compressed plaintext of articles
+# in the page cache, for the BERT hopper (see article_text.py)
+STORE_ARTICLE_TEXT = False
+
+# html parser backend of the link extraction (see extraction.py):
+#   "html.parser": reference BeautifulSoup extractor
+#   "stream": early-terminating streaming parser (stream_extraction.py)
+#   "lxml": C-accelerated parser, needs lxml (lxml_extraction.py)
+PARSER_BACKEND = "stream"
+
+# ranked links of each page revision, shared by all strategies
+# (see link_index.py) (None: parse pages at every extraction, with
+# PARSER_BACKEND and its early stop at the link limit)
+LINK_INDEX_PATH = None
+LINK_INDEX_MEMORY_SIZE = 10000  # pages kept in memory
+
+# how articles are downloaded (see page_source.py):
+#   "full": the whole rendered article page
+#   "lead": only the rendered lead section (action=parse&section=0)
+FETCH_MODE = "full"
+
+# shared HTTP client (see http_client.py)
+HTTP_CONNECT_TIMEOUT = 5  # seconds
+HTTP_READ_TIMEOUT = 30  # seconds
+HTTP_POOL_CONNECTIONS = 4  # number of hosts with pooled connections
+HTTP_POOL_MAXSIZE = 16  # max number of open connections per host
+HTTP_USER_AGENT = "HOP-research/1.0 (https://github.com/Arotte/HOP)"
+HTTP_MAX_RETRIES = 5  # retries of a throttled (429/503) request
+
+# adaptive (AIMD) concurrency limit of requests to Wikipedia (see rate_control.py)
+RATE_LIMITED_HOSTS = ("wikipedia.org",)
+RATE_LIMIT_INITIAL = 4  # requests in flight at start
+RATE_LIMIT_MIN = 1
+RATE_LIMIT_MAX = 32
+RATE_LIMIT_TARGET_LATENCY = 2.0  # seconds, slower responses reduce the limit
+RATE_LIMIT_CEILING_RECOVERY = 60.0  # seconds without throttling before probing above the last throttled limit again
+
+# persistent title -> pageid/redirect resolution table (see title_resolver.py)
+TITLE_RESOLUTION_DB_PATH = "title_resolution.db"
+
+# asyncio fetch layer (see async_fetch.py)
+FETCH_MAX_CONCURRENCY = 8  # max number of requests in flight
+
 
 # =============================================================================
 
@@ -31,4 +119,37 @@ def print_config():
     print(f"    PHIL_WORD = {PHIL_WORD}")
     print(f"    MAX_HOPS = {MAX_HOPS}")
     print(f"    N = {N}")
-    print(f"    DEFAULT_SQLITE_DB_NAME = {DEFAULT_SQLITE_DB_NAME}")
\ No newline at end of file
+    print(f"    DEFAULT_SQLITE_DB_NAME = {DEFAULT_SQLITE_DB_NAME}")
+    print(f"    HOP_MEMO_DB_PATH = {HOP_MEMO_DB_PATH}")
+    print(f"    OPTIMAL_HOPS_GRAPH_PATH = {OPTIMAL_HOPS_GRAPH_PATH}")
+    print(f"    RANDOM_WALK_GRAPH_PATH = {RANDOM_WALK_GRAPH_PATH}")
+    print(f"    RANDOM_WALK_SOLVER = {RANDOM_WALK_SOLVER}")
+    print(f"    WIKI_DUMP_DB_PATH = {WIKI_DUMP_DB_PATH}")
+    print(f"    LINK_TABLE_PATH = {LINK_TABLE_PATH}")
+    print(f"    EXTRACTION_PROCESSES = {EXTRACTION_PROCESSES}")
+    print(f"    EXTRACTION_CHUNK_SIZE = {EXTRACTION_CHUNK_SIZE}")
+    print(f"    EXTRACTION_CHUNKS_IN_FLIGHT = {EXTRACTION_CHUNKS_IN_FLIGHT}")
+    print(f"    PAGE_CACHE_PATH = {PAGE_CACHE_PATH}")
+    print(f"    PAGE_CACHE_MAX_BYTES = {PAGE_CACHE_MAX_BYTES}")
+    print(f"    PAGE_CACHE_ONLY = {PAGE_CACHE_ONLY}")
+    print(f"    PAGE_CACHE_MAX_AGE = {PAGE_CACHE_MAX_AGE}")
+    print(f"    PAGE_CACHE_ACCESS_GRANULARITY = {PAGE_CACHE_ACCESS_GRANULARITY}")
+    print(f"    STORE_LEAD_FRAGMENTS = {STORE_LEAD_FRAGMENTS}")
+    print(f"    STORE_ARTICLE_TEXT = {STORE_ARTICLE_TEXT}")
+    print(f"    PARSER_BACKEND = {PARSER_BACKEND}")
+    print(f"    LINK_INDEX_PATH = {LINK_INDEX_PATH}")
+    print(f"    LINK_INDEX_MEMORY_SIZE = {LINK_INDEX_MEMORY_SIZE}")
+    print(f"    FETCH_MODE = {FETCH_MODE}")
+    print(f"    HTTP_CONNECT_TIMEOUT = {HTTP_CONNECT_TIMEOUT}")
+    print(f"    HTTP_READ_TIMEOUT = {HTTP_READ_TIMEOUT}")
+    print(f"    HTTP_POOL_CONNECTIONS = {HTTP_POOL_CONNECTIONS}")
+    print(f"    HTTP_POOL_MAXSIZE = {HTTP_POOL_MAXSIZE}")
+    print(f"    HTTP_MAX_RETRIES = {HTTP_MAX_RETRIES}")
+    print(f"    RATE_LIMITED_HOSTS = {RATE_LIMITED_HOSTS}")
+    print(f"    RATE_LIMIT_INITIAL = {RATE_LIMIT_INITIAL}")
+    print(f"    RATE_LIMIT_MIN = {RATE_LIMIT_MIN}")
+    print(f"    RATE_LIMIT_MAX = {RATE_LIMIT_MAX}")
+    print(f"    RATE_LIMIT_TARGET_LATENCY = {RATE_LIMIT_TARGET_LATENCY}")
+    print(f"    RATE_LIMIT_CEILING_RECOVERY = {RATE_LIMIT_CEILING_RECOVERY}")
+    print(f"    TITLE_RESOLUTION_DB_PATH = {TITLE_RESOLUTION_DB_PATH}")
+    print(f"    FETCH_MAX_CONCURRENCY = {FETCH_MAX_CONCURRENCY}")
\ No newline at end of file
@@ -3,13 +3,50 @@
     Data Access Object. Used to access and interact
     with the SQLite3 database of the project.
 
-    
+    Besides the traversal tree, the database holds the hop
+    memo: for every page a traversal went through, the link
+    it followed, its distance to the end of the chain and
+    how the chain ended, per selection strategy and link i.
+    A traversal reaching a known page stops there and
+    splices in the stored remainder.
+
+    Memoized pages are keyed by the configuration their links
+    were extracted with (link and page source, fetch mode,
+    link limit, as active at runtime), and carry the revision
+    of the page they were read from, as already known locally
+    (link index, dump, page cache or title resolver): no page
+    is downloaded for the memo. A page whose known revision
+    changed since is forgotten when a traversal reaches it.
 """
 
+import collections
 import sqlite3
 import os
+import threading
 
-from config import WIKI_PAGEID_OF_PHILOSOPHY
+from config import (
+    WIKI_PAGEID_OF_PHILOSOPHY,
+    WIKI_URL_OF_PHILOSOPHY,
+    HOP_MEMO_DB_PATH,
+    LINK_INDEX_PATH,
+    LINK_TABLE_PATH,
+    MAX_LINK_EXTRACT,
+)
+from helpers import check_url, normalize_title
+
+# how a memoized chain ends
+OUTCOME_PHILOSOPHY = "philosophy"
+OUTCOME_CYCLE = "cycle"
+
+# a memoized page: the link followed from it, and the end of its chain
+# (distance: hops to Philosophy, or at most that many hops to a cycle)
+HopMemo = collections.namedtuple(
+    "HopMemo",
+    ["title", "strategy", "i", "pageid", "fullurl", "next_url", "distance", "outcome", "source", "revision"],
+)
+
+_MEMO_DAO = None
+_MEMO_DAO_LOCK = threading.Lock()
 
 
 class Page:
@@ -91,6 +128,30 @@ class TreeDao:
         )"""
         )
 
+        # memos written before they were keyed by source are dropped
+        c.execute("PRAGMA table_info(hop_memo)")
+        columns = [row[1] for row in c.fetchall()]
+        if columns and "source" not in columns:
+            c.execute("DROP TABLE hop_memo")
+
+        # pages of finished chains, per selection strategy, link i and
+        # extraction configuration
+        c.execute(
+            """CREATE TABLE IF NOT EXISTS hop_memo (
+            title TEXT,
+            strategy TEXT,
+            i INTEGER,
+            pageid INTEGER,
+            fullurl TEXT,
+            next_url TEXT,
+            distance INTEGER,
+            outcome TEXT,
+            source TEXT,
+            revision TEXT,
+            PRIMARY KEY (title, strategy, i, source)
+        )"""
+        )
+
         # insert the root node Philosophy if not exists
         if self.get_philosophy() is None:
             c.execute(
@@ -217,6 +278,124 @@ class TreeDao:
         self.c.execute("SELECT COUNT(*) FROM traversal_tree")
         return self.c.fetchone()[0]
 
+    # ====================================================================================
+    # HOP MEMO
+    # ====================================================================================
+
+    def record_chain(
+        self,
+        strategy: str,
+        i: int,
+        urls: list,
+        outcome: str,
+        pages: list = None,
+        rest: int = None,
+    ) -> int:
+        """Memoize a finished chain
+
+        strategy: name of the selection strategy
+        i: link i of the strategy (0 if it has none)
+        urls: urls of the pages of the chain, as reached: the start url, then
+              each link followed (ending with Philosophy, or with the page
+              that closed the cycle)
+        outcome: OUTCOME_PHILOSOPHY or OUTCOME_CYCLE
+        pages: (pageid, fullurl) of each page of the chain (optional)
+        rest: distance of the last url, when the chain ends at a memoized page
+
+        Returns the number of pages memoized.
+        """
+
+        n = len(urls) - 1
+        source = memo_source()
+
+        if rest is None:
+            # a cycle closes within the rest of the chain and one more turn
+            rest = 0 if outcome == OUTCOME_PHILOSOPHY else n
+
+        rows = []
+        for k in range(n):
+            distance = (n - k) + rest
+
+            # pages whose revision is not known are not memoized
+            revision = known_revision(urls[k])
+            if revision is None:
+                continue
+
+            pageid, fullurl = pages[k] if pages is not None else (None, None)
+            rows.append(
+                (normalize_title(urls[k]), strategy, i, pageid, fullurl, urls[k + 1], distance, outcome, source, revision)
+            )
+
+        self.c.executemany(
+            "INSERT OR IGNORE INTO hop_memo (title, strategy, i, pageid, fullurl, next_url, distance, outcome, source, revision) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+
+        return len(rows)
+
+    def get_memo(self, url: str, strategy: str, i: int, validate: bool = True) -> HopMemo:
+        """Return the memoized page behind a url (None if not memoized with
+        the current extraction configuration, or for another revision)
+
+        validate: check the revision of the page (see `known_revision`)
+        """
+
+        title = normalize_title(url)
+        source = memo_source()
+
+        self.c.execute(
+            "SELECT title, strategy, i, pageid, fullurl, next_url, distance, outcome, source, revision FROM hop_memo WHERE title = ? AND strategy = ? AND i = ? AND source = ?",
+            (title, strategy, i, source),
+        )
+        result = self.c.fetchone()
+        if result is None:
+            return None
+
+        memo = HopMemo(*result)
+
+        # the page changed since: its link may have changed too
+        if validate and known_revision(url) != memo.revision:
+            self.c.execute(
+                "DELETE FROM hop_memo WHERE title = ? AND strategy = ? AND i = ? AND source = ?",
+                (title, strategy, i, source),
+            )
+            self.conn.commit()
+            return None
+
+        return memo
+
+    def memo_chain(self, url: str, strategy: str, i: int, max_len: int = None) -> list:
+        """Return the memoized pages of the chain from a url to Philosophy
+        (the page itself first, at most `max_len` pages)
+
+        Only the page reached is validated: the pages of the rest of the
+        chain are validated when a traversal reaches them.
+        """
+
+        chain = []
+        memo = self.get_memo(url, strategy, i)
+        while memo is not None and (max_len is None or len(chain) < max_len):
+            chain.append(memo)
+            if memo.next_url == WIKI_URL_OF_PHILOSOPHY:
+                break
+            memo = self.get_memo(memo.next_url, strategy, i, validate=False)
+
+        return chain
+
+    def clear_memo(self, strategy: str = None) -> None:
+        """Forget the memoized chains (of one strategy, or all)"""
+
+        if strategy is None:
+            self.c.execute("DELETE FROM hop_memo")
+        else:
+            self.c.execute("DELETE FROM hop_memo WHERE strategy = ?", (strategy,))
+        self.conn.commit()
+
+    def memo_count(self) -> int:
+        self.c.execute("SELECT COUNT(*) FROM hop_memo")
+        return self.c.fetchone()[0]
+
     # ====================================================================================
     # MISC
     # ====================================================================================
@@ -241,3 +420,85 @@ class TreeDao:
         )
 
         self.conn.commit()
+
+
+# =============================================================================
+# SHARED HOP MEMO
+# =============================================================================
+
+
+def memo_source() -> str:
+    """Return the extraction configuration memoized links are valid for,
+    as active at runtime (see `use_dump`, `use_cache` and `use_fetch_mode`
+    in page_source.py)
+
+    Parser backends are left out: they all return the same links.
+    """
+
+    from page_source import get_cache_only, get_dump_path, get_fetch_mode
+
+    if LINK_TABLE_PATH is not None:
+        links = "table"
+    elif LINK_INDEX_PATH is not None:
+        links = "index"
+    else:
+        links = "html"
+
+    dump_path = get_dump_path()
+    if dump_path is not None:
+        pages = "dump:" + os.path.abspath(dump_path)
+    elif get_cache_only():
+        pages = "cache"
+    else:
+        pages = "live"
+
+    return f"{links}/{pages}/{get_fetch_mode()}/{MAX_LINK_EXTRACT}"
+
+
+def known_revision(url: str) -> str:
+    """Return the revision of a page as already known locally, without
+    downloading it (None if it is not known)
+
+    The revision the links of the page were indexed at comes first, then
+    the one of its html in the dump or the page cache, then the latest
+    revision recorded by the title resolver.
+    """
+
+    from link_index import get_link_index, revision_of
+    from page_source import get_local_page_html
+    from title_resolver import get_resolver
+
+    # memoized chains hold hrefs as found in the pages ("/wiki/...")
+    url = check_url(url)
+
+    index = get_link_index()
+    if index is not None:
+        revision = index.known_revision(url)
+        if revision is not None:
+            return revision
+
+    html = get_local_page_html(url)
+    if html is not None:
+        return revision_of(html)
+
+    resolution = get_resolver().known(url)
+    if resolution is not None and resolution.lastrevid is not None:
+        return str(resolution.lastrevid)
+
+    return None
+
+
+def get_memo_dao() -> TreeDao:
+    """Return the database holding the hop memo (None if memoization is disabled)"""
+
+    global _MEMO_DAO
+
+    if HOP_MEMO_DB_PATH is None:
+        return None
+
+    if _MEMO_DAO is None:
+        with _MEMO_DAO_LOCK:
+            if _MEMO_DAO is None:
+                _MEMO_DAO = TreeDao(HOP_MEMO_DB_PATH)
+
+    return _MEMO_DAO
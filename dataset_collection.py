@@ -1,16 +1,14 @@
-import tqdm
-import requests
-
-from config import WIKIPEDIA_API_BASE_URL, MAX_LINK_EXTRACT
+from config import MAX_LINK_EXTRACT
 
 from helpers import *
+from wiki_api import get_random_page_infos
 
 # =============================================================================
 # GET RANDOM WIKI ARTICLES
 # =============================================================================
 
 
-def get_random_pages(n: int) -> list:
+def get_random_pages(n: int, session=None) -> list:
     print(f"\nGetting {n} random Wikipedia pages...")
 
     ### checks
@@ -18,46 +16,17 @@ def get_random_pages(n: int) -> list:
     if n < 1 or n > 500:  # how many random pages to get
         raise ValueError("n must be between 1 and 500")
 
-    ### get random pages via Wikipedia API
+    ### get random pages and their info via Wikipedia API (batched)
 
-    PARAMS = {
-        "action": "query",
-        "format": "json",
-        "list": "random",
-        "rnlimit": str(n),
-        "rnnamespace": "0",
-    }
-    S = requests.Session()
-    R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-    DATA = R.json()
-    RANDOMS = DATA["query"]["random"]
+    RANDOMS = get_random_page_infos(n, session)
 
     ### extract info from the pages
 
-    print(f"Extracting data from {n} random Wikipedia pages")
-
     PAGES = []
-    for r in tqdm.tqdm(RANDOMS):
+    for r in RANDOMS:
         page_title = r["title"]
-        page_id = r["id"]
-
-        # get full url of each page
-
-        PARAMS = {
-            "action": "query",
-            "format": "json",
-            "prop": "info",
-            "inprop": "url",
-            "pageids": page_id,
-        }
-
-        S = requests.Session()
-        R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-        DATA = R.json()
-
-        page_url = DATA["query"]["pages"][str(page_id)]["fullurl"]
-        page_title_from_url = page_url.split("/")[-1]
-        page_lang = DATA["query"]["pages"][str(page_id)]["pagelanguage"]
+        page_url = r.get("fullurl")
+        page_lang = r.get("pagelanguage")
 
         if page_lang != "en":
             continue
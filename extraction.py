@@ -5,6 +5,23 @@
 
     Return a list of tuples (link, link_text).
 
+    With a link index (`LINK_INDEX_PATH` in config.py) each
+    page revision is parsed once, and its links are read
+    from the index afterwards (see link_index.py). With a
+    precomputed link table (`LINK_TABLE_PATH`), the links of
+    the articles of a dump are read from the table, without
+    any html (see link_table.py).
+
+    The html is parsed by a pluggable backend, chosen with
+    `PARSER_BACKEND` (config.py) or `use_parser_backend` at
+    runtime. All backends return the same links:
+        - "html.parser": the reference BeautifulSoup
+          extractor of this file
+        - "stream": early-terminating streaming parser
+          (see stream_extraction.py)
+        - "lxml": C-accelerated parser, needs lxml
+          (see lxml_extraction.py)
+
     Running this file will print the links extracted
     from the article "Python (programming language)".
 
@@ -13,28 +30,151 @@
     Last modified: 2021-11-08
 """
 
-import requests
+import importlib
+
 from bs4 import BeautifulSoup
 
-from helpers import parenthetic_contents
+from config import PARSER_BACKEND, LINK_INDEX_PATH, LINK_TABLE_PATH
+from helpers import anchors_in_parentheses, normalize_title
+from page_source import get_page_html
+from singleflight import SingleFlight
+
+# number of leading paragraphs links are extracted from
+MAX_PARAGRAPHS = 3
+
+# link extraction backends: name -> "module:function", the function
+# taking the html of an article and a max number of links
+PARSER_BACKENDS = {
+    "html.parser": "extraction:reference_links_from_html",
+    "stream": "stream_extraction:stream_links_from_html",
+    "lxml": "lxml_extraction:lxml_links_from_html",
+}
+
+# the backend in use
+_BACKEND = PARSER_BACKEND
+
+# concurrent extractions of the same article share one download and parse
+_EXTRACTIONS = SingleFlight()
+
+
+def use_parser_backend(name: str) -> None:
+    """Extract links with the backend `name` (see PARSER_BACKENDS)"""
+
+    global _BACKEND
+
+    get_parser_backend(name)  # fail early if it is not available
+    _BACKEND = name
+
+
+def current_parser_backend() -> str:
+    """Return the name of the backend in use"""
+    return _BACKEND
+
 
+def get_parser_backend(name: str = None):
+    """Return the extraction function of a backend (default: the one in use)"""
 
-def extract_links_all(page_url: str) -> list:
+    if name is None:
+        name = _BACKEND
+
+    if name not in PARSER_BACKENDS:
+        raise ValueError(
+            f"Unknown parser backend: {name} (expected one of {list(PARSER_BACKENDS)})"
+        )
+
+    module_name, function_name = PARSER_BACKENDS[name].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def extract_links(data: str, limit: int = None, backend: str = None) -> list:
+    """
+    Extract the links of a Wikipedia article from its html
+    data: html of the Wikipedia article
+    limit: max number of links returned (None: all links found)
+    backend: parser backend (default: the one in use)
+    """
+
+    return get_parser_backend(backend)(data, limit)
+
+
+def extract_links_all(page_url: str, session=None, limit: int = None, html: str = None) -> list:
     """
     Extract first N links from the description of a Wikipedia article
     page_url: url of the Wikipedia article
-    i: the i-th link to extract
+    session: requests session used for downloads (optional)
+    limit: max number of links returned (None: all links found)
+    html: html of the article, when the caller already has it
+          (default: read from the page source)
     """
 
-    ### retrieve page html
+    links = _EXTRACTIONS.do(
+        (normalize_title(page_url), limit),
+        _extract_links_all,
+        page_url,
+        session,
+        limit,
+        html,
+    )
+
+    # every caller gets its own copy of the shared list
+    if isinstance(links, list):
+        links = list(links)
+
+    return links
 
-    data = requests.get(page_url).text
+
+def _extract_links_all(page_url: str, session=None, limit: int = None, html: str = None) -> list:
+
+    ### links precomputed from a dump
+
+    if LINK_TABLE_PATH is not None:
+        from link_table import get_link_table
+
+        links = get_link_table().links_of(page_url)
+        if links is not None:
+            return links[:limit] if limit is not None else links
+
+    ### links already indexed for this page revision
+
+    if LINK_INDEX_PATH is not None:
+        from link_index import indexed_page
+
+        page = indexed_page(page_url, session, html)
+        if page is None:
+            print(f"Extraction failed: no data (url: {page_url})")
+            return (None, None, None)
+
+        return page.link_tuples(limit)
+
+    ### retrieve page html (live site or local dump, see page_source.py)
+
+    data = html if html is not None else get_page_html(page_url, session)
 
     # check data
     if data is None:
         print(f"Extraction failed: no data (url: {page_url})")
         return (None, None, None)
 
+    return extract_links(data, limit)
+
+
+def reference_links_from_html(data: str, limit: int = None) -> list:
+    """`extract_links_from_html` as a parser backend"""
+
+    links = extract_links_from_html(data)
+    if limit is not None and isinstance(links, list):
+        links = links[:limit]
+
+    return links
+
+
+def clean_soup(data: str) -> BeautifulSoup:
+    """
+    Parse the HTML of a Wikipedia article and remove the parts
+    that never hold links to follow (thumbnails, tables, notes)
+    data: html of the Wikipedia article
+    """
+
     soup = BeautifulSoup(data, "html.parser")
 
     ### clean up the html
@@ -52,7 +192,14 @@ def extract_links_all(page_url: str) -> list:
     for div in soup.find_all("div", {"class": "hatnote"}):
         div.decompose()
 
-    ### find paragraphs in html
+    return soup
+
+
+def find_paragraphs(soup: BeautifulSoup) -> list:
+    """
+    Return the paragraphs of the article containers of a cleaned soup,
+    in the order the extractor reads them (None if there are no containers)
+    """
 
     # find containers with classes specific classes
     containers = soup.find_all(
@@ -60,8 +207,7 @@ def extract_links_all(page_url: str) -> list:
     )
 
     if containers is None:
-        print(f"Extraction failed: no containers")
-        return (None, None, None)
+        return None
 
     # list of paragraphs inside containers
     ps = []
@@ -69,61 +215,118 @@ def extract_links_all(page_url: str) -> list:
     for container in containers:
         ps += container.find_all("p")
 
+    return ps
+
+
+def extract_links_from_html(data: str) -> list:
+    """
+    Extract first N links from the HTML of a Wikipedia article
+    data: html of the Wikipedia article
+    """
+
+    soup = clean_soup(data)
+
+    ### find paragraphs in html
+
+    ps = find_paragraphs(soup)
+
+    if ps is None:
+        print(f"Extraction failed: no containers")
+        return (None, None, None)
+
     links = []
 
     ### extract links from paragraphs
 
     # look in first x paragraphs
-    max_paras = 3
+    max_paras = MAX_PARAGRAPHS
     x = max_paras if len(ps) > max_paras else len(ps)
 
     for paragraph_n in range(0, x):
-        # get contents of parentheses
-        nested_paren_contents = list(parenthetic_contents(str(ps[paragraph_n])))
-        strs_in_paren = [
-            s[1] for s in nested_paren_contents
-        ]  # get second element of each tuple (level, contents)
-
-        # for all anchor tags inside the current paragraph
-        for a in ps[paragraph_n].find_all("a"):
-            if a.has_attr("href") and a["href"].startswith("/wiki/"):
-
-                # check if the anchor tag is inside parentheses
-                in_paren = False
-                for para in strs_in_paren:
-                    if str(a) in para:
-                        in_paren = True
-                        break
-
-                if not in_paren:
-                    links.append(a)
+        links += paragraph_links(ps[paragraph_n])
 
     ### if no links found, try a different strategy
 
     if len(links) == 0:
-        # try another link searching strategy:
-        # look for anchor tags that have an href attribute
-        # starting with 'wiki/' and are not inside parentheses
-        for a in soup.find_all("a"):
-            if a.has_attr("href") and a["href"].startswith("/wiki/"):
-                links.append(a)
-
-        # check for parentheses
-        nested_paren_contents = list(parenthetic_contents(str(soup)))
-        strs_in_paren = [s[1] for s in nested_paren_contents]
-
-        for a in links:
-            in_para = False
-            for para in strs_in_paren:
-                if str(a) in para:
-                    in_para = True
-                    break
-
-            if in_para:
-                links.remove(a)
-
-    ### little post-processing and cleanup
-    ret = [(a["href"], a.text.strip()) for a in links]
+        links = fallback_links(soup)
+
+    ### little post-processing and cleanup, done
+
+    return link_tuples(links)
+
+
+def fallback_links(soup: BeautifulSoup) -> list:
+    """
+    Return the anchor tags of a whole cleaned page linking to articles
+    that are not inside parentheses (used when the first paragraphs
+    have no links)
+    """
+
+    links = []
+
+    # try another link searching strategy:
+    # look for anchor tags that have an href attribute
+    # starting with 'wiki/' and are not inside parentheses
+    for a in soup.find_all("a"):
+        if a.has_attr("href") and a["href"].startswith("/wiki/"):
+            links.append(a)
+
+    # check for parentheses
+    html_of = {id(a): str(a) for a in links}
+    in_paren = anchors_in_parentheses(str(soup), html_of.values())
+
+    for a in links:
+        in_para = html_of[id(a)] in in_paren
+
+        if in_para:
+            links.remove(a)
+
+    return links
+
+
+def paragraph_anchors(paragraph) -> list:
+    """
+    Return (anchor tag, in parentheses) for the anchor tags
+    of a paragraph linking to articles
+    """
+
+    # anchor tags inside the current paragraph linking to articles
+    anchors = [
+        a
+        for a in paragraph.find_all("a")
+        if a.has_attr("href") and a["href"].startswith("/wiki/")
+    ]
+    html_of = {id(a): str(a) for a in anchors}
+
+    # check if the anchor tags are inside parentheses
+    in_paren = anchors_in_parentheses(str(paragraph), html_of.values())
+
+    return [(a, html_of[id(a)] in in_paren) for a in anchors]
+
+
+def paragraph_links(paragraph) -> list:
+    """
+    Return the anchor tags of a paragraph linking to articles
+    that are not inside parentheses
+    """
+
+    return [a for a, in_paren in paragraph_anchors(paragraph) if not in_paren]
+
+
+def link_tuples(links: list) -> list:
+    """
+    Turn extracted anchor tags into (link, link_text) tuples,
+    dropping links that are not links to articles
+    """
+
+    return filter_article_links([(a["href"], a.text.strip()) for a in links])
+
+
+def filter_article_links(ret: list) -> list:
+    """
+    Drop (link, link_text) tuples that are not links to articles
+    """
+
     for l in ret:
 
         # remove links that are not links to articles
@@ -0,0 +1,198 @@
+""" extraction_pool.py
+
+    Multi-process link extraction over page corpora.
+
+    Link extraction is CPU-bound Python: threads share one
+    interpreter lock and do not speed it up. The pool runs
+    `extract_links` (extraction.py) in worker processes, one
+    per core by default, over a stream of pages read from a
+    dump index (wikidump.py) or from the page cache
+    (page_cache.py).
+
+    Pages are sent to the workers in chunks, and only a
+    bounded number of chunks is in flight at a time: the
+    input is read lazily, and memory stays bounded however
+    large the corpus is. Results come back in input order.
+
+    With a single process, pages are extracted in this
+    process, without a pool.
+
+    Usage:
+        python extraction_pool.py [<dump index db> | <page cache db>]
+    Without argument, copies of test.html are extracted
+    with one process and with all cores.
+"""
+
+import collections
+import multiprocessing
+import os
+import sys
+
+from config import (
+    EXTRACTION_PROCESSES,
+    EXTRACTION_CHUNK_SIZE,
+    EXTRACTION_CHUNKS_IN_FLIGHT,
+)
+from extraction import extract_links, current_parser_backend, get_parser_backend
+
+
+def _extract_chunk(chunk: list, limit: int, backend: str) -> list:
+    """Worker: extract the links of a chunk of (key, html) pages"""
+
+    return [(key, extract_links(html or "", limit, backend)) for key, html in chunk]
+
+
+def _chunks(pages, chunk_size: int):
+    chunk = []
+    for page in pages:
+        chunk.append(page)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+# =============================================================================
+# EXTRACTION POOL
+# =============================================================================
+
+
+class ExtractionPool:
+    """Process pool extracting the links of streams of pages"""
+
+    def __init__(
+        self,
+        processes: int = EXTRACTION_PROCESSES,
+        chunk_size: int = EXTRACTION_CHUNK_SIZE,
+        chunks_in_flight: int = EXTRACTION_CHUNKS_IN_FLIGHT,
+        backend: str = None,
+    ):
+        """
+        processes: number of worker processes (None: one per core)
+        chunk_size: number of pages sent to a worker at a time
+        chunks_in_flight: max number of chunks queued or being extracted
+                          (None: two per worker)
+        backend: parser backend (default: the one in use, see extraction.py)
+        """
+
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.chunks_in_flight = chunks_in_flight or 2 * self.processes
+
+        # resolved here, so the workers use the backend of this process
+        self.backend = backend or current_parser_backend()
+        get_parser_backend(self.backend)  # fail early if it is not available
+
+        self.pool = None
+        if self.processes > 1:
+            self.pool = multiprocessing.Pool(self.processes)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def imap(self, pages, limit: int = None):
+        """Extract the links of a stream of pages
+
+        pages: iterable of (key, html), read lazily
+        limit: max number of links per page (None: all links found)
+
+        Yields (key, links) in the order of `pages`.
+        """
+
+        if self.pool is None:
+            for key, html in pages:
+                yield (key, extract_links(html or "", limit, self.backend))
+            return
+
+        pending = collections.deque()
+        chunks = _chunks(pages, self.chunk_size)
+
+        for chunk in chunks:
+            pending.append(
+                self.pool.apply_async(_extract_chunk, (chunk, limit, self.backend))
+            )
+
+            # wait for the oldest chunk before reading more pages
+            while len(pending) >= self.chunks_in_flight:
+                yield from pending.popleft().get()
+
+        while pending:
+            yield from pending.popleft().get()
+
+
+def extract_corpus(pages, limit: int = None, processes: int = EXTRACTION_PROCESSES):
+    """Extract the links of a stream of (key, html) pages on all cores
+
+    Yields (key, links) in input order (see `ExtractionPool.imap`).
+    """
+
+    with ExtractionPool(processes) as pool:
+        yield from pool.imap(pages, limit)
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    from config import MAX_LINK_EXTRACT
+
+    if len(sys.argv) > 1:
+        import sqlite3
+
+        db_file = sys.argv[1]
+        conn = sqlite3.connect(db_file)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        conn.close()
+
+        if "dump_pages" in tables:
+            from wikidump import WikiDump
+
+            source = WikiDump(db_file).iter_articles()
+        else:
+            from config import PAGE_CACHE_MAX_BYTES
+            from page_cache import PageCache
+
+            source = PageCache(db_file, PAGE_CACHE_MAX_BYTES).iter_pages()
+
+        pages = ((title, html) for _, title, html in source)
+
+        start = time.time()
+        n_pages = 0
+        for title, links in extract_corpus(pages, MAX_LINK_EXTRACT):
+            n_pages += 1
+        elapsed = time.time() - start
+
+        print(f"Extracted {n_pages} pages of {db_file} in {elapsed:.1f} seconds")
+        sys.exit(0)
+
+    with open("test.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    n_pages = 200
+    pages = [(i, html) for i in range(n_pages)]
+
+    results = {}
+    for processes in (1, os.cpu_count() or 1):
+        start = time.time()
+        with ExtractionPool(processes) as pool:
+            results[processes] = list(pool.imap(iter(pages), MAX_LINK_EXTRACT))
+        elapsed = time.time() - start
+        print(f"{processes} process(es): {n_pages / elapsed:.0f} pages/s")
+
+    serial, parallel = results[1], results[max(results)]
+    print(f"    same links = {serial == parallel}")
+    print(f"    in order = {[key for key, _ in parallel] == list(range(n_pages))}")
@@ -0,0 +1,200 @@
+""" functional_graph.py
+
+    Outcome of every article under a deterministic link
+    selection, in one pass over the whole graph.
+
+    With a deterministic strategy (link i, WordNet, ...)
+    each article has exactly one successor: the hop graph
+    is a functional graph, and every chain either reaches
+    Philosophy, ends at an article without a link (dead
+    end), or falls into a cycle. Instead of walking a chain
+    per starter, the successor array is labelled with an
+    iterative colouring: each article is walked over once,
+    and the outcome of the end of every walk is propagated
+    back along it. The whole graph is labelled in linear
+    time:
+        - outcome: PHILOSOPHY, CYCLE or DEAD_END
+        - distance: hops to Philosophy, to the cycle, or to
+          the dead end
+        - cycle id: the cycle the chain falls into
+
+    Philosophy absorbs the chains that reach it: its own
+    successor is not followed.
+
+    Usage:
+        python functional_graph.py <graph.npz | link table | link index | traversal tree db> [<link i>]
+"""
+
+import sys
+
+import numpy as np
+
+from config import WIKI_PAGEID_OF_PHILOSOPHY
+from link_graph import MISSING, LinkGraph, load_graph
+
+# outcomes of a chain
+UNKNOWN = 0
+PHILOSOPHY = 1
+CYCLE = 2
+DEAD_END = 3
+
+OUTCOME_NAMES = {PHILOSOPHY: "Philosophy", CYCLE: "cycle", DEAD_END: "dead end"}
+
+
+# =============================================================================
+# LABELS
+# =============================================================================
+
+
+class FunctionalGraphLabels:
+    """Outcome, distance and cycle of the chain of every node"""
+
+    def __init__(self, outcome, distance, cycle_id, cycles):
+        """
+        outcome: outcome of the chain of each node
+        distance: hops from each node to Philosophy, its cycle or its dead end
+        cycle_id: cycle the chain of each node falls into (-1 if none)
+        cycles: nodes of each cycle, in hop order
+        """
+
+        self.outcome = outcome
+        self.distance = distance
+        self.cycle_id = cycle_id
+        self.cycles = cycles
+
+    def count(self, outcome: int) -> int:
+        return int(np.count_nonzero(self.outcome == outcome))
+
+    def basin_sizes(self) -> np.ndarray:
+        """Number of nodes whose chain falls into each cycle"""
+        return np.bincount(self.cycle_id[self.cycle_id >= 0], minlength=len(self.cycles))
+
+    def print_stats(self, graph: LinkGraph = None, n_cycles: int = 5):
+        n_nodes = len(self.outcome)
+
+        print("Functional graph:")
+        print(f"    nodes = {n_nodes}")
+        for outcome, name in OUTCOME_NAMES.items():
+            n = self.count(outcome)
+            share = n / n_nodes if n_nodes > 0 else 0.0
+            print(f"    {name} = {n} ({share:.1%})")
+
+        reached = self.distance[self.outcome == PHILOSOPHY]
+        if len(reached) > 0:
+            print(f"    hops to Philosophy: mean = {reached.mean():.2f}, max = {reached.max()}")
+
+        print(f"    cycles = {len(self.cycles)}")
+        sizes = self.basin_sizes()
+        for cycle in np.argsort(-sizes)[:n_cycles]:
+            nodes = self.cycles[cycle]
+            if graph is not None:
+                nodes = [graph.pageid_of(node) for node in nodes]
+            print(f"        cycle {cycle}: {sizes[cycle]} nodes, length {len(nodes)}: {nodes[:10]}")
+
+
+# =============================================================================
+# ANALYSIS
+# =============================================================================
+
+
+def label_functional_graph(successors, philosophy: int = MISSING) -> FunctionalGraphLabels:
+    """Label every node of a functional graph with the outcome of its chain
+
+    successors: successor of each node (MISSING: no successor)
+    philosophy: node of Philosophy (MISSING if not in the graph)
+    """
+
+    succ = np.asarray(successors).tolist()
+    n_nodes = len(succ)
+
+    outcome = [UNKNOWN] * n_nodes
+    distance = [0] * n_nodes
+    cycle_id = [-1] * n_nodes
+    cycles = []
+
+    # walk each node is on (colour), and its position in that walk
+    walk_of = [-1] * n_nodes
+    position = [0] * n_nodes
+
+    if philosophy != MISSING:
+        outcome[philosophy] = PHILOSOPHY
+
+    for start in range(n_nodes):
+        if outcome[start] != UNKNOWN:
+            continue
+
+        ### walk until a labelled node, a dead end, or a node of this walk
+
+        walk = []
+        node = start
+        while node != MISSING and outcome[node] == UNKNOWN and walk_of[node] != start:
+            walk_of[node] = start
+            position[node] = len(walk)
+            walk.append(node)
+            node = succ[node]
+
+        ### label the end of the walk
+
+        if node == MISSING:
+            # the last node of the walk has no successor
+            end = walk.pop()
+            outcome[end], distance[end] = DEAD_END, 0
+            end_outcome, end_distance, end_cycle = DEAD_END, 0, -1
+
+        elif outcome[node] != UNKNOWN:
+            end_outcome, end_distance, end_cycle = outcome[node], distance[node], cycle_id[node]
+
+        else:
+            # back to a node of this walk: the rest of the walk is a cycle
+            cycle = walk[position[node] :]
+            del walk[position[node] :]
+
+            end_cycle = len(cycles)
+            cycles.append(cycle)
+            for c in cycle:
+                outcome[c], distance[c], cycle_id[c] = CYCLE, 0, end_cycle
+            end_outcome, end_distance = CYCLE, 0
+
+        ### propagate it back along the walk
+
+        for node in reversed(walk):
+            end_distance += 1
+            outcome[node], distance[node], cycle_id[node] = end_outcome, end_distance, end_cycle
+
+    return FunctionalGraphLabels(
+        np.array(outcome, dtype=np.int8),
+        np.array(distance, dtype=np.int32),
+        np.array(cycle_id, dtype=np.int32),
+        cycles,
+    )
+
+
+def label_link_graph(graph: LinkGraph, link_i: int = 1) -> FunctionalGraphLabels:
+    """Label every article of a link graph, following link `link_i` everywhere"""
+
+    return label_functional_graph(
+        graph.nth_links(link_i), graph.node_of(WIKI_PAGEID_OF_PHILOSOPHY)
+    )
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python functional_graph.py <graph.npz | link table | link index | traversal tree db> [<link i>]")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    link_i = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    graph = load_graph(path)
+
+    start = time.time()
+    labels = label_link_graph(graph, link_i)
+    print(f"Labelled {graph.n_nodes} articles (link i = {link_i}) in {time.time() - start:.2f} seconds")
+
+    labels.print_stats(graph)
@@ -5,7 +5,6 @@
 """
 
 
-import requests
 import json
 import os
 import time
@@ -15,11 +14,18 @@ import sys
 import re
 from bs4 import BeautifulSoup
 
+from dao import get_memo_dao, OUTCOME_PHILOSOPHY
+from page_source import get_page_html
+from wiki_api import get_random_page_infos
+
 
 PAGES_JSON_PATH = "./pages.json"
 WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
 PHIL_URL = "/wiki/Philosophy"
 
+# name of the link selection of this script in the hop memo (see dao.py)
+MEMO_STRATEGY = "GATHER_WORDS"
+
 
 class PagesJson:
     def __init__(self):
@@ -86,18 +92,11 @@ def extract_link(page_url, i):
     i: the i-th link to extract
     """
 
-    # get page content with Wikipedia API
-    title_url = page_url.split("/")[-1]
-
-    PARAMS = {
-        "action": "parse",
-        "page": title_url,
-        "prop": "text",
-        "format": "json",
-    }
+    # get page content (through the shared page cache, see page_source.py)
+    data = get_page_html(page_url)
 
-    r = requests.get(url=WIKI_API_URL, params=PARAMS)
-    data = r.json()["parse"]["text"]["*"]
+    if data is None:
+        return (None, None, None)
 
     soup = BeautifulSoup(data, "html.parser")
 
@@ -160,46 +159,21 @@ def get_rand_pages(n, i):
     if i < 1 or i > 300:  # get i-th link of each page
         raise ValueError("i must be between 1 and 300")
 
-    S = requests.Session()
-
-    # get n random pages
-
-    PARAMS = {
-        "action": "query",
-        "format": "json",
-        "list": "random",
-        "rnlimit": str(n),
-        "rnnamespace": "0",
-    }
+    # get n random pages and their info (batched)
 
-    R = S.get(url=WIKI_API_URL, params=PARAMS)
-    DATA = R.json()
-    RANDOMS = DATA["query"]["random"]
+    RANDOMS = get_random_page_infos(n)
 
     pages_json = PagesJson()
     pages_json.load()
 
     for r in tqdm.tqdm(RANDOMS):
         page_title = r["title"]
-        page_id = r["id"]
+        page_id = r["pageid"]
 
-        # get full url of each page
+        page_url = r.get("fullurl")
+        page_lang = r.get("pagelanguage")
 
-        PARAMS = {
-            "action": "query",
-            "format": "json",
-            "prop": "info",
-            "inprop": "url",
-            "pageids": page_id,
-        }
-
-        R = S.get(url=WIKI_API_URL, params=PARAMS)
-        DATA = R.json()
-
-        page_url = DATA["query"]["pages"][str(page_id)]["fullurl"]
-        page_lang = DATA["query"]["pages"][str(page_id)]["pagelanguage"]
-
-        if page_lang != "en":
+        if page_lang != "en" or page_url is None:
             continue
 
         # get i-th link of each page which is not inside a () or []
@@ -234,7 +208,23 @@ def get_rand_pages(n, i):
 # =============================================================================
 
 
-def traverse_RECURSIVE(url, i):
+def traverse_RECURSIVE(url, i, chain=None):
+    # urls of the pages visited so far, memoized once Philosophy is found
+    chain = (chain or []) + [url]
+    memo_dao = get_memo_dao()
+
+    # known page: print the rest of its chain (see dao.py)
+    if memo_dao is not None:
+        memo = memo_dao.get_memo(url, MEMO_STRATEGY, i)
+        if memo is not None and memo.outcome == OUTCOME_PHILOSOPHY:
+            known = memo_dao.memo_chain(url, MEMO_STRATEGY, i)
+            if len(known) == memo.distance:
+                for m in known:
+                    print(f"(memo) -> {m.next_url}")
+                print("Found it!")
+                memo_dao.record_chain(MEMO_STRATEGY, i, chain, OUTCOME_PHILOSOPHY, rest=memo.distance)
+                return
+
     (link, word, linkword) = extract_link(url, i)
 
     if link is None:
@@ -244,10 +234,12 @@ def traverse_RECURSIVE(url, i):
 
     if link == PHIL_URL:
         print("Found it!")
+        if memo_dao is not None:
+            memo_dao.record_chain(MEMO_STRATEGY, i, chain + [link], OUTCOME_PHILOSOPHY)
         return
 
     link = "https://en.wikipedia.org" + link
-    traverse_RECURSIVE(link, i)
+    traverse_RECURSIVE(link, i, chain)
 
 
 # =============================================================================
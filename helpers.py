@@ -2,7 +2,7 @@
 
     Helper functions for the project.
 """
-import requests
+import bisect
 import re
 
 from config import WIKIPEDIA_BASE_URL, WIKIPEDIA_API_BASE_URL
@@ -27,7 +27,34 @@ def reduce_full_url(url: str) -> str:
     return url
 
 
-def url_to_pageid(wiki_url: str) -> str:
+def url_to_title(url: str) -> str:
+    """Return the article part of a url (everything after /wiki/), or the
+    title itself
+
+    Unlike `reduce_full_url`, subpage-like titles keep their slashes:
+    /wiki/AC/DC is AC/DC, not DC.
+    """
+
+    if "/wiki/" in url:
+        url = url.split("/wiki/", 1)[1]
+
+    return url
+
+
+def normalize_title(title: str) -> str:
+    """Normalize an article title or url to its canonical title form"""
+
+    title = encode_fix(url_to_title(title))
+    title = title.split("#")[0].replace("_", " ").strip()
+    title = re.sub(r"\s+", " ", title)
+
+    if title == "":
+        return title
+
+    return title[0].upper() + title[1:]
+
+
+def url_to_pageid(wiki_url: str, session=None) -> str:
     # example get:
     # https://en.wikipedia.org/w/api.php?action=query&titles=Main%20Page
     # {
@@ -42,20 +69,19 @@ def url_to_pageid(wiki_url: str) -> str:
     #         }
     #     }
     # }
-    
-    wiki_url = encode_fix(wiki_url)
+    #
+    # resolutions are recorded, repeated lookups are answered locally
+    # (see title_resolver.py); redirects are followed
+
+    from title_resolver import resolve_title
 
-    pageid = requests.get(
-        WIKIPEDIA_API_BASE_URL,
-        params={
-            "action": "query",
-            "titles": reduce_full_url(wiki_url),
-            "format": "json",
-        },
-    ).json()["query"]["pages"]
+    resolution = resolve_title(wiki_url, session)
 
-    pageid = list(pageid.keys())[0]
-    return pageid
+    # "-1" is the pageid the API gives to missing pages
+    if resolution is None:
+        return "-1"
+
+    return str(resolution.pageid)
 
 
 def rm_non_alphanum(seq: str) -> str:
@@ -77,6 +103,61 @@ def parenthetic_contents(string: str):
             yield (len(stack), string[start + 1 : i])
 
 
+def anchors_in_parentheses(html: str, anchors: list) -> set:
+    """Return the anchors (html of <a> tags) that occur inside parentheses in html
+
+    Same result as testing `anchor in contents` for the contents of every
+    pair of parentheses found by `parenthetic_contents`, in linear time:
+    matched pairs are nested, so only the outermost ones are kept, and the
+    occurrences of the anchors are found in one pass over the `<a` in html.
+    """
+
+    anchors = set(anchors)
+    if not anchors:
+        return set()
+
+    ### outermost matched pairs of parentheses (sorted, disjoint)
+
+    stack = []
+    pairs = []
+    for i, c in enumerate(html):
+        if c == "(":
+            stack.append(i)
+        elif c == ")" and stack:
+            pairs.append((stack.pop(), i))
+
+    # pairs close after the pairs they contain: walking them backwards,
+    # a pair is outermost if it ends before the last outermost one starts
+    starts, ends = [], []
+    for start, end in reversed(pairs):
+        if not starts or end < starts[-1]:
+            starts.append(start)
+            ends.append(end)
+    starts.reverse()
+    ends.reverse()
+
+    ### look up the anchors at every "<a" of html, by prefix
+
+    prefix_len = min(32, min(len(a) for a in anchors))
+    by_prefix = {}
+    for a in anchors:
+        by_prefix.setdefault(a[:prefix_len], []).append(a)
+
+    found = set()
+    for match in re.finditer("<a", html):
+        q = match.start()
+        for a in by_prefix.get(html[q : q + prefix_len], ()):
+            if a in found or not html.startswith(a, q):
+                continue
+
+            # inside the contents of the last pair starting before it?
+            k = bisect.bisect_right(starts, q - 1) - 1
+            if k >= 0 and q + len(a) <= ends[k]:
+                found.add(a)
+
+    return found
+
+
 def print_list_pretty(l: list):
     """Print list in a (semi-)pretty way"""
 
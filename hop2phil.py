@@ -7,22 +7,22 @@
 
 """
 
-import tqdm
-import requests
 import sys
 import os
 import random
 from urllib.parse import unquote
-from bs4 import BeautifulSoup
 
 from config import (
-    WIKIPEDIA_API_BASE_URL,
     WIKIPEDIA_BASE_URL,
     MAX_HOPS,
     WIKI_URL_OF_PHILOSOPHY,
     DEFAULT_SQLITE_DB_NAME,
 )
 from dao import TreeDao, Page
+from link_index import indexed_page
+from philhopper import hop_to_philosophy_all_ranks
+from title_resolver import resolve_title
+from wiki_api import get_random_page_infos
 
 # full path of this script
 SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
@@ -45,17 +45,6 @@ def check_url(url: str) -> str:
         return WIKIPEDIA_BASE_URL + url
 
 
-def parenthetic_contents(string: str):
-    """Generate parenthesized contents in string as pairs (level, contents)"""
-    stack = []
-    for i, c in enumerate(string):
-        if c == "(":
-            stack.append(i)
-        elif c == ")" and stack:
-            start = stack.pop()
-            yield (len(stack), string[start + 1 : i])
-
-
 def print_list_pretty(l: list):
     """Print list in a (semi-)pretty way"""
 
@@ -86,115 +75,23 @@ def extract_link(page_url: str, link_i: int) -> tuple:
     i: the i-th link to extract
     """
 
-    ### retrieve page html
+    ### ranked links of the page (parsed once per revision, see link_index.py)
 
-    data = requests.get(page_url).text
+    page = indexed_page(page_url)
 
     # check data
-    if data is None:
+    if page is None:
         print(f"Extraction failed: no data (url: {page_url})")
         return (None, None, None)
 
-    soup = BeautifulSoup(data, "html.parser")
-
-    ### clean up the html
-
-    # remove thumbnails
-    for div in soup.find_all("div", {"class": "thumb"}):
-        div.decompose()
-    # remove sidebars
-    for div in soup.find_all("table", {"class": "sidebar"}):
-        div.decompose()
-    # remove all tables
-    for table in soup.find_all("table"):
-        table.decompose()
-    # remove notes at the top (class: hatnote)
-    for div in soup.find_all("div", {"class": "hatnote"}):
-        div.decompose()
-
-    ### find paragraphs in html
-
-    # find containers with classes specific classes
-    containers = soup.find_all(
-        "div", {"class": ["mw-parser-output", "mw-body-content", "vector-body"]}
-    )
-
-    if containers is None:
-        print(f"Extraction failed: no containers")
-        return (None, None, None)
-
-    # list of paragraphs inside containers
-    ps = []
-
-    for container in containers:
-        ps += container.find_all("p")
-
-    links = []
-
-    ### extract links from paragraphs
-
-    # look in first x paragraphs
-    max_paras = 3
-    x = max_paras if len(ps) > max_paras else len(ps)
-
-    for paragraph_n in range(0, x):
-        # get contents of parentheses
-        nested_paren_contents = list(parenthetic_contents(str(ps[paragraph_n])))
-        strs_in_paren = [
-            s[1] for s in nested_paren_contents
-        ]  # get second element of each tuple (level, contents)
-
-        # for all anchor tags inside the current paragraph
-        for a in ps[paragraph_n].find_all("a"):
-            if a.has_attr("href") and a["href"].startswith("/wiki/"):
-
-                # check if the anchor tag is inside parentheses
-                in_paren = False
-                for para in strs_in_paren:
-                    if str(a) in para:
-                        in_paren = True
-                        break
-
-                if not in_paren:
-                    links.append(a)
-
-        if len(links) >= link_i:
-            break
-
-    ### if no links found, try a different strategy
-
-    if len(links) == 0:
-        # try another link searching strategy:
-        # look for anchor tags that have an href attribute
-        # starting with 'wiki/' and are not inside parentheses
-        for a in soup.find_all("a"):
-            if a.has_attr("href") and a["href"].startswith("/wiki/"):
-                links.append(a)
-
-        # check for parentheses
-        nested_paren_contents = list(parenthetic_contents(str(soup)))
-        strs_in_paren = [s[1] for s in nested_paren_contents]
-
-        for a in links:
-            in_para = False
-            for para in strs_in_paren:
-                if str(a) in para:
-                    in_para = True
-                    break
-
-            if in_para:
-                links.remove(a)
-
     ### return results
 
     # if we don't have the i-th link, return None
-    if len(links) < link_i:
+    link = page.nth_link(link_i)
+    if link is None:
         return (None, None, None)
 
-    link = links[link_i - 1]
-    ret = (link["href"], link.text, link["title"])
-
-    return ret
+    return (link.href, link.text, link.title)
 
 
 # =============================================================================
@@ -213,46 +110,16 @@ def get_random_pages(n: int, link_i: int) -> list:
     if link_i < 1 or link_i > 300:  # get i-th link of each page
         raise ValueError("i must be between 1 and 300")
 
-    ### get random pages via Wikipedia API
+    ### get random pages and their info via Wikipedia API (batched)
 
-    PARAMS = {
-        "action": "query",
-        "format": "json",
-        "list": "random",
-        "rnlimit": str(n),
-        "rnnamespace": "0",
-    }
-    S = requests.Session()
-    R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-    DATA = R.json()
-    RANDOMS = DATA["query"]["random"]
+    RANDOMS = get_random_page_infos(n)
 
     ### extract info from the pages
 
-    print(f"Extracting data from {n} random Wikipedia pages")
-
     PAGES = []
-    for r in tqdm.tqdm(RANDOMS):
-        page_title = r["title"]
-        page_id = r["id"]
-
-        # get full url of each page
-
-        PARAMS = {
-            "action": "query",
-            "format": "json",
-            "prop": "info",
-            "inprop": "url",
-            "pageids": page_id,
-        }
-
-        S = requests.Session()
-        R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-        DATA = R.json()
-
-        page_url = DATA["query"]["pages"][str(page_id)]["fullurl"]
-        page_title_from_url = page_url.split("/")[-1]
-        page_lang = DATA["query"]["pages"][str(page_id)]["pagelanguage"]
+    for r in RANDOMS:
+        page_url = r.get("fullurl")
+        page_lang = r.get("pagelanguage")
 
         if page_lang != "en":
             continue
@@ -279,29 +146,20 @@ def url_to_page_obj(url: str, link_i: int) -> Page:
     url = check_url(url)
     url = encode_fix(url)
 
-    ### get info about article via Wikipedia API
+    ### get info about article (title resolution table, see title_resolver.py)
 
-    PARAMS = {
-        "action": "query",
-        "format": "json",
-        "prop": "info",
-        "inprop": "url",
-        "titles": url.split("/")[-1],
-    }
-    S = requests.Session()
-    R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-    DATA = R.json()
+    resolution = resolve_title(url)
 
     # check if page exists
-    if "-1" in DATA["query"]["pages"]:
+    if resolution is None:
         print(f"Page does not exist ({url})")
         return None
 
-    # extract info from returned json
-    page_id = list(DATA["query"]["pages"].keys())[0]
-    page_url = DATA["query"]["pages"][page_id]["fullurl"]
+    # extract info from resolution
+    page_id = str(resolution.pageid)
+    page_url = resolution.fullurl
     page_title_from_url = page_url.split("/")[-1]
-    page_lang = DATA["query"]["pages"][page_id]["pagelanguage"]
+    page_lang = resolution.lang
 
     # check if page is in English
     if page_lang != "en":
@@ -405,6 +263,7 @@ def main():
 
     link_i = 1  # get i-th link of each page
     n = 10  # how many random pages to get in each iteration
+    k = None  # follow links 1..k of each page at once (None: link i only)
 
     # initialize TreeDao
     tree_dao = TreeDao(SQLITE_PATH)
@@ -426,7 +285,10 @@ def main():
 
             # hop to philosophy
             for article in random_articles:
-                hop_to_philosophy(article, link_i)
+                if k is not None:
+                    hop_to_philosophy_all_ranks(article, k)
+                else:
+                    hop_to_philosophy(article, link_i)
 
     except KeyboardInterrupt:
         print("Exiting...")
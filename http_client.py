@@ -0,0 +1,159 @@
+""" http_client.py
+
+    Process-wide HTTP client of the project.
+
+    Every fetch and API call goes through one shared
+    `requests` session, so connections to Wikipedia are
+    pooled and kept alive between calls instead of paying
+    TCP and TLS setup for every request. The session is
+    created once (thread-safe) and applies the timeouts
+    and pool sizes of config.py.
+
+    Requests to Wikipedia pass through an adaptive
+    concurrency limiter (see rate_control.py); throttled
+    requests (429/503) are retried after the time asked by
+    the server.
+
+    Usage:
+        from http_client import get_session
+        r = get_session().get(url, params=params)
+"""
+
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_USER_AGENT,
+    HTTP_MAX_RETRIES,
+    RATE_LIMITED_HOSTS,
+    RATE_LIMIT_INITIAL,
+    RATE_LIMIT_MIN,
+    RATE_LIMIT_MAX,
+    RATE_LIMIT_TARGET_LATENCY,
+    RATE_LIMIT_CEILING_RECOVERY,
+)
+from rate_control import AdaptiveLimiter, THROTTLE_STATUS_CODES, parse_retry_after
+
+# max seconds to back off when a throttling response has no Retry-After
+MAX_BACKOFF = 60
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+# =============================================================================
+# SESSION
+# =============================================================================
+
+
+class WikiSession(requests.Session):
+    """requests session with a default timeout and adaptive rate control"""
+
+    def __init__(
+        self,
+        timeout: tuple,
+        limiter: AdaptiveLimiter = None,
+        limited_hosts: tuple = (),
+        max_retries: int = HTTP_MAX_RETRIES,
+    ):
+        super().__init__()
+        self.timeout = timeout
+        self.limiter = limiter
+        self.limited_hosts = limited_hosts
+        self.max_retries = max_retries
+
+    def is_limited(self, url: str) -> bool:
+        """Check if requests to url go through the rate limiter"""
+
+        if self.limiter is None:
+            return False
+
+        host = urlparse(url).hostname or ""
+        return any(host == h or host.endswith("." + h) for h in self.limited_hosts)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+
+        if not self.is_limited(url):
+            return super().request(method, url, **kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            start = self.limiter.acquire()
+            try:
+                r = super().request(method, url, **kwargs)
+            except requests.RequestException:
+                self.limiter.release(start, None)
+                raise
+
+            retry_after = None
+            if r.status_code in THROTTLE_STATUS_CODES:
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                if retry_after is None:
+                    # no hint from the server: exponential backoff
+                    retry_after = min(MAX_BACKOFF, 2**attempt)
+
+            self.limiter.release(start, r.status_code, retry_after)
+
+            if r.status_code not in THROTTLE_STATUS_CODES:
+                break
+
+        return r
+
+
+def make_session(
+    pool_connections: int = HTTP_POOL_CONNECTIONS,
+    pool_maxsize: int = HTTP_POOL_MAXSIZE,
+    timeout: tuple = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    limiter: AdaptiveLimiter = None,
+    limited_hosts: tuple = (),
+) -> WikiSession:
+    """Create a session with a connection pool of the given size
+
+    pool_connections: number of hosts to keep connection pools for
+    pool_maxsize: max number of connections kept open per host
+        (requests over the limit wait for a free connection)
+    timeout: (connect, read) timeout in seconds of each request
+    limiter: adaptive concurrency limiter of requests to `limited_hosts`
+    """
+
+    session = WikiSession(timeout, limiter, limited_hosts)
+    session.headers.update({"User-Agent": HTTP_USER_AGENT})
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=True,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+def get_session() -> WikiSession:
+    """Return the shared session of this process"""
+
+    global _SESSION
+
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                limiter = AdaptiveLimiter(
+                    RATE_LIMIT_INITIAL,
+                    RATE_LIMIT_MIN,
+                    RATE_LIMIT_MAX,
+                    RATE_LIMIT_TARGET_LATENCY,
+                    ceiling_recovery=RATE_LIMIT_CEILING_RECOVERY,
+                )
+                _SESSION = make_session(
+                    limiter=limiter, limited_hosts=RATE_LIMITED_HOSTS
+                )
+
+    return _SESSION
@@ -0,0 +1,212 @@
+""" lead_fragment.py
+
+    Compact storage format of Wikipedia articles.
+
+    The link extractor (extraction.py) only reads the first
+    three paragraphs of an article, and falls back to the
+    whole cleaned page only when they hold no links. A full
+    article is ~100 KB of html, its lead ~5 KB.
+
+    `make_lead_fragment` reduces the html of an article to
+    the leading blocks of its article container, up to the
+    paragraphs the extractors read, kept as they are (tables
+    and thumbnails included, for the scripts that read the
+    raw paragraphs, see gather_words.py). Every fragment is
+    checked against the full page when it is made: if its
+    candidate links (link_index.py) or raw lead paragraphs
+    differ, or the page needs the whole-page fallback
+    strategy, the full page is kept instead.
+
+    Fragments are compressed with zstd when the `zstandard`
+    package is installed, zlib otherwise. The first byte of
+    an encoded fragment names its codec, so caches and dumps
+    written with either codec can be read back.
+
+    Running this file compares the links extracted from
+    test.html and from its encoded fragment.
+"""
+
+import zlib
+
+from bs4 import BeautifulSoup, Tag
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from extraction import MAX_PARAGRAPHS
+
+# paragraphs kept beyond the ones the extractor reads, for the scripts
+# that skip paragraphs with a class (see gather_words.py)
+EXTRA_PARAGRAPHS = 3
+
+# div classes `clean_soup` removes with the paragraphs inside them (and tables)
+CLEANED_CLASSES = {"thumb", "hatnote"}
+
+# codec tags (first byte of an encoded fragment)
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+
+
+# =============================================================================
+# FRAGMENTS
+# =============================================================================
+
+
+def make_lead_fragment(html: str, soup: BeautifulSoup = None) -> str:
+    """Reduce the html of an article to the part the link extractors read
+
+    soup: the article parsed with html.parser (default: parsed here)
+
+    Returns the leading blocks of the article container, or the full html
+    if the lead alone does not give the same candidate links and paragraphs.
+    """
+
+    from link_index import index_html
+
+    candidates = index_html(html)
+
+    # the whole-page fallback strategy reads the whole page
+    if all(c.in_paren for c in candidates):
+        return html
+
+    if soup is None:
+        soup = BeautifulSoup(html, "html.parser")
+
+    body = soup.find("div", class_="mw-parser-output")
+    if body is None:
+        return html
+
+    ### the leading blocks of the container, up to the paragraphs read
+
+    keep = []
+    n_read = 0  # paragraphs the extractors read (outside cleaned blocks)
+    n_raw = 0  # paragraphs without class (gather_words.py)
+
+    for block in body.children:
+        if not isinstance(block, Tag):
+            continue
+
+        ps = [block] if block.name == "p" else block.find_all("p")
+        if not ps:
+            continue
+
+        keep.append(str(block))
+        n_read += sum(1 for p in ps if not _is_cleaned(p, body))
+        n_raw += sum(1 for p in ps if p.get("class") is None)
+
+        if n_read >= MAX_PARAGRAPHS and n_raw >= MAX_PARAGRAPHS + EXTRA_PARAGRAPHS:
+            break
+
+    fragment = '<div class="mw-parser-output">' + "".join(keep) + "</div>"
+
+    fragment_soup = BeautifulSoup(fragment, "html.parser")
+    if index_html(fragment) == candidates and raw_lead_paragraphs(
+        fragment_soup
+    ) == raw_lead_paragraphs(soup):
+        return fragment
+
+    return html
+
+
+def _is_cleaned(p: Tag, body: Tag) -> bool:
+    """Check if `clean_soup` removes a paragraph of the article container"""
+
+    for parent in p.parents:
+        if parent is body:
+            return False
+        if parent.name == "table":
+            return True
+        if parent.name == "div" and CLEANED_CLASSES & set(parent.get("class") or []):
+            return True
+
+    return False
+
+
+def raw_lead_paragraphs(soup: BeautifulSoup) -> list:
+    """The html of the first paragraphs without class of the article
+    container, outside thumbnails and sidebars (as gather_words.py reads them)
+    """
+
+    body = soup.find("div", class_="mw-parser-output")
+    if body is None:
+        return None
+
+    ps = []
+    for p in body.find_all("p"):
+        if p.get("class") is not None:
+            continue
+        if p.find_parent("div", class_="thumb") or p.find_parent("table", class_="sidebar"):
+            continue
+
+        ps.append(str(p))
+        if len(ps) == MAX_PARAGRAPHS + EXTRA_PARAGRAPHS:
+            break
+
+    return ps
+
+
+def encode_fragment(fragment: str) -> bytes:
+    """Compress a fragment (zstd if available, zlib otherwise)"""
+
+    data = fragment.encode("utf-8")
+
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+    return CODEC_ZLIB + zlib.compress(data, ZLIB_LEVEL)
+
+
+def decode_fragment(blob: bytes) -> str:
+    """Decompress a fragment encoded by `encode_fragment`"""
+
+    if blob is None:
+        return None
+
+    codec, payload = blob[:1], blob[1:]
+
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Fragment compressed with zstd: install zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+
+    raise ValueError(f"Unknown fragment codec: {codec!r}")
+
+
+def encode_lead(html: str) -> bytes:
+    """Reduce the html of an article to its compressed lead fragment"""
+    return encode_fragment(make_lead_fragment(html))
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    with open("test.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    start = time.time()
+    blob = encode_lead(html)
+    end = time.time()
+
+    fragment = decode_fragment(blob)
+
+    print(f"Encoded test.html in {end - start:.3f} seconds")
+    print(f"    html = {len(html.encode('utf-8'))} bytes")
+    print(f"    fragment = {len(fragment.encode('utf-8'))} bytes")
+    print(f"    encoded = {len(blob)} bytes (codec {blob[:1].decode()})")
+
+    from extraction import extract_links_from_html
+
+    same = extract_links_from_html(fragment) == extract_links_from_html(html)
+    print(f"    same links = {same}")
@@ -0,0 +1,538 @@
+""" link_graph.py
+
+    Compact first-link graph of Wikipedia articles.
+
+    Articles are interned into dense node numbers (their
+    pageids, sorted), and the ranked candidate links of
+    every article are stored as NumPy CSR arrays:
+        - `pageids[node]`: pageid of a node
+        - `indptr[node]:indptr[node + 1]`: the links of a node,
+          in rank order
+        - `indices[edge]`: node the link points to (MISSING
+          for articles outside the graph)
+        - `ranks[edge]`: rank of the link (link i, 1-based),
+          only when some ranks are not stored (a traversal
+          tree keeps one link per article); otherwise the
+          rank of a link is its position in its row
+    A link costs 4 bytes (6 with ranks) and an article 16:
+    millions of articles with their first links fit in a few
+    hundred MB, and every lookup is array indexing.
+
+    Graphs are built from the precomputed link table
+    (link_table.py), the link index (link_index.py, pageids
+    read from the title resolution table), or the traversal
+    tree database (dao.py). Edges are joined to pageids in
+    SQLite, so building does not hold every title in memory.
+
+    Usage:
+        python link_graph.py <link table | link index | traversal tree db> [<graph.npz>]
+        python link_graph.py --test
+"""
+
+import array
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+from config import (
+    MAX_LINK_EXTRACT,
+    TITLE_RESOLUTION_DB_PATH,
+    WIKI_PAGEID_OF_PHILOSOPHY,
+)
+from helpers import normalize_title
+
+# node of a link to an article outside the graph
+MISSING = -1
+
+# number of edges read from SQLite at a time
+FETCH_SIZE = 100000
+
+
+# =============================================================================
+# LINK GRAPH
+# =============================================================================
+
+
+class LinkGraph:
+    """Ranked links of articles, as CSR arrays over dense node numbers"""
+
+    def __init__(self, pageids, indptr, indices, ranks=None):
+        """
+        pageids: pageid of each node, sorted
+        indptr: start of the links of each node in `indices` (n_nodes + 1)
+        indices: target node of each link (MISSING if outside the graph)
+        ranks: rank (link i) of each link (None: its position in its row + 1)
+        """
+
+        self.pageids = np.asarray(pageids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.ranks = None if ranks is None else np.asarray(ranks, dtype=np.int16)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.pageids)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.pageids, self.indptr, self.indices, self.ranks]
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    # ====================================================================================
+    # INTERNING
+    # ====================================================================================
+
+    def node_of(self, pageid: int) -> int:
+        """Return the node of a pageid (MISSING if not in the graph)"""
+        return int(self.nodes_of([pageid])[0])
+
+    def nodes_of(self, pageids) -> np.ndarray:
+        """Return the nodes of an array of pageids (MISSING if not in the graph)"""
+
+        pageids = np.asarray(pageids, dtype=np.int64)
+        if self.n_nodes == 0:
+            return np.full(len(pageids), MISSING, dtype=np.int32)
+
+        nodes = np.searchsorted(self.pageids, pageids)
+        nodes = np.minimum(nodes, max(self.n_nodes - 1, 0))
+
+        found = self.pageids[nodes] == pageids
+        return np.where(found, nodes, MISSING).astype(np.int32)
+
+    def pageid_of(self, node: int) -> int:
+        return int(self.pageids[node])
+
+    # ====================================================================================
+    # LINKS
+    # ====================================================================================
+
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def links_of(self, node: int) -> np.ndarray:
+        """Target nodes of the links of a node, in rank order"""
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def ranks_of(self, node: int) -> np.ndarray:
+        """Ranks (link i) of the links of a node"""
+
+        start, end = self.indptr[node], self.indptr[node + 1]
+        if self.ranks is None:
+            return np.arange(1, end - start + 1, dtype=np.int16)
+        return self.ranks[start:end]
+
+    def edge_sources(self) -> np.ndarray:
+        """Node of the article of every link"""
+        return np.repeat(np.arange(self.n_nodes, dtype=np.int32), self.out_degrees())
+
+    def edge_ranks(self) -> np.ndarray:
+        """Rank (link i) of every link"""
+
+        if self.ranks is not None:
+            return self.ranks
+
+        starts = np.repeat(self.indptr[:-1], self.out_degrees())
+        return (np.arange(self.n_edges) - starts + 1).astype(np.int16)
+
+    def nth_link(self, node: int, link_i: int) -> int:
+        """Target of the `link_i`-th link (1-based) of a node (MISSING if none)"""
+
+        links = self.links_of(node)
+
+        if self.ranks is None:
+            return int(links[link_i - 1]) if 0 < link_i <= len(links) else MISSING
+
+        match = np.flatnonzero(self.ranks_of(node) == link_i)
+        return int(links[match[0]]) if len(match) else MISSING
+
+    def nth_links(self, link_i: int) -> np.ndarray:
+        """Target of the `link_i`-th link of every node (MISSING if none)"""
+
+        targets = np.full(self.n_nodes, MISSING, dtype=np.int32)
+
+        if self.ranks is None:
+            has_link = self.out_degrees() >= link_i
+            targets[has_link] = self.indices[self.indptr[:-1][has_link] + link_i - 1]
+            return targets
+
+        match = self.ranks == link_i
+        targets[self.edge_sources()[match]] = self.indices[match]
+        return targets
+
+    # ====================================================================================
+    # STORAGE
+    # ====================================================================================
+
+    def save(self, path: str) -> None:
+        arrays = {"pageids": self.pageids, "indptr": self.indptr, "indices": self.indices}
+        if self.ranks is not None:
+            arrays["ranks"] = self.ranks
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "LinkGraph":
+        with np.load(path) as data:
+            ranks = data["ranks"] if "ranks" in data.files else None
+            return cls(data["pageids"], data["indptr"], data["indices"], ranks)
+
+    def print_stats(self):
+        print("Link graph:")
+        print(f"    nodes = {self.n_nodes}")
+        print(f"    links = {self.n_edges} ({np.count_nonzero(self.indices == MISSING)} outside the graph)")
+        print(f"    ranks stored = {self.ranks is not None}")
+        print(f"    size = {self.nbytes / 1e6:.1f} MB")
+
+    # ====================================================================================
+    # BUILDING
+    # ====================================================================================
+
+    @classmethod
+    def from_edges(cls, sources, ranks, targets, positional: bool = False) -> "LinkGraph":
+        """Build a graph from edge arrays
+
+        sources: pageid of the article of each link
+        ranks: rank (link i, 1-based) of each link
+        targets: pageid the link points to (MISSING if unknown)
+        positional: the ranks of every article are 1..n (ranks are not stored)
+        """
+
+        sources = np.asarray(sources, dtype=np.int64)
+        ranks = np.asarray(ranks, dtype=np.int16)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        ### intern every article linking or linked to
+
+        pageids = np.unique(np.concatenate([sources, targets[targets != MISSING]]))
+
+        ### sort the links by article, then rank
+
+        order = np.lexsort((ranks, sources))
+        sources, ranks, targets = sources[order], ranks[order], targets[order]
+
+        source_nodes = np.searchsorted(pageids, sources)
+        indptr = np.zeros(len(pageids) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(source_nodes, minlength=len(pageids)))
+
+        graph = cls(pageids, indptr, np.zeros(0, dtype=np.int32))
+        graph.indices = graph.nodes_of(targets)
+        graph.indices[targets == MISSING] = MISSING
+
+        if not positional:
+            graph.ranks = ranks
+
+        return graph
+
+    @classmethod
+    def from_link_table(cls, db_path: str, max_rank: int = MAX_LINK_EXTRACT) -> "LinkGraph":
+        """Build the graph of the first `max_rank` links of a link table"""
+
+        conn = sqlite3.connect(db_path)
+
+        # hrefs are normalized to titles here, then joined to pageids in SQLite
+        conn.execute(
+            "CREATE TEMP TABLE link_graph_edges (pageid INTEGER, rank INTEGER, title TEXT)"
+        )
+        rows = conn.execute(
+            "SELECT pageid, rank, href FROM link_table_links WHERE rank < ?",
+            (max_rank,),
+        )
+        _insert_edges(conn, ((pageid, rank + 1, href) for pageid, rank, href in rows))
+
+        edges = conn.execute(
+            """SELECT e.pageid, e.rank, COALESCE(t.pageid, ?)
+            FROM link_graph_edges e LEFT JOIN link_table_titles t ON t.title = e.title""",
+            (MISSING,),
+        )
+        graph = cls.from_edges(*_edge_arrays(edges), positional=True)
+
+        # articles without links
+        pages = np.fromiter(
+            (row[0] for row in conn.execute("SELECT pageid FROM link_table_pages")),
+            dtype=np.int64,
+        )
+        conn.close()
+
+        return graph._with_nodes(pages)
+
+    @classmethod
+    def from_link_index(
+        cls,
+        db_path: str,
+        resolution_db_path: str = TITLE_RESOLUTION_DB_PATH,
+        max_rank: int = MAX_LINK_EXTRACT,
+    ) -> "LinkGraph":
+        """Build the graph of the first `max_rank` links of a link index
+
+        Titles are mapped to pageids with the title resolution table
+        (title_resolver.py): unresolved articles are left out.
+        """
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("ATTACH DATABASE ? AS resolution", (resolution_db_path,))
+
+        # the links philhopper follows: outside parentheses, in rank order
+        conn.execute(
+            "CREATE TEMP TABLE link_graph_edges (pageid INTEGER, rank INTEGER, title TEXT)"
+        )
+        rows = conn.execute(
+            """SELECT r.pageid, l.title, l.href FROM link_index_links l
+            JOIN resolution.title_resolution r ON r.title = l.title
+            WHERE l.in_paren = 0 AND r.pageid IS NOT NULL
+            ORDER BY l.title, l.rank"""
+        )
+        _insert_edges(conn, _ranked(rows, max_rank))
+
+        edges = conn.execute(
+            """SELECT e.pageid, e.rank, COALESCE(r.pageid, ?)
+            FROM link_graph_edges e LEFT JOIN resolution.title_resolution r ON r.title = e.title""",
+            (MISSING,),
+        )
+        graph = cls.from_edges(*_edge_arrays(edges), positional=True)
+
+        pages = np.fromiter(
+            (
+                row[0]
+                for row in conn.execute(
+                    """SELECT r.pageid FROM link_index_pages p
+                    JOIN resolution.title_resolution r ON r.title = p.title
+                    WHERE r.pageid IS NOT NULL"""
+                )
+            ),
+            dtype=np.int64,
+        )
+        conn.close()
+
+        return graph._with_nodes(pages)
+
+    @classmethod
+    def from_traversal_tree(cls, db_path: str, resolve: bool = True) -> "LinkGraph":
+        """Build the graph of the links followed in a traversal tree (dao.py)
+
+        Each article of the tree has one link, its link i. The target is
+        the article the link points to: the article of the tree with the
+        title of the link, or else the pageid the title resolves to
+        (title_resolver.py, redirects included). The parent of the article
+        in the tree is used only for links that cannot be resolved.
+
+        resolve: resolve the titles missing from the tree (False: offline,
+                 the tree and the parents only)
+        """
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute(
+            """SELECT t.wiki_page_id, t.page_title, t.titleurl, t.ithlink, t.i, parent.wiki_page_id
+            FROM traversal_tree t LEFT JOIN traversal_tree parent ON parent.rowid = t.rowid_of_parent"""
+        ).fetchall()
+        conn.close()
+
+        pageid_of_title = {}
+        for pageid, page_title, titleurl, _, _, _ in rows:
+            for title in (page_title, titleurl):
+                if title:
+                    pageid_of_title[normalize_title(title)] = pageid
+
+        ### resolve the links to articles outside the tree
+
+        unknown = [
+            normalize_title(ithlink)
+            for _, _, _, ithlink, _, _ in rows
+            if ithlink is not None and normalize_title(ithlink) not in pageid_of_title
+        ]
+        if resolve and unknown:
+            from title_resolver import resolve_titles
+
+            for title, resolution in resolve_titles(unknown).items():
+                if resolution is not None:
+                    pageid_of_title[title] = resolution.pageid
+
+        sources, ranks, targets = [], [], []
+        for pageid, _, _, ithlink, link_i, parent_pageid in rows:
+            if ithlink is None:
+                continue
+
+            target = pageid_of_title.get(normalize_title(ithlink))
+            if target is None:
+                target = parent_pageid if parent_pageid is not None else MISSING
+
+            sources.append(pageid)
+            ranks.append(link_i)
+            targets.append(target)
+
+        graph = cls.from_edges(sources, ranks, targets)
+
+        return graph._with_nodes(np.array([row[0] for row in rows], dtype=np.int64))
+
+    def _with_nodes(self, pageids) -> "LinkGraph":
+        """This graph with extra articles (without links) interned"""
+
+        pageids = np.asarray(pageids, dtype=np.int64)
+        new = np.setdiff1d(pageids, self.pageids)
+        if len(new) == 0:
+            return self
+
+        all_pageids = np.union1d(self.pageids, new)
+
+        # remap the nodes, and give the new ones an empty row
+        remap = np.searchsorted(all_pageids, self.pageids).astype(np.int32)
+        degrees = np.zeros(len(all_pageids), dtype=np.int64)
+        degrees[remap] = self.out_degrees()
+
+        indptr = np.zeros(len(all_pageids) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(degrees)
+
+        indices = np.where(self.indices == MISSING, MISSING, remap[self.indices])
+
+        return LinkGraph(all_pageids, indptr, indices, self.ranks)
+
+
+def _insert_edges(conn, rows) -> None:
+    """Insert (pageid, rank, href) rows into the temporary edge table, as titles"""
+
+    batch = []
+    for pageid, rank, href in rows:
+        batch.append((pageid, rank, normalize_title(href)))
+        if len(batch) >= FETCH_SIZE:
+            conn.executemany("INSERT INTO link_graph_edges VALUES (?, ?, ?)", batch)
+            batch = []
+
+    conn.executemany("INSERT INTO link_graph_edges VALUES (?, ?, ?)", batch)
+
+
+def _ranked(rows, max_rank: int):
+    """Number the (pageid, title, href) rows of each article 1, 2, ..."""
+
+    current, rank = None, 0
+    for pageid, title, href in rows:
+        rank = rank + 1 if title == current else 1
+        current = title
+        if rank <= max_rank:
+            yield (pageid, rank, href)
+
+
+def _edge_arrays(edges) -> tuple:
+    """Read (source, rank, target) rows into compact arrays"""
+
+    sources, ranks, targets = array.array("q"), array.array("h"), array.array("q")
+    while True:
+        rows = edges.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for source, rank, target in rows:
+            sources.append(source)
+            ranks.append(rank)
+            targets.append(target)
+
+    return (
+        np.frombuffer(sources, dtype=np.int64),
+        np.frombuffer(ranks, dtype=np.int16),
+        np.frombuffer(targets, dtype=np.int64),
+    )
+
+
+def load_graph(db_path: str) -> LinkGraph:
+    """Build the graph of a link table, link index or traversal tree database
+    (or load a graph saved as .npz)"""
+
+    if db_path.endswith(".npz"):
+        return LinkGraph.load(db_path)
+
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    conn.close()
+
+    if "link_table_links" in tables:
+        return LinkGraph.from_link_table(db_path)
+    if "link_index_links" in tables:
+        return LinkGraph.from_link_index(db_path)
+    if "traversal_tree" in tables:
+        return LinkGraph.from_traversal_tree(db_path)
+
+    raise ValueError(f"No link table, link index or traversal tree in {db_path}")
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+def test_inconsistent_parents():
+    """Links followed in a traversal tree win over its parent pointers
+
+    Field_hockey links to Team_sport, but its parent row is Proposition
+    (and Proposition's is Field_hockey): following the parents would
+    give a cycle Philosophy cannot be reached from.
+    """
+
+    import tempfile
+
+    from dao import TreeDao
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "traversal_tree.db")
+        TreeDao(db_path).close()  # creates the tree, with Philosophy at rowid 1
+
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            """INSERT INTO traversal_tree (rowid, wiki_page_id, page_title, ithlink, i, fullurl, titleurl, rowid_of_parent)
+            VALUES (?, ?, ?, ?, 1, NULL, ?, ?)""",
+            [
+                (2, 10886, "Field_hockey", "/wiki/Team_sport", "Field_hockey", 3),
+                (3, 81094, "Proposition", "/wiki/Philosophy", "Proposition", 2),
+                (4, 988407, "Team_sport", "/wiki/Philosophy", "Team_sport", 1),
+                (5, 5, "Orphan", "/wiki/Unresolved_title", "Orphan", 4),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        graph = LinkGraph.from_traversal_tree(db_path, resolve=False)
+
+    def first_link(pageid):
+        return graph.pageid_of(graph.nth_link(graph.node_of(pageid), 1))
+
+    assert first_link(10886) == 988407  # Team_sport, not the parent
+    assert first_link(81094) == WIKI_PAGEID_OF_PHILOSOPHY
+    assert first_link(988407) == WIKI_PAGEID_OF_PHILOSOPHY
+    assert first_link(5) == 988407  # unresolved: the parent
+
+    print("Traversal tree with inconsistent parents: ok")
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    if "--test" in sys.argv:
+        test_inconsistent_parents()
+        sys.exit(0)
+
+    if len(sys.argv) < 2:
+        print("Usage: python link_graph.py <link table | link index | traversal tree db> [<graph.npz>] | --test")
+        sys.exit(1)
+
+    db_file = sys.argv[1]
+    if not os.path.exists(db_file):
+        print(f"Database not found: {db_file}")
+        sys.exit(1)
+
+    start = time.time()
+    graph = load_graph(db_file)
+    print(f"Built the link graph of {db_file} in {time.time() - start:.1f} seconds")
+    graph.print_stats()
+
+    philosophy = graph.node_of(WIKI_PAGEID_OF_PHILOSOPHY)
+    if philosophy != MISSING:
+        print(f"    Philosophy: node {philosophy}, first link -> {graph.nth_link(philosophy, 1)}")
+
+    if len(sys.argv) > 2:
+        graph.save(sys.argv[2])
+        print(f"Saved to {sys.argv[2]}")
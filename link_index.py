@@ -0,0 +1,363 @@
+""" link_index.py
+
+    Ranked link index: the extraction result of each page
+    revision, shared by every strategy.
+
+    Each page is parsed once per revision. The index keeps
+    the full ordered list of candidate links of the first
+    paragraphs (href, text, title attribute, paragraph
+    index, inside parentheses or not), in memory and in an
+    SQLite table. Any link rank, or the whole list, is then
+    a lookup:
+        - `IndexedPage.link_tuples()` is the result of
+          `extract_links_from_html` (research, bert_hopper)
+        - `IndexedPage.nth_link(i)` is the i-th link of the
+          first paragraphs (philhopper, hop2phil)
+
+    The revision of a page is its `wgRevisionId` when the
+    html has one, a hash of the html otherwise (lead
+    fragments, parse API, dumps): a stored list is reused
+    only for the revision it was built from.
+
+    Running this file indexes test.html and prints its links.
+"""
+
+import collections
+import hashlib
+import re
+import sqlite3
+import threading
+
+from config import LINK_INDEX_PATH, LINK_INDEX_MEMORY_SIZE
+from extraction import (
+    MAX_PARAGRAPHS,
+    clean_soup,
+    find_paragraphs,
+    fallback_links,
+    paragraph_anchors,
+    filter_article_links,
+)
+from helpers import normalize_title
+from page_source import get_page_html
+from singleflight import SingleFlight
+from stream_extraction import stream_paragraphs
+
+# revision of an article, as embedded in the html of the live site
+RE_REVISION_ID = re.compile(r'"wgRevisionId":(\d+)')
+
+# paragraph index of the links of the whole-page fallback
+FALLBACK_PARAGRAPH = -1
+
+# a candidate link of a page, in document order
+Candidate = collections.namedtuple(
+    "Candidate", ["rank", "href", "text", "title", "paragraph", "in_paren"]
+)
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def revision_of(html: str) -> str:
+    """Return the revision of the article behind some html"""
+
+    match = RE_REVISION_ID.search(html)
+    if match:
+        return match.group(1)
+
+    return "sha1:" + hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+
+def index_html(html: str) -> list:
+    """Return the ranked candidate links of an article
+
+    The first paragraphs are read with the streaming parser when it
+    applies; the whole page is parsed only for the fallback strategy.
+    """
+
+    soup = None
+    ps = stream_paragraphs(html)
+    if ps is None:
+        soup = clean_soup(html)
+        ps = find_paragraphs(soup)[:MAX_PARAGRAPHS]
+
+    candidates = []
+    for paragraph_n, paragraph in enumerate(ps):
+        for a, in_paren in paragraph_anchors(paragraph):
+            candidates.append(
+                Candidate(
+                    len(candidates), a["href"], a.text, a.get("title"), paragraph_n, in_paren
+                )
+            )
+
+    ### no link outside parentheses: the links of the whole page
+
+    if all(c.in_paren for c in candidates):
+        if soup is None:
+            soup = clean_soup(html)
+
+        for a in fallback_links(soup):
+            candidates.append(
+                Candidate(
+                    len(candidates), a["href"], a.text, a.get("title"), FALLBACK_PARAGRAPH, False
+                )
+            )
+
+    return candidates
+
+
+# =============================================================================
+# INDEXED PAGE
+# =============================================================================
+
+
+class IndexedPage:
+    """The ranked candidate links of one page revision"""
+
+    def __init__(self, title: str, revision: str, candidates: list):
+        self.title = title
+        self.revision = revision
+        self.candidates = candidates
+
+        # the links the extractor follows, in order
+        self.links = [c for c in candidates if not c.in_paren]
+
+    def link_tuples(self, limit: int = None) -> list:
+        """(link, link_text) tuples, as returned by `extract_links_all`"""
+
+        ret = filter_article_links([(c.href, c.text.strip()) for c in self.links])
+        return ret[:limit] if limit is not None else ret
+
+    def nth_link(self, link_i: int) -> Candidate:
+        """The `link_i`-th link (1-based) of the first paragraphs (None if missing)"""
+
+        if link_i < 1 or link_i > len(self.links):
+            return None
+
+        return self.links[link_i - 1]
+
+
+# =============================================================================
+# LINK INDEX
+# =============================================================================
+
+
+class LinkIndex:
+    """Ranked candidate links per page revision, in memory and on disk"""
+
+    def __init__(self, db_path: str, memory_size: int = LINK_INDEX_MEMORY_SIZE):
+        """
+        db_path: path of the SQLite database
+        memory_size: number of pages kept in memory
+        """
+
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.memory = collections.OrderedDict()  # title -> IndexedPage
+
+        # statistics of this process
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.builds = 0
+
+        self.lock = threading.Lock()
+        self.builds_in_flight = SingleFlight()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.c = self.conn.cursor()
+
+        self.create_db()
+
+    def close(self):
+        self.conn.close()
+
+    def create_db(self):
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS link_index_pages (
+            title TEXT PRIMARY KEY,
+            revision TEXT
+        )"""
+        )
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS link_index_links (
+            title TEXT,
+            rank INTEGER,
+            href TEXT,
+            text TEXT,
+            link_title TEXT,
+            paragraph INTEGER,
+            in_paren INTEGER,
+            PRIMARY KEY (title, rank)
+        )"""
+        )
+        self.conn.commit()
+
+    # ====================================================================================
+    # GETTERS
+    # ====================================================================================
+
+    def get(self, page_url: str, session=None, html: str = None) -> IndexedPage:
+        """Return the indexed links of an article (None if it is not available)
+
+        html: html of the article, when the caller already has it
+              (default: read from the page source)
+
+        The links in memory are reused only for the current revision of
+        the article.
+        """
+
+        title = normalize_title(page_url)
+
+        if html is None:
+            html = get_page_html(page_url, session)
+        if html is None:
+            return None
+
+        revision = revision_of(html)
+
+        with self.lock:
+            page = self.memory.get(title)
+            if page is not None and page.revision == revision:
+                self.memory.move_to_end(title)
+                self.memory_hits += 1
+                return page
+
+        return self.builds_in_flight.do(
+            (title, revision), self._load, title, revision, html
+        )
+
+    def known_revision(self, page_url: str) -> str:
+        """Return the revision an article was last indexed at, from memory or
+        disk, without fetching it (None if it was never indexed)"""
+
+        title = normalize_title(page_url)
+
+        with self.lock:
+            page = self.memory.get(title)
+            if page is not None:
+                return page.revision
+
+            self.c.execute(
+                "SELECT revision FROM link_index_pages WHERE title = ?", (title,)
+            )
+            result = self.c.fetchone()
+
+        return result[0] if result is not None else None
+
+    def _load(self, title: str, revision: str, html: str) -> IndexedPage:
+        page = self._read(title, revision)
+        if page is not None:
+            self.disk_hits += 1
+        else:
+            page = IndexedPage(title, revision, index_html(html))
+            self._write(page)
+            self.builds += 1
+
+        with self.lock:
+            self.memory[title] = page
+            self.memory.move_to_end(title)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+        return page
+
+    def _read(self, title: str, revision: str) -> IndexedPage:
+        """The stored links of a page revision (None if not stored)"""
+
+        with self.lock:
+            self.c.execute(
+                "SELECT revision FROM link_index_pages WHERE title = ?", (title,)
+            )
+            result = self.c.fetchone()
+            if result is None or result[0] != revision:
+                return None
+
+            self.c.execute(
+                "SELECT rank, href, text, link_title, paragraph, in_paren FROM link_index_links WHERE title = ? ORDER BY rank",
+                (title,),
+            )
+            rows = self.c.fetchall()
+
+        candidates = [
+            Candidate(rank, href, text, link_title, paragraph, bool(in_paren))
+            for rank, href, text, link_title, paragraph, in_paren in rows
+        ]
+        return IndexedPage(title, revision, candidates)
+
+    def _write(self, page: IndexedPage) -> None:
+        with self.lock:
+            self.c.execute("DELETE FROM link_index_links WHERE title = ?", (page.title,))
+            self.c.execute(
+                "INSERT OR REPLACE INTO link_index_pages (title, revision) VALUES (?, ?)",
+                (page.title, page.revision),
+            )
+            self.c.executemany(
+                "INSERT INTO link_index_links (title, rank, href, text, link_title, paragraph, in_paren) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(page.title,) + tuple(c[:5]) + (int(c.in_paren),) for c in page.candidates],
+            )
+            self.conn.commit()
+
+    def print_stats(self):
+        print("Link index:")
+        print(f"    path = {self.db_path}")
+        print(f"    pages in memory = {len(self.memory)} / {self.memory_size}")
+        print(f"    memory hits = {self.memory_hits}, disk hits = {self.disk_hits}, builds = {self.builds}")
+
+
+# =============================================================================
+# SHARED INDEX
+# =============================================================================
+
+
+def get_link_index() -> LinkIndex:
+    """Return the shared link index of this process (None if disabled)"""
+
+    global _INDEX
+
+    if LINK_INDEX_PATH is None:
+        return None
+
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = LinkIndex(LINK_INDEX_PATH)
+
+    return _INDEX
+
+
+def indexed_page(page_url: str, session=None, html: str = None) -> IndexedPage:
+    """Return the indexed links of an article (None if it is not available)
+
+    Without a shared index (LINK_INDEX_PATH = None) the page is indexed
+    again at every call.
+    """
+
+    index = get_link_index()
+    if index is not None:
+        return index.get(page_url, session, html)
+
+    if html is None:
+        html = get_page_html(page_url, session)
+    if html is None:
+        return None
+
+    return IndexedPage(normalize_title(page_url), revision_of(html), index_html(html))
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+if __name__ == "__main__":
+    from extraction import extract_links_from_html
+
+    with open("test.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    page = IndexedPage("Test", revision_of(html), index_html(html))
+
+    print(f"Indexed test.html (revision {page.revision})")
+    for c in page.candidates:
+        flag = " (in parentheses)" if c.in_paren else ""
+        print(f"    {c.rank}: [p{c.paragraph}] {c.href} ({c.text}){flag}")
+
+    print(f"    same links = {page.link_tuples() == extract_links_from_html(html)}")
+    print(f"    3rd link = {page.nth_link(3)}")
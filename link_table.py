@@ -0,0 +1,259 @@
+""" link_table.py
+
+    Precomputed table of the first links of every article
+    of a local dump.
+
+    A batch job reads every main-namespace article of a
+    dump index (see wikidump.py), extracts its first
+    `MAX_LINK_EXTRACT` links with the rules of
+    `extract_links_all` and stores them (rank, href, anchor
+    text) in an indexed SQLite table, along with the titles
+    of the articles and of their redirects.
+
+    When `LINK_TABLE_PATH` is set in config.py,
+    `extract_links_all` answers from the table: traversals
+    run without downloading or parsing any html. Only the
+    first `MAX_LINK_EXTRACT` links of an article are stored.
+
+    The articles are parsed on all cores (see
+    extraction_pool.py). The job can be interrupted and
+    resumed: articles already in the table are skipped.
+
+    Usage:
+        python link_table.py [<dump index db>] [<link table db>]
+"""
+
+import itertools
+import os
+import sqlite3
+import sys
+import threading
+
+import tqdm
+
+from config import (
+    MAX_LINK_EXTRACT,
+    DEFAULT_DUMP_DB_NAME,
+    DEFAULT_LINK_TABLE_NAME,
+    LINK_TABLE_PATH,
+    EXTRACTION_PROCESSES,
+)
+from extraction_pool import ExtractionPool
+from helpers import normalize_title
+
+# number of articles written per transaction
+BATCH_SIZE = 1000
+
+_TABLE = None
+_TABLE_LOCK = threading.Lock()
+
+
+# =============================================================================
+# LINK TABLE
+# =============================================================================
+
+
+class LinkTable:
+    """First links of the articles of a dump, by title and pageid"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.c = self.conn.cursor()
+
+        self.create_db()
+
+    def close(self):
+        self.conn.close()
+
+    def create_db(self):
+        # every article, with the number of links found
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS link_table_pages (
+            pageid INTEGER PRIMARY KEY,
+            title TEXT,
+            n_links INTEGER
+        )"""
+        )
+        # titles of the articles and of their redirects
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS link_table_titles (
+            title TEXT PRIMARY KEY,
+            pageid INTEGER
+        )"""
+        )
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS link_table_links (
+            pageid INTEGER,
+            rank INTEGER,
+            href TEXT,
+            text TEXT,
+            PRIMARY KEY (pageid, rank)
+        )"""
+        )
+        self.conn.commit()
+
+    # ====================================================================================
+    # BUILDING
+    # ====================================================================================
+
+    def build(self, dump, limit: int = None, processes: int = EXTRACTION_PROCESSES) -> int:
+        """Extract the first links of every article of a dump index
+
+        dump: WikiDump to read the articles from
+        limit: max number of articles to add (None: all)
+        processes: number of extraction processes (None: one per core)
+
+        Returns the number of articles added.
+        """
+
+        print(f"Extracting the first {MAX_LINK_EXTRACT} links of the articles of {dump.db_path}...")
+
+        self.c.execute("SELECT pageid FROM link_table_pages")
+        done = {row[0] for row in self.c.fetchall()}
+        if done:
+            print(f"Resuming: {len(done)} articles already in {self.db_path}")
+
+        pages = (
+            ((pageid, title), html)
+            for pageid, title, html in dump.iter_articles()
+            if pageid not in done
+        )
+        total = dump.count() - len(done)
+        if limit is not None:
+            pages = itertools.islice(pages, limit)
+            total = min(total, limit)
+
+        n_added = 0
+        batch = []
+        with ExtractionPool(processes) as pool:
+            results = pool.imap(pages, MAX_LINK_EXTRACT)
+            for (pageid, title), links in tqdm.tqdm(results, total=total):
+                if not isinstance(links, list):
+                    links = []
+
+                batch.append((pageid, title, links))
+
+                if len(batch) >= BATCH_SIZE:
+                    n_added += self._insert(batch)
+                    batch = []
+
+        n_added += self._insert(batch)
+
+        self.add_redirects(dump)
+
+        print(f"Done. Added {n_added} articles")
+        return n_added
+
+    def _insert(self, batch: list) -> int:
+        with self.lock:
+            self.c.executemany(
+                "INSERT OR REPLACE INTO link_table_pages (pageid, title, n_links) VALUES (?, ?, ?)",
+                [(pageid, title, len(links)) for pageid, title, links in batch],
+            )
+            self.c.executemany(
+                "INSERT OR REPLACE INTO link_table_titles (title, pageid) VALUES (?, ?)",
+                [(title, pageid) for pageid, title, _ in batch],
+            )
+            self.c.executemany(
+                "INSERT OR REPLACE INTO link_table_links (pageid, rank, href, text) VALUES (?, ?, ?, ?)",
+                [
+                    (pageid, rank, href, text)
+                    for pageid, _, links in batch
+                    for rank, (href, text) in enumerate(links)
+                ],
+            )
+            self.conn.commit()
+
+        return len(batch)
+
+    def add_redirects(self, dump) -> None:
+        """Map the redirects of a dump index to the articles they point to"""
+
+        with self.lock:
+            self.c.executemany(
+                "INSERT OR IGNORE INTO link_table_titles (title, pageid) SELECT ?, pageid FROM link_table_titles WHERE title = ?",
+                dump.iter_redirects(),
+            )
+            self.conn.commit()
+
+    # ====================================================================================
+    # GETTERS
+    # ====================================================================================
+
+    def pageid_of(self, page_url: str) -> int:
+        """Return the pageid of the article behind a url or title (None if unknown)"""
+
+        with self.lock:
+            self.c.execute(
+                "SELECT pageid FROM link_table_titles WHERE title = ?",
+                (normalize_title(page_url),),
+            )
+            result = self.c.fetchone()
+
+        return result[0] if result is not None else None
+
+    def links_of(self, page_url: str) -> list:
+        """Return the (link, link_text) tuples of an article, in order
+        (None if the article is not in the table)"""
+
+        pageid = self.pageid_of(page_url)
+        if pageid is None:
+            return None
+
+        return self.links_of_pageid(pageid)
+
+    def links_of_pageid(self, pageid: int) -> list:
+        """Return the (link, link_text) tuples of an article by pageid, in order"""
+
+        with self.lock:
+            self.c.execute(
+                "SELECT href, text FROM link_table_links WHERE pageid = ? ORDER BY rank",
+                (pageid,),
+            )
+            return self.c.fetchall()
+
+    def count(self) -> int:
+        with self.lock:
+            self.c.execute("SELECT COUNT(*) FROM link_table_pages")
+            return self.c.fetchone()[0]
+
+
+# =============================================================================
+# SHARED TABLE
+# =============================================================================
+
+
+def get_link_table() -> LinkTable:
+    """Return the link table in use (None if links are extracted from html)"""
+
+    global _TABLE
+
+    if LINK_TABLE_PATH is None:
+        return None
+
+    if _TABLE is None:
+        with _TABLE_LOCK:
+            if _TABLE is None:
+                _TABLE = LinkTable(LINK_TABLE_PATH)
+
+    return _TABLE
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    from wikidump import WikiDump
+
+    dump_db_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DUMP_DB_NAME
+    table_db_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_LINK_TABLE_NAME
+
+    if not os.path.exists(dump_db_file):
+        print(f"Dump index not found: {dump_db_file}")
+        print("Build it first with: python wikidump.py <dump file>")
+        sys.exit(1)
+
+    LinkTable(table_db_file).build(WikiDump(dump_db_file))
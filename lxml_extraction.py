@@ -0,0 +1,239 @@
+""" lxml_extraction.py
+
+    C-accelerated backend of the link extraction, built on
+    lxml (libxml2) instead of BeautifulSoup.
+
+    Implements the rules of `extract_links_from_html`
+    (extraction.py) on an lxml tree: same cleanup, same
+    paragraphs, same parentheses check on the serialized
+    html, same fallback and post-processing, several times
+    faster.
+
+    On broken markup libxml2 builds another tree than
+    html.parser: it closes an open paragraph at the next
+    block element or paragraph, ignores stray end tags, and
+    so on. The tags of the html are scanned first: unless
+    they are strictly nested (every element closed by its
+    own end tag, no block element or paragraph inside a
+    paragraph, no link inside a link), the article is handed
+    over to the reference extractor, so the links are always
+    the same as `extract_links_from_html`.
+
+    Select it with `PARSER_BACKEND = "lxml"` (config.py) or
+    `extraction.use_parser_backend("lxml")`.
+
+    Running this file compares both extractors on test.html.
+"""
+
+import re
+
+from bs4.builder import HTMLTreeBuilder
+from lxml import etree
+from lxml import html as lxml_html
+
+from extraction import MAX_PARAGRAPHS, filter_article_links, reference_links_from_html
+from helpers import anchors_in_parentheses
+
+# comments, declarations, raw text elements and tags of html
+RE_MARKUP = re.compile(
+    r"<!--.*?-->|<![^>]*>|<\?[^>]*>"
+    r"|<(script|style)\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*>.*?</\1\s*>"
+    r"|<(/?)([a-zA-Z][^\s/>]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>",
+    re.S | re.I,
+)
+
+# elements without an end tag (as treated by BeautifulSoup)
+VOID_ELEMENTS = frozenset(
+    getattr(HTMLTreeBuilder, "DEFAULT_EMPTY_ELEMENT_TAGS", None)
+    or HTMLTreeBuilder.empty_element_tags
+)
+
+# elements libxml2 closes an open paragraph at
+BLOCK_ELEMENTS = frozenset(
+    """
+    address article aside blockquote center dd details dialog dir div dl dt
+    fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 header hgroup hr
+    li listing main menu nav ol p pre section table ul xmp
+    """.split()
+)
+
+
+def _has_class(*names) -> str:
+    """XPath predicate: the element has one of the classes `names`"""
+    return " or ".join(
+        f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+        for name in names
+    )
+
+
+# elements removed before reading the paragraphs (thumbnails, tables, notes)
+XPATH_REMOVED = f'//div[{_has_class("thumb", "hatnote")}] | //table'
+
+# containers of the article paragraphs
+XPATH_CONTAINERS = (
+    f'//div[{_has_class("mw-parser-output", "mw-body-content", "vector-body")}]'
+)
+
+
+def _to_html(element) -> str:
+    """Serialize an element without the text following it"""
+    return etree.tostring(element, encoding=str, method="html", with_tail=False)
+
+
+def _is_article_link(a) -> bool:
+    href = a.get("href")
+    return href is not None and href.startswith("/wiki/")
+
+
+def _paragraph_links(paragraph) -> list:
+    """Anchors of a paragraph linking to articles, outside parentheses"""
+
+    anchors = [a for a in paragraph.iter("a") if _is_article_link(a)]
+    html_of = {id(a): _to_html(a) for a in anchors}
+    in_paren = anchors_in_parentheses(_to_html(paragraph), html_of.values())
+
+    return [a for a in anchors if html_of[id(a)] not in in_paren]
+
+
+def strictly_nested(data: str) -> bool:
+    """Check if html.parser and libxml2 build the same tree of some html
+
+    True if every element is closed by its own end tag, and there is no
+    block element or paragraph inside a paragraph, no link inside a link,
+    and no self-closed element that has an end tag.
+    """
+
+    stack = []
+    n_p = 0  # open paragraphs
+    n_a = 0  # open links
+
+    for match in RE_MARKUP.finditer(data):
+        tag = match.group(3)
+        if tag is None:
+            # comment, declaration, script or style
+            continue
+
+        tag = tag.lower()
+        if tag in VOID_ELEMENTS:
+            continue
+
+        if match.group(2):
+            # end tag: it must close the last element opened
+            if not stack or stack.pop() != tag:
+                return False
+            if tag == "p":
+                n_p -= 1
+            elif tag == "a":
+                n_a -= 1
+            continue
+
+        if match.group(4).rstrip().endswith("/"):
+            # <div/> is empty for html.parser, left open by libxml2
+            return False
+
+        if (n_p > 0 and tag in BLOCK_ELEMENTS) or (n_a > 0 and tag == "a"):
+            return False
+
+        stack.append(tag)
+        if tag == "p":
+            n_p += 1
+        elif tag == "a":
+            n_a += 1
+
+    return not stack
+
+
+# =============================================================================
+# EXTRACTION
+# =============================================================================
+
+
+def lxml_links_from_html(data: str, limit: int = None) -> list:
+    """
+    Extract the links of a Wikipedia article like `extract_links_from_html`
+    data: html of the Wikipedia article
+    limit: max number of links returned (None: all links found)
+    """
+
+    # the trees of both parsers may differ: the reference decides
+    if not strictly_nested(data):
+        return reference_links_from_html(data, limit)
+
+    try:
+        root = lxml_html.document_fromstring(data)
+    except (etree.ParserError, ValueError):
+        # empty document
+        return []
+
+    ### clean up the html (drop_tree keeps the text following the element)
+
+    for element in root.xpath(XPATH_REMOVED):
+        element.drop_tree()
+
+    ### paragraphs of the containers (nested containers repeat them)
+
+    ps = []
+    for container in root.xpath(XPATH_CONTAINERS):
+        ps += container.iter("p")
+
+    ### extract links from the first paragraphs
+
+    links = []
+    for paragraph in ps[:MAX_PARAGRAPHS]:
+        links += _paragraph_links(paragraph)
+
+    ### if no links found, look at the whole page
+
+    if len(links) == 0:
+        links = [a for a in root.iter("a") if _is_article_link(a)]
+
+        html_of = {id(a): _to_html(a) for a in links}
+        in_paren = anchors_in_parentheses(_to_html(root), html_of.values())
+
+        # like list.remove on BeautifulSoup tags, which compare equal when
+        # their html is the same: removing while iterating skips the next one
+        for a in links:
+            if html_of[id(a)] in in_paren:
+                for i, other in enumerate(links):
+                    if html_of[id(other)] == html_of[id(a)]:
+                        del links[i]
+                        break
+
+    ### post-processing
+
+    ret = filter_article_links([(a.get("href"), a.text_content().strip()) for a in links])
+
+    if limit is not None:
+        ret = ret[:limit]
+
+    return ret
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    from extraction import extract_links_from_html
+
+    with open("test.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    n_runs = 20
+
+    start = time.time()
+    for _ in range(n_runs):
+        reference = extract_links_from_html(html)
+    reference_time = (time.time() - start) / n_runs
+
+    start = time.time()
+    for _ in range(n_runs):
+        links = lxml_links_from_html(html)
+    lxml_time = (time.time() - start) / n_runs
+
+    print("Extracting links from test.html")
+    print(f"    html.parser = {reference_time * 1000:.1f} ms")
+    print(f"    lxml = {lxml_time * 1000:.1f} ms")
+    print(f"    same links = {links == reference}")
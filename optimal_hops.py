@@ -0,0 +1,172 @@
+""" optimal_hops.py
+
+    Shortest hop count from every article to Philosophy.
+
+    A selection strategy picks one of the first candidate
+    links of each article; the best any strategy can do is
+    the shortest path to Philosophy in the graph of these
+    candidate links. It is computed for every article at
+    once with a single breadth-first search from Philosophy
+    over the reversed links of the link graph
+    (link_graph.py), in time linear in the number of links
+    (each level only visits the links of its frontier).
+
+    Distances are hop counts, as returned by the hoppers
+    (Philosophy itself is 0 hops away). Articles from which
+    Philosophy cannot be reached have no distance
+    (UNREACHABLE).
+
+    Usage:
+        python optimal_hops.py <graph.npz | link table | link index db> [<max rank>]
+"""
+
+import sys
+
+import numpy as np
+
+from config import MAX_LINK_EXTRACT, OPTIMAL_HOPS_GRAPH_PATH, WIKI_PAGEID_OF_PHILOSOPHY
+from link_graph import MISSING, LinkGraph, load_graph
+
+# distance of an article Philosophy cannot be reached from
+UNREACHABLE = -1
+
+
+# =============================================================================
+# REVERSE BFS
+# =============================================================================
+
+
+def reversed_links(graph: LinkGraph, max_rank: int = MAX_LINK_EXTRACT) -> tuple:
+    """Return the links of rank <= `max_rank` as reversed CSR arrays
+
+    Returns:
+        (indptr, sources): the articles linking to node n are
+        sources[indptr[n]:indptr[n + 1]]
+    """
+
+    targets = graph.indices
+    keep = (targets != MISSING) & (graph.edge_ranks() <= max_rank)
+    sources, targets = graph.edge_sources()[keep], targets[keep]
+
+    order = np.argsort(targets)
+    indptr = np.zeros(graph.n_nodes + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(targets, minlength=graph.n_nodes))
+
+    return indptr, sources[order]
+
+
+def hop_distances(graph: LinkGraph, target: int, max_rank: int = MAX_LINK_EXTRACT) -> np.ndarray:
+    """Shortest hop count from every node to the node `target`
+    (UNREACHABLE if there is no path), following links of rank <= `max_rank`
+    """
+
+    distances = np.full(graph.n_nodes, UNREACHABLE, dtype=np.int32)
+    if target == MISSING:
+        return distances
+
+    indptr, sources = reversed_links(graph, max_rank)
+
+    distances[target] = 0
+    frontier = np.array([target], dtype=np.int64)
+    hops = 0
+
+    while len(frontier) > 0:
+        hops += 1
+
+        # every article linking to the frontier
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        linking = sources[offsets + np.arange(counts.sum())]
+
+        # the next frontier: the articles reached for the first time
+        frontier = np.unique(linking[distances[linking] == UNREACHABLE])
+        distances[frontier] = hops
+
+    return distances
+
+
+# =============================================================================
+# ORACLE
+# =============================================================================
+
+
+class OptimalHops:
+    """Shortest hop counts to Philosophy of the articles of a link graph"""
+
+    def __init__(self, graph: LinkGraph, max_rank: int = MAX_LINK_EXTRACT):
+        """
+        graph: link graph of the articles
+        max_rank: links a strategy can choose from (the first `max_rank`)
+        """
+
+        self.graph = graph
+        self.max_rank = max_rank
+        self.distances = hop_distances(
+            graph, graph.node_of(WIKI_PAGEID_OF_PHILOSOPHY), max_rank
+        )
+
+    def hops_of(self, pageid: int) -> int:
+        """Shortest hop count from an article to Philosophy
+        (None if it is not in the graph or Philosophy cannot be reached)
+        """
+
+        node = self.graph.node_of(pageid)
+        if node == MISSING or self.distances[node] == UNREACHABLE:
+            return None
+
+        return int(self.distances[node])
+
+    def hops_of_url(self, url: str) -> int:
+        """Shortest hop count from an article, by url or title (see `hops_of`)"""
+
+        from title_resolver import resolve_title
+
+        resolution = resolve_title(url)
+        if resolution is None:
+            return None
+
+        return self.hops_of(resolution.pageid)
+
+    def print_stats(self):
+        reached = self.distances[self.distances != UNREACHABLE]
+
+        print("Optimal hops to Philosophy:")
+        print(f"    articles = {self.graph.n_nodes}")
+        print(f"    candidate links = first {self.max_rank}")
+        print(f"    Philosophy reachable = {len(reached)}")
+        if len(reached) > 0:
+            print(f"    hops: mean = {reached.mean():.2f}, max = {reached.max()}")
+            histogram = np.bincount(reached)
+            for hops, n in enumerate(histogram[:10]):
+                print(f"        {hops} hops: {n}")
+
+
+def load_optimal_hops(graph_path: str = OPTIMAL_HOPS_GRAPH_PATH, max_rank: int = MAX_LINK_EXTRACT) -> OptimalHops:
+    """Return the oracle of a link graph (None if no graph is configured)"""
+
+    if graph_path is None:
+        return None
+
+    return OptimalHops(load_graph(graph_path), max_rank)
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python optimal_hops.py <graph.npz | link table | link index db> [<max rank>]")
+        sys.exit(1)
+
+    graph = load_graph(sys.argv[1])
+    max_rank = int(sys.argv[2]) if len(sys.argv) > 2 else MAX_LINK_EXTRACT
+
+    start = time.time()
+    oracle = OptimalHops(graph, max_rank)
+    print(f"Searched {graph.n_nodes} articles in {time.time() - start:.2f} seconds")
+
+    oracle.print_stats()
@@ -0,0 +1,390 @@
+""" page_cache.py
+
+    Persistent on-disk cache of Wikipedia article HTML,
+    shared by every fetch path of the project (see
+    page_source.py).
+
+    Articles are keyed by their canonical title (the
+    pageid is stored alongside, when it can be read from
+    the html). The cache has a size cap: when it is full,
+    the least recently used articles are evicted.
+
+    In cache-only mode a miss never triggers a download,
+    so experiments can be re-run fully offline.
+
+    The last access time of an article is updated at most
+    once per `access_granularity` seconds: most hits only
+    read the cache.
+
+    Each article is stored with the fetch mode it was
+    downloaded in ("full" page or "lead" section only, see
+    page_source.py): a lead section is not served as the
+    full page.
+
+    Each article is stored with the validators sent by the
+    server (ETag, Last-Modified). Once an article is older
+    than `max_age`, it is revalidated with a conditional
+    request instead of being downloaded again.
+
+    With `lead_only`, only the compressed lead fragment of
+    each article is stored (see lead_fragment.py): the link
+    extractors read it exactly like the full html, at about
+    a hundredth of its size. With `store_text`, the
+    compressed plaintext of each article is kept alongside
+    its fragment, for the BERT hopper (see article_text.py).
+"""
+
+import collections
+import re
+import sqlite3
+import threading
+import time
+
+from bs4 import BeautifulSoup
+
+from helpers import normalize_title
+from article_text import html_to_text
+from lead_fragment import make_lead_fragment, encode_fragment, decode_fragment
+
+# pageid of an article, as embedded in the html of the live site
+RE_PAGEID = re.compile(r'"wgArticleId":(\d+)')
+
+# fetch mode of the articles cached before it was stored
+DEFAULT_FETCH_MODE = "full"
+
+# a cached article with its validators, and the fetch mode it was downloaded in
+CacheEntry = collections.namedtuple(
+    "CacheEntry", ["title", "html", "etag", "last_modified", "fetched_at", "fetch_mode"]
+)
+
+
+# =============================================================================
+# PAGE CACHE
+# =============================================================================
+
+
+class PageCache:
+    """SQLite-backed LRU cache of article html"""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_bytes: int,
+        cache_only: bool = False,
+        max_age: float = None,
+        lead_only: bool = False,
+        store_text: bool = False,
+        access_granularity: float = 0.0,
+    ):
+        """
+        db_path: path of the SQLite database
+        max_bytes: size cap of the cache
+        cache_only: never download, serve cached articles only
+        max_age: seconds after which an article is revalidated (None: never)
+        lead_only: store compressed lead fragments instead of the full html
+        store_text: with `lead_only`, also store the compressed plaintext
+        access_granularity: seconds between two updates of the last access
+                            time of an article (0: at every hit)
+        """
+
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        self.max_age = max_age
+        self.lead_only = lead_only
+        self.store_text = store_text
+        self.access_granularity = access_granularity
+
+        # statistics of this process
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.not_modified = 0
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.c = self.conn.cursor()
+
+        self.create_db()
+
+        self.c.execute("SELECT COALESCE(SUM(size), 0) FROM page_cache")
+        self.total_bytes = self.c.fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def create_db(self):
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS page_cache (
+            title TEXT PRIMARY KEY,
+            pageid INTEGER,
+            html TEXT,
+            fragment BLOB,
+            text BLOB,
+            size INTEGER,
+            last_access REAL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL,
+            fetch_mode TEXT
+        )"""
+        )
+
+        # add the validator, fragment, text and fetch mode columns to caches created before they existed
+        self.c.execute("PRAGMA table_info(page_cache)")
+        columns = [row[1] for row in self.c.fetchall()]
+        for column, column_type in [
+            ("etag", "TEXT"),
+            ("last_modified", "TEXT"),
+            ("fetched_at", "REAL"),
+            ("fragment", "BLOB"),
+            ("text", "BLOB"),
+            ("fetch_mode", "TEXT"),
+        ]:
+            if column not in columns:
+                self.c.execute(
+                    f"ALTER TABLE page_cache ADD COLUMN {column} {column_type}"
+                )
+
+        self.c.execute(
+            "CREATE INDEX IF NOT EXISTS page_cache_pageid ON page_cache (pageid)"
+        )
+        self.c.execute(
+            "CREATE INDEX IF NOT EXISTS page_cache_last_access ON page_cache (last_access)"
+        )
+        self.conn.commit()
+
+    # ====================================================================================
+    # GETTERS
+    # ====================================================================================
+
+    def get(self, key) -> str:
+        """Return the cached html of an article (None on a miss)
+
+        key: url or title of the article, or its pageid (int)
+        """
+
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+
+        return entry.html
+
+    def get_entry(self, key) -> CacheEntry:
+        """Return the cached article with its validators (None on a miss)
+
+        key: url or title of the article, or its pageid (int)
+
+        The html of an article stored as a lead fragment is the fragment.
+        """
+
+        with self.lock:
+            if isinstance(key, int):
+                where, param = "pageid = ?", key
+            else:
+                where, param = "title = ?", normalize_title(key)
+
+            self.c.execute(
+                f"SELECT title, html, fragment, etag, last_modified, fetched_at, fetch_mode, last_access FROM page_cache WHERE {where}",
+                (param,),
+            )
+            result = self.c.fetchone()
+
+            if result is None:
+                self.misses += 1
+                return None
+
+            # mark as recently used (unless it was already, recently enough)
+            now = time.time()
+            last_access = result[7]
+            if last_access is None or now - last_access > self.access_granularity:
+                self.c.execute(
+                    "UPDATE page_cache SET last_access = ? WHERE title = ?",
+                    (now, result[0]),
+                )
+                self.conn.commit()
+
+            self.hits += 1
+
+        title, html, fragment, etag, last_modified, fetched_at, fetch_mode, _ = result
+        if html is None:
+            html = decode_fragment(fragment)
+
+        return CacheEntry(
+            title, html, etag, last_modified, fetched_at, fetch_mode or DEFAULT_FETCH_MODE
+        )
+
+    def peek(self, key: str) -> CacheEntry:
+        """Return the cached article like `get_entry`, without marking it
+        as recently used or counting a hit (None if not cached)"""
+
+        with self.lock:
+            self.c.execute(
+                "SELECT title, html, fragment, etag, last_modified, fetched_at, fetch_mode FROM page_cache WHERE title = ?",
+                (normalize_title(key),),
+            )
+            result = self.c.fetchone()
+
+        if result is None:
+            return None
+
+        title, html, fragment, etag, last_modified, fetched_at, fetch_mode = result
+        if html is None:
+            html = decode_fragment(fragment)
+
+        return CacheEntry(
+            title, html, etag, last_modified, fetched_at, fetch_mode or DEFAULT_FETCH_MODE
+        )
+
+    def get_text(self, key: str) -> str:
+        """Return the stored plaintext of an article (None if not stored)
+
+        Only articles stored as lead fragments have a stored text: the
+        text of the others is in their html.
+        """
+
+        with self.lock:
+            self.c.execute(
+                "SELECT text FROM page_cache WHERE title = ?", (normalize_title(key),)
+            )
+            result = self.c.fetchone()
+
+        if result is None:
+            return None
+
+        return decode_fragment(result[0])
+
+    def iter_pages(self):
+        """Iterate (pageid, title, html) of all cached articles
+
+        Batch reads: the access times and hit statistics are left untouched.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT pageid, title, html, fragment FROM page_cache ORDER BY title")
+        for pageid, title, html, fragment in cursor:
+            if html is None:
+                html = decode_fragment(fragment)
+            yield (pageid, title, html)
+
+    def is_stale(self, entry: CacheEntry) -> bool:
+        """Check if a cached article is due for revalidation"""
+
+        if self.max_age is None:
+            return False
+
+        return entry.fetched_at is None or time.time() - entry.fetched_at > self.max_age
+
+    def mark_fresh(self, key: str) -> None:
+        """Record that a cached article was revalidated (HTTP 304)"""
+
+        with self.lock:
+            self.c.execute(
+                "UPDATE page_cache SET fetched_at = ? WHERE title = ?",
+                (time.time(), normalize_title(key)),
+            )
+            self.conn.commit()
+            self.not_modified += 1
+
+    # ====================================================================================
+    # ADDERS
+    # ====================================================================================
+
+    def put(
+        self,
+        key: str,
+        html: str,
+        etag: str = None,
+        last_modified: str = None,
+        pageid: int = None,
+        fetch_mode: str = DEFAULT_FETCH_MODE,
+    ) -> None:
+        """Store the html of an article (and the validators the server sent
+        with it), evicting old articles if needed
+
+        pageid: pageid of the article (default: read from the html)
+        fetch_mode: "full" page or "lead" section only
+        """
+
+        if html is None:
+            return
+
+        title = normalize_title(key)
+
+        if pageid is None:
+            match = RE_PAGEID.search(html)
+            pageid = int(match.group(1)) if match else None
+
+        text = None
+        if self.lead_only:
+            # the fragment and the text are read from one parse
+            soup = BeautifulSoup(html, "html.parser") if self.store_text else None
+            fragment = encode_fragment(make_lead_fragment(html, soup))
+            if self.store_text:
+                text = encode_fragment(html_to_text(html, soup))
+            html = None
+            size = len(fragment) + (len(text) if text is not None else 0)
+        else:
+            fragment = None
+            size = len(html.encode("utf-8"))
+
+        with self.lock:
+            self.c.execute("SELECT size FROM page_cache WHERE title = ?", (title,))
+            result = self.c.fetchone()
+            if result is not None:
+                self.total_bytes -= result[0]
+
+            now = time.time()
+            self.c.execute(
+                "INSERT OR REPLACE INTO page_cache (title, pageid, html, fragment, text, size, last_access, etag, last_modified, fetched_at, fetch_mode) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (title, pageid, html, fragment, text, size, now, etag, last_modified, now, fetch_mode),
+            )
+            self.total_bytes += size
+
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used articles until the cache fits its size cap"""
+
+        while self.total_bytes > self.max_bytes:
+            self.c.execute(
+                "SELECT title, size FROM page_cache ORDER BY last_access LIMIT 100"
+            )
+            oldest = self.c.fetchall()
+            if not oldest:
+                self.total_bytes = 0
+                return
+
+            for title, size in oldest:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.c.execute("DELETE FROM page_cache WHERE title = ?", (title,))
+                self.total_bytes -= size
+                self.evictions += 1
+
+    # ====================================================================================
+    # STATS
+    # ====================================================================================
+
+    def count(self) -> int:
+        with self.lock:
+            self.c.execute("SELECT COUNT(*) FROM page_cache")
+            return self.c.fetchone()[0]
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def print_stats(self):
+        print("Page cache:")
+        print(f"    path = {self.db_path}")
+        print(f"    articles = {self.count()}")
+        print(f"    size = {self.total_bytes / 1e6:.1f} MB / {self.max_bytes / 1e6:.1f} MB")
+        print(f"    hits = {self.hits}, misses = {self.misses} ({self.hit_rate():.1%} hit rate)")
+        print(f"    evictions = {self.evictions}")
+        print(f"    revalidations = {self.revalidations} ({self.not_modified} not modified)")
+        print(f"    cache only = {self.cache_only}")
+        print(f"    lead fragments only = {self.lead_only}")
+        print(f"    article text stored = {self.store_text}")
@@ -0,0 +1,355 @@
+""" page_source.py
+
+    Page source backend of the project: every module that
+    needs the HTML of a Wikipedia article gets it through
+    `get_page_html`.
+
+    By default the article is downloaded from Wikipedia.
+    When a dump index is configured (`WIKI_DUMP_DB_PATH` in
+    config.py, or `use_dump` at runtime) the article is
+    served from the local dump instead (see wikidump.py).
+
+    Downloaded articles are kept in the on-disk page cache
+    (see page_cache.py), so each article is downloaded once.
+    Concurrent requests for the same article share a single
+    download (see singleflight.py). Cached articles older
+    than `PAGE_CACHE_MAX_AGE` are revalidated with a
+    conditional request (ETag/Last-Modified): if the article
+    did not change (HTTP 304), the cached html is served.
+    Articles are cached with their fetch mode: a lead section
+    cached in "lead" mode is downloaded again as a full page
+    in "full" mode.
+
+    With `STORE_LEAD_FRAGMENTS`, caches and dumps keep only
+    the lead fragment of articles (see lead_fragment.py), so
+    the html served from them is that fragment: the link
+    extractors get the same links from it as from the page.
+
+    With `FETCH_MODE = "lead"` (or `use_fetch_mode("lead")`)
+    only the rendered lead section of an article is
+    downloaded (action=parse&section=0), without navboxes,
+    references and sidebars. The extraction rules then run
+    on the lead alone: the rare articles whose lead has
+    fewer than three paragraphs, or no link at all, may give
+    other links than their full page.
+
+    `get_page_text` returns the plaintext an article cache
+    keeps alongside a lead fragment (see article_text.py).
+"""
+
+from config import (
+    WIKI_DUMP_DB_PATH,
+    PAGE_CACHE_PATH,
+    PAGE_CACHE_MAX_BYTES,
+    PAGE_CACHE_ONLY,
+    PAGE_CACHE_MAX_AGE,
+    PAGE_CACHE_ACCESS_GRANULARITY,
+    STORE_LEAD_FRAGMENTS,
+    STORE_ARTICLE_TEXT,
+    FETCH_MODE,
+    WIKIPEDIA_API_BASE_URL,
+)
+from helpers import normalize_title
+from http_client import get_session
+from singleflight import SingleFlight
+
+# the dump index in use (None: live site)
+_DUMP = None
+_DUMP_PATH = WIKI_DUMP_DB_PATH
+
+# the page cache in use (None: no cache)
+_CACHE = None
+_CACHE_PATH = PAGE_CACHE_PATH
+_CACHE_ONLY = PAGE_CACHE_ONLY
+
+# how articles are downloaded ("full" page or "lead" section only)
+_FETCH_MODE = FETCH_MODE
+
+FETCH_MODES = ("full", "lead")
+
+# concurrent downloads of the same article share one request
+_DOWNLOADS = SingleFlight()
+
+
+# =============================================================================
+# BACKEND SELECTION
+# =============================================================================
+
+
+def use_dump(db_path: str) -> None:
+    """Serve articles from the dump index at `db_path` (None: live site)"""
+
+    global _DUMP, _DUMP_PATH
+
+    if _DUMP is not None:
+        _DUMP.close()
+
+    _DUMP = None
+    _DUMP_PATH = db_path
+
+
+def get_dump_path() -> str:
+    """Return the path of the dump index in use (None: live site)"""
+    return _DUMP_PATH
+
+
+def get_dump():
+    """Return the dump index in use (None if articles come from the live site)"""
+
+    global _DUMP
+
+    if _DUMP_PATH is None:
+        return None
+
+    if _DUMP is None:
+        from wikidump import WikiDump
+
+        _DUMP = WikiDump(_DUMP_PATH)
+
+    return _DUMP
+
+
+def use_cache(db_path: str, cache_only: bool = False) -> None:
+    """Cache articles in the page cache at `db_path` (None: no cache)
+
+    cache_only: never download, serve cached articles only
+    """
+
+    global _CACHE, _CACHE_PATH, _CACHE_ONLY
+
+    if _CACHE is not None:
+        _CACHE.close()
+
+    _CACHE = None
+    _CACHE_PATH = db_path
+    _CACHE_ONLY = cache_only
+
+
+def get_cache():
+    """Return the page cache in use (None if caching is disabled)"""
+
+    global _CACHE
+
+    if _CACHE_PATH is None:
+        return None
+
+    if _CACHE is None:
+        from page_cache import PageCache
+
+        _CACHE = PageCache(
+            _CACHE_PATH,
+            PAGE_CACHE_MAX_BYTES,
+            _CACHE_ONLY,
+            PAGE_CACHE_MAX_AGE,
+            STORE_LEAD_FRAGMENTS,
+            STORE_ARTICLE_TEXT,
+            PAGE_CACHE_ACCESS_GRANULARITY,
+        )
+
+    return _CACHE
+
+
+def get_cache_only() -> bool:
+    """Check if articles are served from the page cache only"""
+    return _CACHE_PATH is not None and _CACHE_ONLY
+
+
+def use_fetch_mode(mode: str) -> None:
+    """Download full article pages ("full") or their lead section only ("lead")"""
+
+    global _FETCH_MODE
+
+    if mode not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch mode: {mode} (expected one of {FETCH_MODES})")
+
+    _FETCH_MODE = mode
+
+
+def get_fetch_mode() -> str:
+    """Return the fetch mode in use"""
+    return _FETCH_MODE
+
+
+# =============================================================================
+# PAGE HTML
+# =============================================================================
+
+
+def get_page_html(page_url: str, session=None) -> str:
+    """Return the HTML of a Wikipedia article (None if not available)
+
+    session: requests session used for downloads (default: shared session)
+    """
+
+    dump = get_dump()
+    if dump is not None:
+        return dump.html_of(page_url)
+
+    cache = get_cache()
+    entry = None
+    if cache is not None:
+        entry = cache.get_entry(page_url)
+
+        # a lead section is not the full page
+        if entry is not None and not _serves_fetch_mode(entry.fetch_mode):
+            entry = None
+
+        if entry is None and cache.cache_only:
+            return None
+
+        if entry is not None and (cache.cache_only or not cache.is_stale(entry)):
+            return entry.html
+
+    return _DOWNLOADS.do(
+        (normalize_title(page_url), _FETCH_MODE), _download_and_cache, page_url, session, entry
+    )
+
+
+def _serves_fetch_mode(fetch_mode: str) -> bool:
+    """Check if an article downloaded in `fetch_mode` can be served in the
+    fetch mode in use (a full page serves both modes)"""
+
+    return fetch_mode == "full" or fetch_mode == _FETCH_MODE
+
+
+def get_local_page_html(page_url: str) -> str:
+    """Return the HTML of an article if it is available without a download
+    (from the dump, or from the page cache), None otherwise
+
+    The access time of cached articles is left untouched.
+    """
+
+    dump = get_dump()
+    if dump is not None:
+        return dump.html_of(page_url)
+
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    entry = cache.peek(page_url)
+    if entry is None or not _serves_fetch_mode(entry.fetch_mode):
+        return None
+
+    return entry.html
+
+
+def get_page_text(page_url: str) -> str:
+    """Return the plaintext stored with the lead fragment of an article
+    (None if its text is only in its html, see article_text.html_to_text)
+    """
+
+    if get_dump() is not None:
+        return None
+
+    cache = get_cache()
+    if cache is None or not cache.lead_only:
+        return None
+
+    return cache.get_text(page_url)
+
+
+def _download_and_cache(page_url: str, session=None, entry=None) -> str:
+    """Download an article into the cache, or revalidate the cached `entry`"""
+
+    cache = get_cache()
+    if cache is None:
+        return download_page_html(page_url, session)
+
+    ### lead section only (the parse API sends no validators)
+
+    if _FETCH_MODE == "lead":
+        html, pageid = _download_lead(page_url, session)
+        if html is None:
+            return entry.html if entry is not None else None
+
+        cache.put(page_url, html, pageid=pageid, fetch_mode="lead")
+        return html
+
+    ### conditional request if the article is already cached
+
+    headers = {}
+    if entry is not None:
+        if entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+        cache.revalidations += 1
+
+    S = session if session is not None else get_session()
+    r = S.get(page_url, headers=headers)
+
+    ### not modified: serve the cached html
+
+    if r.status_code == 304 and entry is not None:
+        cache.mark_fresh(page_url)
+        return entry.html
+
+    if r.status_code != 200:
+        print(f"Download failed: HTTP {r.status_code} (url: {page_url})")
+        # better stale than nothing
+        return entry.html if entry is not None else None
+
+    cache.put(
+        page_url, r.text, r.headers.get("ETag"), r.headers.get("Last-Modified"), fetch_mode="full"
+    )
+
+    return r.text
+
+
+def download_page_html(page_url: str, session=None) -> str:
+    """Download the HTML of a Wikipedia article from the live site
+    (only its lead section in "lead" fetch mode)"""
+
+    if _FETCH_MODE == "lead":
+        return download_lead_html(page_url, session)
+
+    S = session if session is not None else get_session()
+    r = S.get(page_url)
+
+    if r.status_code != 200:
+        print(f"Download failed: HTTP {r.status_code} (url: {page_url})")
+        return None
+
+    return r.text
+
+
+def download_lead_html(page_url: str, session=None) -> str:
+    """Download the rendered lead section of a Wikipedia article"""
+    return _download_lead(page_url, session)[0]
+
+
+def _download_lead(page_url: str, session=None) -> tuple:
+    """Download the rendered lead section of an article with the parse API
+
+    Returns:
+        (html, pageid) of the article ((None, None) if not available)
+    """
+
+    S = session if session is not None else get_session()
+
+    PARAMS = {
+        "action": "parse",
+        "format": "json",
+        "formatversion": "2",
+        # the whole title: subpage-like titles keep their slashes
+        "page": normalize_title(page_url),
+        "prop": "text",
+        "section": "0",
+        "redirects": "1",
+        "disableeditsection": "1",
+        "disabletoc": "1",
+    }
+    r = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
+
+    if r.status_code != 200:
+        print(f"Download failed: HTTP {r.status_code} (url: {page_url})")
+        return (None, None)
+
+    DATA = r.json()
+    if "error" in DATA:
+        print(f"Download failed: {DATA['error'].get('info')} (url: {page_url})")
+        return (None, None)
+
+    # the rendered html comes wrapped in its article container
+    return (DATA["parse"]["text"], DATA["parse"].get("pageid"))
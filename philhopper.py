@@ -4,6 +4,11 @@
     Philosophy article by following link `i` in the
     description of each article.
 
+    `hop_to_philosophy_all_ranks` follows links 1..k from
+    the same starter at once: each article is fetched and
+    parsed once, and its ranked links are shared by the k
+    chains.
+
     Usage:
         python philhopper.py
 
@@ -12,23 +17,27 @@
     Author: Aron Molnar (gh/Arotte)
 """
 
-import tqdm
-import requests
 import sys
 import os
 from urllib.parse import unquote
-from bs4 import BeautifulSoup
 
 from config import (
-    WIKIPEDIA_API_BASE_URL,
     WIKIPEDIA_BASE_URL,
     MAX_HOPS,
     WIKI_URL_OF_PHILOSOPHY,
 )
+from dao import get_memo_dao, OUTCOME_PHILOSOPHY, OUTCOME_CYCLE
+from http_client import get_session
+from link_index import indexed_page
+from title_resolver import resolve_title
+from wiki_api import get_random_page_infos
 
 # full path of this script
 SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
 
+# name of the link selection of this script in the hop memo (see dao.py)
+MEMO_STRATEGY = "PHILHOPPER"
+
 # =============================================================================
 # HELPERS
 # =============================================================================
@@ -43,17 +52,6 @@ def check_url(url: str) -> str:
         return WIKIPEDIA_BASE_URL + url
 
 
-def parenthetic_contents(string: str):
-    """Generate parenthesized contents in string as pairs (level, contents)"""
-    stack = []
-    for i, c in enumerate(string):
-        if c == "(":
-            stack.append(i)
-        elif c == ")" and stack:
-            start = stack.pop()
-            yield (len(stack), string[start + 1 : i])
-
-
 def print_list_pretty(l: list):
     """Print list in a (semi-)pretty way"""
 
@@ -124,123 +122,32 @@ class Page:
 # =============================================================================
 
 
-def extract_link(page_url: str, link_i: int) -> tuple:
+def extract_link(page_url: str, link_i: int, session=None) -> tuple:
     """
     Extract i-th link from the description of a Wikipedia article
 
     page_url: url of the Wikipedia article
     i: the i-th link to extract
+    session: requests session used for downloads (optional)
     """
 
-    ### retrieve page html
+    ### ranked links of the page (parsed once per revision, see link_index.py)
 
-    data = requests.get(page_url).text
+    page = indexed_page(page_url, session)
 
     # check data
-    if data is None:
+    if page is None:
         print(f"Extraction failed: no data (url: {page_url})")
         return (None, None, None)
 
-    soup = BeautifulSoup(data, "html.parser")
-
-    ### clean up the html
-
-    # remove thumbnails
-    for div in soup.find_all("div", {"class": "thumb"}):
-        div.decompose()
-    # remove sidebars
-    for div in soup.find_all("table", {"class": "sidebar"}):
-        div.decompose()
-    # remove all tables
-    for table in soup.find_all("table"):
-        table.decompose()
-    # remove notes at the top (class: hatnote)
-    for div in soup.find_all("div", {"class": "hatnote"}):
-        div.decompose()
-
-    ### find paragraphs in html
-
-    # find containers with classes specific classes
-    containers = soup.find_all(
-        "div", {"class": ["mw-parser-output", "mw-body-content", "vector-body"]}
-    )
-
-    if containers is None:
-        print(f"Extraction failed: no containers")
-        return (None, None, None)
-
-    # list of paragraphs inside containers
-    ps = []
-
-    for container in containers:
-        ps += container.find_all("p")
-
-    links = []
-
-    ### extract links from paragraphs
-
-    # look in first x paragraphs
-    max_paras = 3
-    x = max_paras if len(ps) > max_paras else len(ps)
-
-    for paragraph_n in range(0, x):
-        # get contents of parentheses
-        nested_paren_contents = list(parenthetic_contents(str(ps[paragraph_n])))
-        strs_in_paren = [
-            s[1] for s in nested_paren_contents
-        ]  # get second element of each tuple (level, contents)
-
-        # for all anchor tags inside the current paragraph
-        for a in ps[paragraph_n].find_all("a"):
-            if a.has_attr("href") and a["href"].startswith("/wiki/"):
-
-                # check if the anchor tag is inside parentheses
-                in_paren = False
-                for para in strs_in_paren:
-                    if str(a) in para:
-                        in_paren = True
-                        break
-
-                if not in_paren:
-                    links.append(a)
-
-        if len(links) >= link_i:
-            break
-
-    ### if no links found, try a different strategy
-
-    if len(links) == 0:
-        # try another link searching strategy:
-        # look for anchor tags that have an href attribute
-        # starting with 'wiki/' and are not inside parentheses
-        for a in soup.find_all("a"):
-            if a.has_attr("href") and a["href"].startswith("/wiki/"):
-                links.append(a)
-
-        # check for parentheses
-        nested_paren_contents = list(parenthetic_contents(str(soup)))
-        strs_in_paren = [s[1] for s in nested_paren_contents]
-
-        for a in links:
-            in_para = False
-            for para in strs_in_paren:
-                if str(a) in para:
-                    in_para = True
-                    break
-
-            if in_para:
-                links.remove(a)
-
     ### return results
 
     # if we don't have the i-th link, return None
-    if len(links) < link_i:
+    link = page.nth_link(link_i)
+    if link is None:
         return (None, None, None)
 
-    link = links[link_i - 1]
-    ret = (link["href"], link.text, link["title"])
-
-    return ret
+    return (link.href, link.text, link.title)
 
 
 # =============================================================================
@@ -259,46 +166,16 @@ def get_random_pages(n: int, link_i: int) -> list:
     if link_i < 1 or link_i > 300:  # get i-th link of each page
         raise ValueError("i must be between 1 and 300")
 
-    ### get random pages via Wikipedia API
+    ### get random pages and their info via Wikipedia API (batched)
 
-    PARAMS = {
-        "action": "query",
-        "format": "json",
-        "list": "random",
-        "rnlimit": str(n),
-        "rnnamespace": "0",
-    }
-    S = requests.Session()
-    R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-    DATA = R.json()
-    RANDOMS = DATA["query"]["random"]
+    RANDOMS = get_random_page_infos(n)
 
     ### extract info from the pages
 
-    print(f"Extracting data from {n} random Wikipedia pages")
-
     PAGES = []
-    for r in tqdm.tqdm(RANDOMS):
-        page_title = r["title"]
-        page_id = r["id"]
-
-        # get full url of each page
-
-        PARAMS = {
-            "action": "query",
-            "format": "json",
-            "prop": "info",
-            "inprop": "url",
-            "pageids": page_id,
-        }
-
-        S = requests.Session()
-        R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-        DATA = R.json()
-
-        page_url = DATA["query"]["pages"][str(page_id)]["fullurl"]
-        page_title_from_url = page_url.split("/")[-1]
-        page_lang = DATA["query"]["pages"][str(page_id)]["pagelanguage"]
+    for r in RANDOMS:
+        page_url = r.get("fullurl")
+        page_lang = r.get("pagelanguage")
 
         if page_lang != "en":
             continue
@@ -318,68 +195,82 @@ def get_random_pages(n: int, link_i: int) -> list:
 # =============================================================================
 
 
-def url_to_page_obj(url: str, link_i: int) -> Page:
+def url_to_page_obj(url: str, link_i: int, session=None) -> Page:
+    return url_to_page_objs(url, [link_i], session)[link_i]
+
+
+def url_to_page_objs(url: str, link_is: list, session=None) -> dict:
+    """
+    Page objects of an article for several link ranks, from a single
+    fetch and parse of the article
+
+    Returns {link_i: Page} (None for the ranks without a link, or for all
+    of them if the article is not valid).
+    """
+
+    no_pages = {link_i: None for link_i in link_is}
 
     ### url checks
 
     url = check_url(url)
     url = encode_fix(url)
 
-    ### get info about article via Wikipedia API
+    ### get info about article (title resolution table, see title_resolver.py)
 
-    PARAMS = {
-        "action": "query",
-        "format": "json",
-        "prop": "info",
-        "inprop": "url",
-        "titles": url.split("/")[-1],
-    }
-    S = requests.Session()
-    R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
-    DATA = R.json()
+    S = session if session is not None else get_session()
+    resolution = resolve_title(url, S)
 
     # check if page exists
-    if "-1" in DATA["query"]["pages"]:
+    if resolution is None:
         print(f"Page does not exist ({url})")
-        return None
+        return no_pages
 
-    # extract info from returned json
-    page_id = list(DATA["query"]["pages"].keys())[0]
-    page_url = DATA["query"]["pages"][page_id]["fullurl"]
+    # extract info from resolution
+    page_id = str(resolution.pageid)
+    page_url = resolution.fullurl
     page_title_from_url = page_url.split("/")[-1]
-    page_lang = DATA["query"]["pages"][page_id]["pagelanguage"]
+    page_lang = resolution.lang
 
     # check if page is in English
     if page_lang != "en":
         print(f"Page is not in English ({url})")
-        return None
+        return no_pages
 
-    ### extract link from article
+    ### extract links from article (ranked links, see link_index.py)
 
-    extracted_link = None
+    page = None
     try:
-        extracted_link = extract_link(page_url, link_i)
+        page = indexed_page(page_url, S)
     except Exception as e:
         print(f"Error during link extraction: {e} ({url})")
-        return None
-    page_ithlink = extracted_link[0]  # get url only (url, text, title)
+        return no_pages
 
-    if page_ithlink is None:
-        print(f"No link found ({url})")
-        return None
+    if page is None:
+        print(f"Extraction failed: no data (url: {page_url})")
+        return no_pages
 
-    ### done, construct Page object
+    ### done, construct a Page object per link rank
 
-    return Page(
-        None,  # rowid is none as this page is not yet in the database
-        page_id,
-        page_title_from_url,
-        page_ithlink,
-        link_i,
-        page_url,
-        page_title_from_url,
-        None,  # rowid of parent will be None as this is a leaf node (or we're not yet sure)
-    )
+    pages = {}
+    for link_i in link_is:
+        link = page.nth_link(link_i)
+        if link is None:
+            print(f"No link found ({url}, i = {link_i})")
+            pages[link_i] = None
+            continue
+
+        pages[link_i] = Page(
+            None,  # rowid is none as this page is not yet in the database
+            page_id,
+            page_title_from_url,
+            link.href,
+            link_i,
+            page_url,
+            page_title_from_url,
+            None,  # rowid of parent will be None as this is a leaf node (or we're not yet sure)
+        )
+
+    return pages
 
 
 # =============================================================================
@@ -409,9 +300,36 @@ def hop_to_philosophy(start_url: str, link_i: int) -> list:
 
     print(f"\t0. {start.pagetitle} ({start.fullurl})")
 
+    # chains are memoized (see dao.py)
+    memo_dao = get_memo_dao()
+
     # hop
     for hop_i in range(0, MAX_HOPS):
 
+        # known page: splice in the rest of its chain
+        if memo_dao is not None:
+            memo = memo_dao.get_memo(pages[-1].ithlink, MEMO_STRATEGY, link_i)
+
+            if memo is not None and memo.outcome == OUTCOME_CYCLE and hop_i + memo.distance <= MAX_HOPS:
+                print("Cycle detected (known page) - hopping stopped")
+                _record_chain(memo_dao, start_url, pages, link_i, OUTCOME_CYCLE, memo.distance)
+                return None
+
+            if memo is not None and memo.outcome == OUTCOME_PHILOSOPHY:
+                chain = memo_dao.memo_chain(pages[-1].ithlink, MEMO_STRATEGY, link_i)
+                if len(chain) == memo.distance:
+                    known = [_memo_page(m, link_i) for m in chain]
+                    for k, page in enumerate(known[: MAX_HOPS - hop_i]):
+                        print(f"\t{hop_i + k + 1}. {page.pagetitle} ({page.fullurl}) (memo)")
+
+                    # the last page links to Philosophy
+                    if hop_i + len(known) - 1 < MAX_HOPS:
+                        print("Reached Philosophy page - hopping stopped")
+                        _record_chain(memo_dao, start_url, pages + known, link_i, OUTCOME_PHILOSOPHY)
+                        return pages + known[:-1]
+
+                    return pages + known[: MAX_HOPS - hop_i]
+
         # get next page
         next_page = url_to_page_obj(pages[-1].ithlink, link_i)
 
@@ -425,11 +343,15 @@ def hop_to_philosophy(start_url: str, link_i: int) -> list:
         # if next page is already in the list, we're in a cycle
         if next_page.wiki_pageid in [p.wiki_pageid for p in pages]:
             print("Cycle detected - hopping stopped")
+            if memo_dao is not None:
+                _record_chain(memo_dao, start_url, pages, link_i, OUTCOME_CYCLE)
             return None
 
         # philosophy reached
         if next_page.ithlink == WIKI_URL_OF_PHILOSOPHY:
             print("Reached Philosophy page - hopping stopped")
+            if memo_dao is not None:
+                _record_chain(memo_dao, start_url, pages + [next_page], link_i, OUTCOME_PHILOSOPHY)
             break
 
         # add article to list
@@ -439,6 +361,120 @@ def hop_to_philosophy(start_url: str, link_i: int) -> list:
     return pages
 
 
+def _memo_page(memo, link_i: int) -> Page:
+    """Page object of a memoized page"""
+
+    page_title_from_url = memo.fullurl.split("/")[-1]
+
+    return Page(
+        None,
+        str(memo.pageid),
+        page_title_from_url,
+        memo.next_url,
+        link_i,
+        memo.fullurl,
+        page_title_from_url,
+        None,
+    )
+
+
+def _record_chain(memo_dao, start_url: str, pages: list, link_i: int, outcome: str, rest: int = None):
+    """Memoize a chain of Page objects (the last one closing it)"""
+
+    urls = [start_url] + [p.ithlink for p in pages]
+    infos = [(int(p.wiki_pageid), p.fullurl) for p in pages]
+
+    # the start page is not checked against Philosophy: its link does not
+    # end its chain, unlike the link of the pages reached
+    if urls[1] == WIKI_URL_OF_PHILOSOPHY:
+        urls, infos = urls[1:], infos[1:]
+
+    memo_dao.record_chain(MEMO_STRATEGY, link_i, urls, outcome, infos, rest)
+
+
+def hop_to_philosophy_all_ranks(start_url: str, k: int) -> dict:
+    """
+    Hop to Philosophy from one starter by following link i, for every
+    i in 1..k at once
+
+    The k chains advance together. Each article is fetched and parsed
+    once, and its ranked links are reused by every chain reaching it.
+
+    Returns {link_i: list of Page objects, None if chain i failed}, like
+    `hop_to_philosophy(start_url, link_i)` for each i.
+    """
+
+    link_is = list(range(1, k + 1))
+
+    # Page objects of each article visited, for all ranks
+    visited = {}
+
+    def pages_of(url: str) -> dict:
+        url = encode_fix(check_url(url))
+        if url not in visited:
+            visited[url] = url_to_page_objs(url, link_is)
+        return visited[url]
+
+    # check and fix url
+    start_url = encode_fix(start_url)
+
+    starts = pages_of(start_url)
+
+    print()
+    print(f"Hopping to Philosophy from '{start_url}'...")
+    print(f"Max hops = {MAX_HOPS}, i = 1..{k}")
+
+    chains = {}  # link_i -> hop chain (list of Page objects), None if failed
+    running = []  # link ranks still hopping
+    for link_i in link_is:
+        if starts[link_i] is None:
+            print(f"\ti = {link_i}: start page is not valid")
+            chains[link_i] = None
+        else:
+            chains[link_i] = [starts[link_i]]
+            running.append(link_i)
+
+    # hop
+    for hop_i in range(0, MAX_HOPS):
+        if not running:
+            break
+
+        still_running = []
+        for link_i in running:
+            pages = chains[link_i]
+
+            # get next page
+            next_page = pages_of(pages[-1].ithlink)[link_i]
+
+            # if next page is None, stop
+            if next_page is None:
+                print(f"\ti = {link_i}: parsing error - hopping stopped")
+                chains[link_i] = None
+                continue
+
+            # if next page is already in the list, we're in a cycle
+            if next_page.wiki_pageid in [p.wiki_pageid for p in pages]:
+                print(f"\ti = {link_i}: cycle detected - hopping stopped")
+                chains[link_i] = None
+                continue
+
+            # philosophy reached
+            if next_page.ithlink == WIKI_URL_OF_PHILOSOPHY:
+                print(f"\ti = {link_i}: reached Philosophy page in {hop_i + 1} hops")
+                continue
+
+            # add article to list
+            pages.append(next_page)
+            still_running.append(link_i)
+
+        running = still_running
+
+    print(f"\t{len(visited)} articles fetched for {k} chains")
+
+    # done
+    return chains
+
+
 # =============================================================================
 # SCRIPT RUNNER
 # =============================================================================
@@ -450,6 +486,7 @@ def main():
 
     link_i = 1  # get i-th link of each page
     n = 10  # how many random pages to get in each iteration
+    k = None  # follow links 1..k of each page at once (None: link i only)
 
     try:
         while True:  # infinite loop, break with Ctrl+C
@@ -468,7 +505,10 @@ def main():
 
             # hop to philosophy
             for article in random_articles:
-                hop_to_philosophy(article, link_i)
+                if k is not None:
+                    hop_to_philosophy_all_ranks(article, k)
+                else:
+                    hop_to_philosophy(article, link_i)
 
     except KeyboardInterrupt:
         print("Exiting...")
@@ -0,0 +1,279 @@
+""" random_walk.py
+
+    Exact outcome of the RANDOM strategy from every article.
+
+    Picking one of the first candidate links of each article
+    uniformly at random is a Markov chain over the link graph
+    (link_graph.py) in which Philosophy is absorbing. Instead
+    of sampling random walks (a full traversal each), the
+    chain is solved for every article at once, with sparse
+    linear solves over the articles Philosophy can be reached
+    from (see optimal_hops.py):
+        - probability: probability that the walk reaches
+          Philosophy, h = Q h + r
+        - expected hops: expected number of hops of the walks
+          that reach it, t = u / h where u = Q u + h
+    (Q: transitions between these articles, r: transitions
+    to Philosophy.)
+
+    Walks leaving the graph (links to articles outside it),
+    or entering articles Philosophy cannot be reached from,
+    never reach Philosophy. Walks are not cut at MAX_HOPS.
+
+    Usage:
+        python random_walk.py <graph.npz | link table | link index db> [<max rank>] [--direct]
+        python random_walk.py --test
+"""
+
+import sys
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from config import (
+    MAX_LINK_EXTRACT,
+    RANDOM_WALK_GRAPH_PATH,
+    RANDOM_WALK_SOLVER,
+    WIKI_PAGEID_OF_PHILOSOPHY,
+)
+from link_graph import MISSING, LinkGraph, load_graph
+from optimal_hops import UNREACHABLE, hop_distances
+
+# solvers of the linear systems
+SOLVERS = ("direct", "iterative")
+
+# convergence of the iterative solver: relative residual, restarts of GMRES
+TOLERANCE = 1e-12
+GMRES_RESTART = 50
+MAX_ITERATIONS = 20
+
+
+# =============================================================================
+# MARKOV CHAIN
+# =============================================================================
+
+
+def transition_matrix(graph: LinkGraph, max_rank: int = MAX_LINK_EXTRACT):
+    """Return the transition matrix of uniform selection among the first
+    `max_rank` links of every node (CSR)
+
+    Links to articles outside the graph keep their share of the
+    probability: the rows of nodes with such links sum to less than 1.
+    """
+
+    keep = graph.edge_ranks() <= max_rank
+    sources, targets = graph.edge_sources()[keep], graph.indices[keep]
+
+    degrees = np.bincount(sources, minlength=graph.n_nodes)
+    inside = targets != MISSING
+    sources, targets = sources[inside], targets[inside]
+
+    # links to the same article twice are summed
+    return scipy.sparse.csr_matrix(
+        (1.0 / degrees[sources], (sources, targets)),
+        shape=(graph.n_nodes, graph.n_nodes),
+    )
+
+
+def _solver(Q, method: str):
+    """Return a function solving x = Q x + b"""
+
+    A = (scipy.sparse.identity(Q.shape[0], format="csr") - Q).tocsr()
+
+    if method == "direct":
+        return scipy.sparse.linalg.factorized(A.tocsc())
+
+    if method == "iterative":
+
+        def solve(b):
+            x, info = scipy.sparse.linalg.gmres(
+                A, b, rtol=TOLERANCE, atol=0.0, restart=GMRES_RESTART, maxiter=MAX_ITERATIONS
+            )
+
+            # slow-mixing chains (long paths to Philosophy) may not converge:
+            # solve them exactly (their matrices are close to banded, and
+            # factor without much fill-in)
+            if info != 0:
+                x = scipy.sparse.linalg.spsolve(A.tocsc(), b)
+
+            return x
+
+        return solve
+
+    raise ValueError(f"Unknown solver: {method} (expected one of {SOLVERS})")
+
+
+def absorb(graph: LinkGraph, target: int, max_rank: int = MAX_LINK_EXTRACT, method: str = RANDOM_WALK_SOLVER) -> tuple:
+    """Absorption probability and expected hops to the node `target` of
+    random walks from every node
+
+    method: "iterative" (GMRES, with a sparse LU solve when it does not
+            converge) or "direct" (sparse LU: the factors of large link
+            graphs fill in)
+
+    Returns:
+        (probabilities, expected_hops): expected hops of the walks
+        reaching `target` (NaN where the probability is 0)
+    """
+
+    probabilities = np.zeros(graph.n_nodes)
+    expected_hops = np.full(graph.n_nodes, np.nan)
+    if target == MISSING:
+        return probabilities, expected_hops
+
+    probabilities[target] = 1.0
+    expected_hops[target] = 0.0
+
+    # transient states: the other nodes `target` can be reached from
+    transient = np.flatnonzero(hop_distances(graph, target, max_rank) != UNREACHABLE)
+    transient = transient[transient != target]
+    if len(transient) == 0:
+        return probabilities, expected_hops
+
+    P = transition_matrix(graph, max_rank)[transient]
+    Q = P[:, transient]
+    r = P[:, [target]].toarray().ravel()
+
+    solve = _solver(Q, method)
+    h = solve(r)
+    u = solve(h)
+
+    probabilities[transient] = h
+    expected_hops[transient] = u / h
+
+    return probabilities, expected_hops
+
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+
+class RandomWalkHops:
+    """Outcome of random walks to Philosophy from the articles of a link graph"""
+
+    def __init__(self, graph: LinkGraph, max_rank: int = MAX_LINK_EXTRACT, method: str = RANDOM_WALK_SOLVER):
+        """
+        graph: link graph of the articles
+        max_rank: links a walk chooses from (the first `max_rank`)
+        method: solver of the linear systems (see `absorb`)
+        """
+
+        self.graph = graph
+        self.max_rank = max_rank
+        self.probabilities, self.expected_hops = absorb(
+            graph, graph.node_of(WIKI_PAGEID_OF_PHILOSOPHY), max_rank, method
+        )
+
+    def hops_of(self, pageid: int) -> tuple:
+        """Probability that a random walk from an article reaches Philosophy,
+        and the expected hops of the walks that do
+
+        Returns:
+            (probability, expected_hops) (None if the article is not in the graph,
+            expected_hops None if Philosophy cannot be reached)
+        """
+
+        node = self.graph.node_of(pageid)
+        if node == MISSING:
+            return None
+
+        probability = float(self.probabilities[node])
+        if probability == 0.0:
+            return (0.0, None)
+
+        return (probability, float(self.expected_hops[node]))
+
+    def hops_of_url(self, url: str) -> tuple:
+        """Outcome of random walks from an article, by url or title (see `hops_of`)"""
+
+        from title_resolver import resolve_title
+
+        resolution = resolve_title(url)
+        if resolution is None:
+            return None
+
+        return self.hops_of(resolution.pageid)
+
+    def print_stats(self):
+        reaching = self.probabilities > 0
+
+        print("Random walks to Philosophy:")
+        print(f"    articles = {self.graph.n_nodes}")
+        print(f"    candidate links = first {self.max_rank}")
+        print(f"    Philosophy reachable = {np.count_nonzero(reaching)}")
+        if np.any(reaching):
+            print(f"    probability: mean = {self.probabilities[reaching].mean():.3f}")
+            print(f"    expected hops: mean = {self.expected_hops[reaching].mean():.2f}, max = {self.expected_hops[reaching].max():.2f}")
+
+
+def load_random_walk_hops(graph_path: str = RANDOM_WALK_GRAPH_PATH, max_rank: int = MAX_LINK_EXTRACT) -> RandomWalkHops:
+    """Return the engine of a link graph (None if no graph is configured)"""
+
+    if graph_path is None:
+        return None
+
+    return RandomWalkHops(load_graph(graph_path), max_rank)
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+def test_slow_mixing(n_nodes: int = 200):
+    """Random walks on a line, absorbed at one end, reflected at the other
+
+    The walk mixes slowly: from node k of the line 0..m it reaches node 0
+    after k (2m - k) hops on average, with probability 1.
+    """
+
+    m = n_nodes - 1
+    sources, ranks, targets = [], [], []
+    for k in range(1, m + 1):
+        neighbours = [k - 1, k + 1] if k < m else [k - 1]
+        for rank, neighbour in enumerate(neighbours, start=1):
+            sources.append(k + 1)
+            ranks.append(rank)
+            targets.append(neighbour + 1)
+
+    graph = LinkGraph.from_edges(sources, ranks, targets, positional=True)
+    nodes = graph.nodes_of(np.arange(1, n_nodes + 1))
+    k = np.arange(n_nodes)
+
+    for method in SOLVERS:
+        probabilities, expected_hops = absorb(graph, nodes[0], 2, method)
+
+        assert np.allclose(probabilities[nodes], 1.0, rtol=0, atol=1e-7), method
+        assert np.allclose(expected_hops[nodes], k * (2 * m - k), rtol=1e-7, atol=0), method
+
+    print(f"Slow-mixing line of {n_nodes} nodes: ok (from node {m}: {expected_hops[nodes[m]]:.1f} hops)")
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    if "--test" in sys.argv:
+        for n_nodes in (50, 200, 1000):
+            test_slow_mixing(n_nodes)
+        sys.exit(0)
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print("Usage: python random_walk.py <graph.npz | link table | link index db> [<max rank>] [--direct] | --test")
+        sys.exit(1)
+
+    graph = load_graph(args[0])
+    max_rank = int(args[1]) if len(args) > 1 else MAX_LINK_EXTRACT
+    method = "direct" if "--direct" in sys.argv else RANDOM_WALK_SOLVER
+
+    start = time.time()
+    engine = RandomWalkHops(graph, max_rank, method)
+    print(f"Solved the random walks of {graph.n_nodes} articles in {time.time() - start:.2f} seconds")
+
+    engine.print_stats()
@@ -0,0 +1,240 @@
+""" rate_control.py
+
+    Client-side adaptive concurrency and rate control for
+    requests to Wikipedia.
+
+    The number of requests allowed in flight is adjusted
+    AIMD style (like TCP congestion control):
+        - additive increase: every successful, fast response
+          grows the limit by about one per round-trip (much
+          slower close to the limit last throttled at)
+        - multiplicative decrease: a throttling response
+          (429/503) or a response slower than the target
+          latency cuts the limit (at most once per round-trip)
+    The limit last throttled at is a ceiling only for a
+    while: after every quiet period (no throttling for
+    `ceiling_recovery` seconds) the ceiling moves halfway
+    back to the configured max, so the limit can recover
+    from a temporary overload of the server.
+    A `Retry-After` header blocks all new requests until
+    the time given by the server.
+
+    The limiter is plugged into the shared session of
+    http_client.py, which also retries throttled requests.
+
+    Running this file starts a local stand-in server that
+    throttles clients exceeding its capacity, and hammers
+    it with the adaptive client.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# responses that mean "slow down"
+THROTTLE_STATUS_CODES = (429, 503)
+
+# slowdown of the additive increase close to the limit last throttled at
+PROBING_SLOWDOWN = 50
+
+
+def parse_retry_after(value: str) -> float:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds to wait"""
+
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# =============================================================================
+# ADAPTIVE LIMITER
+# =============================================================================
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter honouring Retry-After"""
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        target_latency: float,
+        decrease_factor: float = 0.5,
+        ceiling_recovery: float = 60.0,
+    ):
+        """
+        initial, min_limit, max_limit: requests in flight at start, at least, at most
+        target_latency: seconds, slower responses cut the limit
+        decrease_factor: cut of the limit
+        ceiling_recovery: seconds without throttling after which the ceiling
+                          moves halfway back to `max_limit`
+        """
+
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.ceiling_recovery = ceiling_recovery
+
+        self.in_flight = 0
+        self.blocked_until = 0.0  # no new requests before this time (Retry-After)
+        self.last_decrease = 0.0
+        self.ceiling = float(max_limit)  # limit at the last throttling response
+        self.ceiling_since = 0.0  # time of the last throttling, or ceiling recovery
+
+        self.cond = threading.Condition()
+
+        # statistics
+        self.n_requests = 0
+        self.n_throttled = 0
+
+    def acquire(self) -> float:
+        """Wait for a free slot, returns the start time of the request"""
+
+        with self.cond:
+            while True:
+                now = time.time()
+                if now < self.blocked_until:
+                    self.cond.wait(self.blocked_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self.cond.wait()
+                else:
+                    break
+
+            self.in_flight += 1
+            self.n_requests += 1
+            return time.time()
+
+    def release(self, start: float, status: int, retry_after: float = None) -> None:
+        """Free a slot and adapt the limit to the outcome of the request
+
+        start: start time returned by `acquire`
+        status: HTTP status code of the response (None: connection error)
+        retry_after: seconds to wait before new requests, as asked by the server
+        """
+
+        now = time.time()
+        latency = now - start
+
+        with self.cond:
+            self.in_flight -= 1
+
+            throttled = status in THROTTLE_STATUS_CODES
+            if throttled:
+                self.n_throttled += 1
+                if retry_after is not None:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+
+            if throttled or status is None or latency > self.target_latency:
+                # multiplicative decrease, once per round-trip: responses to
+                # requests sent before the last decrease do not count again
+                if start > self.last_decrease:
+                    if throttled:
+                        self.ceiling = self.limit
+                        self.ceiling_since = now
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+            else:
+                # no throttling for a while: the server may take more again
+                if now - self.ceiling_since > self.ceiling_recovery and self.ceiling < self.max_limit:
+                    self.ceiling += (self.max_limit - self.ceiling) / 2
+                    self.ceiling_since = now
+
+                # additive increase: about +1 per round-trip of `limit` requests,
+                # probing carefully above the limit the server throttled at
+                increase = 1.0 / self.limit
+                if self.limit >= self.ceiling - 1:
+                    increase /= PROBING_SLOWDOWN
+                self.limit = min(self.max_limit, self.limit + increase)
+
+            self.cond.notify_all()
+
+    def print_stats(self):
+        print("Rate limiter:")
+        print(f"    limit = {self.limit:.2f} ({self.min_limit}..{self.max_limit}), ceiling = {self.ceiling:.2f}")
+        print(f"    requests = {self.n_requests}, throttled = {self.n_throttled}")
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+if __name__ == "__main__":
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from http_client import make_session
+
+    SERVER_CAPACITY = 4  # max concurrent requests the stand-in server accepts
+    N_REQUESTS = 300
+    N_CLIENT_THREADS = 32
+
+    state = {"in_flight": 0, "served": 0, "throttled": 0}
+    state_lock = threading.Lock()
+
+    class ThrottlingHandler(BaseHTTPRequestHandler):
+        """Stand-in for Wikipedia: throttles clients exceeding its capacity"""
+
+        def do_GET(self):
+            with state_lock:
+                state["in_flight"] += 1
+                overloaded = state["in_flight"] > SERVER_CAPACITY
+
+            try:
+                if overloaded:
+                    with state_lock:
+                        state["throttled"] += 1
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.end_headers()
+                    return
+
+                time.sleep(random.uniform(0.02, 0.06))
+                body = b"<html><p>ok</p></html>"
+                with state_lock:
+                    state["served"] += 1
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with state_lock:
+                    state["in_flight"] -= 1
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/wiki/Test"
+
+    limiter = AdaptiveLimiter(
+        initial=16, min_limit=1, max_limit=32, target_latency=0.5
+    )
+    session = make_session(limiter=limiter, limited_hosts=("127.0.0.1",))
+
+    print(f"Sending {N_REQUESTS} requests from {N_CLIENT_THREADS} threads")
+    print(f"to a stand-in server with capacity {SERVER_CAPACITY}...")
+
+    start = time.time()
+    with ThreadPoolExecutor(N_CLIENT_THREADS) as pool:
+        statuses = list(pool.map(lambda _: session.get(url).status_code, range(N_REQUESTS)))
+    end = time.time()
+
+    print(f"Done in {end - start:.2f} seconds ({N_REQUESTS / (end - start):.1f} requests/s)")
+    print(f"    ok responses = {statuses.count(200)} / {N_REQUESTS}")
+    print(f"    throttled by server = {state['throttled']}")
+    limiter.print_stats()
+
+    server.shutdown()
@@ -8,6 +8,9 @@ import csv
 from word_selection import SelectionStrategy, select_link
 from dataset_collection import get_random_pages
 from extraction import extract_links_all
+from dao import get_memo_dao, OUTCOME_PHILOSOPHY, OUTCOME_CYCLE
+from optimal_hops import load_optimal_hops
+from random_walk import load_random_walk_hops
 from helpers import *
 from config import *
 
@@ -15,6 +18,8 @@ from config import *
 SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
 
 EMBEDDING_MODEL = None
+OPTIMAL_HOPS = None  # shortest hop counts to Philosophy (see optimal_hops.py)
+RANDOM_WALK = None  # exact outcome of the RANDOM strategy (see random_walk.py)
 
 
 def INIT_WORDNET():
@@ -70,9 +75,35 @@ def hop2phil(
 
     path = []
     cycle = False
+    rest = None  # distance of the known page the chain ended at
     N_TH_LINK = 1  # TODO: implement n-th link
 
+    # chains of deterministic strategies are memoized (see dao.py)
+    memo_dao = get_memo_dao() if selection_strat != SelectionStrategy.RANDOM else None
+    memo_i = N_TH_LINK + 1 if selection_strat == SelectionStrategy.NTH_LINK else 0
+    start_url = from_url
+
     for hop in range(MAX_HOPS):
+        # known page: splice in the rest of its chain
+        if memo_dao is not None:
+            memo = memo_dao.get_memo(from_url, selection_strat.name, memo_i)
+
+            if memo is not None and memo.outcome == OUTCOME_CYCLE and hop + memo.distance <= MAX_HOPS:
+                if debug_print:
+                    print(f"\tKnown page {from_url} leads to a cycle, terminating...")
+                cycle = True
+                rest = memo.distance
+                break
+
+            if memo is not None and memo.outcome == OUTCOME_PHILOSOPHY:
+                chain = memo_dao.memo_chain(from_url, selection_strat.name, memo_i)
+                if len(chain) == memo.distance:
+                    for m in chain[: MAX_HOPS - hop]:
+                        path.append(m.next_url)
+                        if debug_print:
+                            print(f"\t{len(path)}: {m.next_url} (memo)")
+                    break
+
         # get list of urls of links from starting article
         links = extract_links_all(from_url)
         words = [link[1] for link in links]
@@ -123,6 +154,11 @@ def hop2phil(
         # set url of next hop
         from_url = check_url(link_url)
 
+    # memoize the chain
+    if memo_dao is not None and path and (cycle or path[-1] == WIKI_URL_OF_PHILOSOPHY):
+        outcome = OUTCOME_CYCLE if cycle else OUTCOME_PHILOSOPHY
+        memo_dao.record_chain(selection_strat.name, memo_i, [start_url] + path, outcome, rest=rest)
+
     if not cycle:
         return path
     else:
@@ -212,12 +248,26 @@ def main():
         hoplen_nthlink = len(path_nthlink)
         hoplen_word2vec = len(path_word2vec)
         # hoplen_random = len(path_random)
+        hoplen_optimal = (
+            OPTIMAL_HOPS.hops_of_url(starter[1]) if OPTIMAL_HOPS is not None else None
+        )
+        random_walk = (
+            RANDOM_WALK.hops_of_url(starter[1]) if RANDOM_WALK is not None else None
+        )
+        hoplen_random_expected = random_walk[1] if random_walk is not None else None
 
+        if hoplen_optimal is not None:
+            print(f"Optimal: {hoplen_optimal} hops")
         print(f"WordNet: {hoplen_wordnet} hops")
         print(f"Embedding word2vec: {hoplen_word2vec} hops")
         # print(f"First link: {hoplen_nthlink} hops")
         print(f"Second link: {hoplen_nthlink} hops")
         # print(f"Random: {hoplen_random} hops")
+        if hoplen_random_expected is not None:
+            print(
+                f"Random (expected): {hoplen_random_expected:.2f} hops"
+                f" ({random_walk[0]:.1%} of walks reach Philosophy)"
+            )
 
         # record statistics to csv file
         # append to 'hop_stats.csv'
@@ -241,6 +291,12 @@ def main():
             # writer.writerow(
             #     [starter[0], starter[1], "RANDOM", hoplen_random]
             # ) if hoplen_random != 0 else None
+            writer.writerow(
+                [starter[0], starter[1], "OPTIMAL", hoplen_optimal]
+            ) if hoplen_optimal is not None else None
+            writer.writerow(
+                [starter[0], starter[1], "RANDOM_EXPECTED", hoplen_random_expected]
+            ) if hoplen_random_expected is not None else None
 
             print("Statistics recorded.")
 
@@ -251,6 +307,12 @@ if __name__ == "__main__":
     # NOTE: this takes a while to load (~30 seconds)
     EMBEDDING_MODEL = LOAD_WORD2VEC()
 
+    # shortest hop counts of every article, from a single search
+    OPTIMAL_HOPS = load_optimal_hops()
+
+    # expected hops of the RANDOM strategy, solved instead of sampled
+    RANDOM_WALK = load_random_walk_hops()
+
     # INIT_WORDNET()
 
     while True:
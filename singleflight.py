@@ -0,0 +1,65 @@
+""" singleflight.py
+
+    Request coalescing ("single flight"): when several
+    threads ask for the same key at the same time, only
+    the first one runs the call, the others wait for it
+    and share its result.
+
+    Used by the page fetch path, so parallel traversals
+    converging on the same hub article (Science, Knowledge,
+    ...) share a single download and parse.
+"""
+
+import threading
+
+
+class _Call:
+    """A call in flight"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls with the same key"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+        # number of calls served by another caller's call in flight
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)`, unless a call with `key` is already
+        in flight, in which case wait for it and return its result
+        (or raise its exception)."""
+
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.result
@@ -0,0 +1,284 @@
+""" stream_extraction.py
+
+    Streaming, early-terminating variant of the link
+    extraction of `extraction.py`.
+
+    `extract_links_from_html` parses the whole article and
+    cleans the whole tree before reading three paragraphs.
+    Here the html is tokenized incrementally (html.parser,
+    the tokenizer BeautifulSoup uses), skipping thumbnails,
+    tables and hatnotes as they stream by. Only the raw html
+    of each of the first paragraphs is parsed, with the same
+    per-paragraph rules as the reference extractor. The
+    tokenizer stops as soon as the last paragraph needed is
+    read (or enough links are found), so the time per hop no
+    longer grows with the length of the article.
+
+    The result is the same as `extract_links_from_html`.
+    When the shortcut does not apply (no link in the first
+    paragraphs, fewer than three paragraphs in the first
+    article container, malformed nesting), the article is
+    handed over to the reference extractor.
+
+    Running this file compares both extractors on test.html.
+"""
+
+from html.parser import HTMLParser
+
+from bs4.builder import HTMLTreeBuilder
+
+from extraction import (
+    MAX_PARAGRAPHS,
+    clean_soup,
+    paragraph_links,
+    link_tuples,
+    extract_links_from_html,
+)
+
+# size of the chunks fed to the tokenizer
+CHUNK_SIZE = 8192
+
+# classes of the article containers paragraphs are read from
+CONTAINER_CLASSES = ("mw-parser-output", "mw-body-content", "vector-body")
+
+# elements without an end tag (as treated by BeautifulSoup)
+VOID_ELEMENTS = (
+    getattr(HTMLTreeBuilder, "DEFAULT_EMPTY_ELEMENT_TAGS", None)
+    or HTMLTreeBuilder.empty_element_tags
+)
+
+
+class _Done(Exception):
+    """All the paragraphs needed are read"""
+
+
+class _Fallback(Exception):
+    """The article needs the reference extractor"""
+
+
+# =============================================================================
+# LEAD SCANNER
+# =============================================================================
+
+
+class _LeadScanner(HTMLParser):
+    """Tokenizes an article until its first paragraphs are read
+
+    The stack of open elements follows BeautifulSoup's tree building
+    (end tags close every element opened after the matching start tag),
+    so the paragraphs found are the ones the reference extractor reads.
+    """
+
+    def __init__(self, data: str, limit: int = None):
+        super().__init__(convert_charrefs=False)
+
+        self.data = data
+        self.limit = limit
+
+        self.line_starts = [0]  # offset of each line fed so far
+        self.n_fed = 0
+
+        self.stack = []  # open elements: [tag, kind]
+        self.n_excluded = 0  # open elements removed by the cleanup
+        self.in_container = False  # inside the first article container
+        self.p_start = None  # offset of the paragraph being read
+
+        self.paragraphs = []  # paragraphs read so far (parsed)
+        self.links = []  # anchor tags found so far
+
+    def scan(self) -> None:
+        """Feed the html chunk by chunk until the paragraphs are read"""
+
+        try:
+            for i in range(0, len(self.data), CHUNK_SIZE):
+                self._feed_chunk(self.data[i : i + CHUNK_SIZE])
+            self.close()
+        except _Done:
+            return
+
+        # end of the article before the paragraphs were read
+        raise _Fallback()
+
+    def _feed_chunk(self, chunk: str) -> None:
+        pos = chunk.find("\n")
+        while pos != -1:
+            self.line_starts.append(self.n_fed + pos + 1)
+            pos = chunk.find("\n", pos + 1)
+        self.n_fed += len(chunk)
+
+        self.feed(chunk)
+
+    def _offset(self) -> int:
+        """Offset in the html of the tag being handled"""
+        line, col = self.getpos()
+        return self.line_starts[line - 1] + col
+
+    # ====================================================================================
+    # EVENTS
+    # ====================================================================================
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            return
+
+        classes = (dict(attrs).get("class") or "").split()
+        kind = None
+
+        if self.n_excluded == 0:
+            if tag == "table" or (
+                tag == "div" and ("thumb" in classes or "hatnote" in classes)
+            ):
+                kind = "excluded"
+                self.n_excluded += 1
+
+            elif tag == "div" and any(c in CONTAINER_CLASSES for c in classes):
+                if not self.in_container:
+                    kind = "container"
+                    self.in_container = True
+
+            elif tag == "p" and self.in_container:
+                if self.p_start is not None:
+                    # nested paragraphs are read twice by the reference
+                    raise _Fallback()
+                kind = "p"
+                self.p_start = self._offset()
+
+        self.stack.append([tag, kind])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                break
+        else:
+            # no such element open: ignored
+            return
+
+        start = self._offset()
+        end = self.data.find(">", start) + 1
+
+        # elements opened after the matching one are closed where this tag starts
+        while len(self.stack) > i + 1:
+            self._close(self.stack.pop()[1], start)
+        self._close(self.stack.pop()[1], end)
+
+    def _close(self, kind: str, end: int) -> None:
+        if kind == "excluded":
+            self.n_excluded -= 1
+
+        elif kind == "container":
+            # the reference would read paragraphs of the next containers
+            raise _Fallback()
+
+        elif kind == "p":
+            paragraph = clean_soup(self.data[self.p_start : end]).find("p")
+            self.paragraphs.append(paragraph)
+            self.links += paragraph_links(paragraph)
+            self.p_start = None
+
+            if len(self.paragraphs) >= MAX_PARAGRAPHS:
+                raise _Done()
+
+            if self.limit is not None and self._first_links_settled():
+                raise _Done()
+
+    def _first_links_settled(self) -> bool:
+        """Check if the first `limit` links can no longer change
+
+        The post-processing drops "wikipedia:" links, and a later duplicate
+        can drop an earlier one, so only links found before any of them are
+        settled.
+        """
+
+        if len(self.links) < self.limit:
+            return False
+
+        return not any(
+            "wikipedia:" in a["href"].lower() for a in self.links[: self.limit]
+        )
+
+
+# =============================================================================
+# EXTRACTION
+# =============================================================================
+
+
+def stream_links_from_html(data: str, limit: int = None) -> list:
+    """
+    Extract the links of a Wikipedia article like `extract_links_from_html`,
+    reading only the beginning of the html
+    data: html of the Wikipedia article
+    limit: stop once this many links are found (None: all links of the
+           first paragraphs)
+    """
+
+    scanner = _LeadScanner(data, limit)
+
+    try:
+        scanner.scan()
+    except _Fallback:
+        links = extract_links_from_html(data)
+    else:
+        if len(scanner.links) == 0:
+            # no links in the first paragraphs: the reference looks further
+            links = extract_links_from_html(data)
+        else:
+            links = link_tuples(scanner.links)
+
+    if limit is not None and isinstance(links, list):
+        links = links[:limit]
+
+    return links
+
+
+def stream_paragraphs(data: str) -> list:
+    """
+    Return the first paragraphs of a Wikipedia article (parsed), the
+    ones `extract_links_from_html` reads, without parsing the whole html
+    (None if the article needs the reference extractor)
+    """
+
+    scanner = _LeadScanner(data)
+
+    try:
+        scanner.scan()
+    except _Fallback:
+        return None
+
+    return scanner.paragraphs
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    with open("test.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    n_runs = 20
+
+    start = time.time()
+    for _ in range(n_runs):
+        reference = extract_links_from_html(html)
+    reference_time = (time.time() - start) / n_runs
+
+    start = time.time()
+    for _ in range(n_runs):
+        streamed = stream_links_from_html(html)
+    stream_time = (time.time() - start) / n_runs
+
+    print("Extracting links from test.html")
+    print(f"    reference = {reference_time * 1000:.1f} ms")
+    print(f"    streaming = {stream_time * 1000:.1f} ms")
+    print(f"    same links = {streamed == reference}")
+    print(f"    first 3 links = {stream_links_from_html(html, limit=3)}")
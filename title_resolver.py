@@ -0,0 +1,217 @@
+""" title_resolver.py
+
+    Persistent title -> pageid resolution table.
+
+    Resolving a title (or url) to its pageid, canonical
+    url and language used to cost an API round-trip per
+    lookup. The results are now recorded in an SQLite table,
+    including title normalisation and redirects, so repeated
+    lookups are answered locally. Misses are resolved in
+    batches of up to 50 titles per API call.
+"""
+
+import collections
+import sqlite3
+import threading
+
+from config import WIKIPEDIA_API_BASE_URL, TITLE_RESOLUTION_DB_PATH
+from helpers import normalize_title
+from http_client import get_session
+from wiki_api import MAX_PAGES_PER_QUERY
+
+# resolved article: pageid, canonical title, url, language and latest revision
+Resolution = collections.namedtuple(
+    "Resolution", ["title", "pageid", "canonical_title", "fullurl", "lang", "lastrevid"]
+)
+
+_RESOLVER = None
+_RESOLVER_LOCK = threading.Lock()
+
+
+# =============================================================================
+# RESOLVER
+# =============================================================================
+
+
+class TitleResolver:
+    """Persistent cache of title resolutions"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.c = self.conn.cursor()
+
+        self.create_db()
+
+        # statistics of this process
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+
+    def close(self):
+        self.conn.close()
+
+    def create_db(self):
+        # pageid is NULL for titles that do not exist
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS title_resolution (
+            title TEXT PRIMARY KEY,
+            pageid INTEGER,
+            canonical_title TEXT,
+            fullurl TEXT,
+            lang TEXT,
+            lastrevid INTEGER
+        )"""
+        )
+        self.conn.commit()
+
+    # ====================================================================================
+    # RESOLVING
+    # ====================================================================================
+
+    def resolve(self, title: str, session=None) -> Resolution:
+        """Resolve one title or url (None if the article does not exist)"""
+
+        return self.resolve_many([title], session)[normalize_title(title)]
+
+    def resolve_many(self, titles: list, session=None) -> dict:
+        """Resolve titles or urls, asking the API only for unknown ones
+
+        Returns:
+            resolutions (dict): normalized title -> Resolution
+                                (None if the article does not exist)
+        """
+
+        keys = list(dict.fromkeys(normalize_title(t) for t in titles))
+
+        resolutions = {}
+        unknown = []
+        for key in keys:
+            row = self._lookup(key)
+            if row is None:
+                unknown.append(key)
+            else:
+                resolutions[key] = row
+
+        self.hits += len(resolutions)
+        self.misses += len(unknown)
+
+        for i in range(0, len(unknown), MAX_PAGES_PER_QUERY):
+            resolutions.update(
+                self._query(unknown[i : i + MAX_PAGES_PER_QUERY], session)
+            )
+
+        return {key: self._to_resolution(key, resolutions[key]) for key in keys}
+
+    def known(self, title: str) -> Resolution:
+        """Return the recorded resolution of a title or url, without asking
+        the API (None if it is not recorded, or does not exist)"""
+
+        key = normalize_title(title)
+        return self._to_resolution(key, self._lookup(key))
+
+    def _lookup(self, key: str) -> tuple:
+        with self.lock:
+            self.c.execute(
+                "SELECT pageid, canonical_title, fullurl, lang, lastrevid FROM title_resolution WHERE title = ?",
+                (key,),
+            )
+            return self.c.fetchone()
+
+    def _to_resolution(self, key: str, row: tuple) -> Resolution:
+        if row is None or row[0] is None:
+            return None
+        return Resolution(key, *row)
+
+    def _query(self, keys: list, session=None) -> dict:
+        """Resolve up to 50 titles with one API call and record the results"""
+
+        S = session if session is not None else get_session()
+
+        PARAMS = {
+            "action": "query",
+            "format": "json",
+            "formatversion": "2",
+            "redirects": "1",
+            "prop": "info",
+            "inprop": "url",
+            "titles": "|".join(keys),
+        }
+        R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
+        DATA = R.json()["query"]
+        self.api_calls += 1
+
+        # title the API used for each of our titles (normalisation, then redirect)
+        normalized = {n["from"]: n["to"] for n in DATA.get("normalized", [])}
+        redirects = {r["from"]: r["to"] for r in DATA.get("redirects", [])}
+        pages = {p["title"]: p for p in DATA.get("pages", [])}
+
+        rows = {}
+        for key in keys:
+            title = normalized.get(key, key)
+            title = redirects.get(title, title)
+            page = pages.get(title)
+
+            if page is None or page.get("missing") or page.get("invalid"):
+                rows[key] = (None, None, None, None, None)
+                continue
+
+            rows[key] = (
+                page["pageid"],
+                page["title"],
+                page.get("fullurl"),
+                page.get("pagelanguage"),
+                page.get("lastrevid"),
+            )
+
+        with self.lock:
+            self.c.executemany(
+                "INSERT OR REPLACE INTO title_resolution (title, pageid, canonical_title, fullurl, lang, lastrevid) VALUES (?, ?, ?, ?, ?, ?)",
+                [(key,) + row for key, row in rows.items()],
+            )
+            self.conn.commit()
+
+        return rows
+
+    def forget(self, title: str) -> None:
+        """Drop the recorded resolution of a title (e.g. after a page move)"""
+
+        with self.lock:
+            self.c.execute(
+                "DELETE FROM title_resolution WHERE title = ?", (normalize_title(title),)
+            )
+            self.conn.commit()
+
+    def print_stats(self):
+        print("Title resolver:")
+        print(f"    path = {self.db_path}")
+        print(f"    hits = {self.hits}, misses = {self.misses}, api calls = {self.api_calls}")
+
+
+# =============================================================================
+# SHARED RESOLVER
+# =============================================================================
+
+
+def get_resolver() -> TitleResolver:
+    """Return the shared resolver of this process"""
+
+    global _RESOLVER
+
+    if _RESOLVER is None:
+        with _RESOLVER_LOCK:
+            if _RESOLVER is None:
+                _RESOLVER = TitleResolver(TITLE_RESOLUTION_DB_PATH)
+
+    return _RESOLVER
+
+
+def resolve_title(title: str, session=None) -> Resolution:
+    """Resolve a title or url with the shared resolver (None if it does not exist)"""
+    return get_resolver().resolve(title, session)
+
+
+def resolve_titles(titles: list, session=None) -> dict:
+    """Resolve many titles or urls with the shared resolver, 50 per API call"""
+    return get_resolver().resolve_many(titles, session)
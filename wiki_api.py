@@ -0,0 +1,94 @@
+""" wiki_api.py
+
+    Batched MediaWiki API queries.
+
+    The API accepts up to 50 titles or pageids per query,
+    and can generate the pages of a query itself (e.g.
+    `generator=random`), returning their info in the same
+    response. Using both, sampling 500 random articles
+    with their urls takes 10 requests instead of 501.
+"""
+
+from config import WIKIPEDIA_API_BASE_URL
+from http_client import get_session
+
+# max number of titles/pageids per API query (API limit for regular users)
+MAX_PAGES_PER_QUERY = 50
+
+
+def _chunks(l: list, size: int):
+    for i in range(0, len(l), size):
+        yield l[i : i + size]
+
+
+# =============================================================================
+# PAGE INFO
+# =============================================================================
+
+
+def get_page_infos(pageids: list, session=None) -> dict:
+    """Get info (title, fullurl, pagelanguage, ...) of many pages
+
+    Args:
+        pageids (list): pageids of the pages
+        session: requests session (optional)
+
+    Returns:
+        infos (dict): pageid (str) -> page info dict
+    """
+
+    S = session if session is not None else get_session()
+
+    infos = {}
+    for chunk in _chunks([str(p) for p in pageids], MAX_PAGES_PER_QUERY):
+        PARAMS = {
+            "action": "query",
+            "format": "json",
+            "prop": "info",
+            "inprop": "url",
+            "pageids": "|".join(chunk),
+        }
+        R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
+        DATA = R.json()
+
+        infos.update(DATA["query"]["pages"])
+
+    return infos
+
+
+def get_random_page_infos(n: int, session=None) -> list:
+    """Get info of `n` random main namespace pages
+
+    Random pages are generated by the API itself (generator=random),
+    `MAX_PAGES_PER_QUERY` at a time, with their info in the same response.
+
+    Returns:
+        infos (list): list of page info dicts (no duplicates)
+    """
+
+    S = session if session is not None else get_session()
+
+    infos = {}
+    max_queries = 2 * (n // MAX_PAGES_PER_QUERY + 1)  # allow for duplicates
+
+    for _ in range(max_queries):
+        if len(infos) >= n:
+            break
+
+        PARAMS = {
+            "action": "query",
+            "format": "json",
+            "generator": "random",
+            "grnnamespace": "0",
+            "grnlimit": str(min(MAX_PAGES_PER_QUERY, n - len(infos))),
+            "prop": "info",
+            "inprop": "url",
+        }
+        R = S.get(url=WIKIPEDIA_API_BASE_URL, params=PARAMS)
+        DATA = R.json()
+
+        for pageid, info in DATA["query"]["pages"].items():
+            if len(infos) < n:
+                infos[pageid] = info
+
+    return list(infos.values())
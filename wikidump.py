@@ -0,0 +1,550 @@
+""" wikidump.py
+
+    Offline Wikipedia dump backend. Streams a local
+    Wikipedia dump, indexes its articles by title and
+    pageid in an SQLite database and serves the HTML
+    of an article from disk, so the link extraction in
+    `extraction.py` can run without any network access.
+
+    Supported dumps:
+        - XML dumps (`*-pages-articles*.xml.bz2` or `.xml`).
+          The wikitext is converted to a minimal HTML
+          document holding the prose paragraphs of the
+          article, which is enough for the lead-link rules.
+        - HTML dumps (Wikimedia Enterprise `*.ndjson` files,
+          or `*.tar.gz` archives of them). The rendered
+          article HTML is stored as is.
+
+    With `STORE_LEAD_FRAGMENTS` (config.py), only the
+    compressed lead fragment of each article is indexed
+    (see lead_fragment.py).
+
+    Usage:
+        python wikidump.py <dump file> [<index db>]
+
+    Tested with Python 3.10.7
+"""
+
+import bz2
+import json
+import os
+import re
+import sqlite3
+import sys
+import tarfile
+import threading
+import xml.etree.ElementTree as ET
+from html import escape, unescape
+from urllib.parse import quote
+
+import tqdm
+
+from config import DEFAULT_DUMP_DB_NAME, STORE_LEAD_FRAGMENTS
+from helpers import normalize_title
+from lead_fragment import encode_lead, decode_fragment
+
+# main namespace (articles)
+MAIN_NAMESPACE = 0
+
+# max number of redirects followed when looking up a title
+MAX_REDIRECTS = 5
+
+# namespaces whose links are not rendered when converting wikitext
+SKIPPED_LINK_NAMESPACES = ("file", "image", "category", "media")
+
+# interwiki prefixes of the sister projects: MediaWiki renders their
+# links as external links, never as /wiki/ links
+INTERWIKI_PREFIXES = frozenset(
+    """
+    b c commons d foundation m mediawikiwiki meta metawikimedia mw n phab q s
+    species voy w wikibooks wikidata wikimedia wikinews wikiquote wikisource
+    wikispecies wikiversity wikivoyage wikt wiktionary wmf v
+    """.split()
+)
+
+# language prefixes of the other Wikipedias: interlanguage links
+# ([[de:Foo]]) are not rendered in the text, inline ones ([[:de:Foo]])
+# are external links
+LANGUAGE_PREFIXES = frozenset(
+    """
+    aa ab ace ady af ak als alt am an ang ar arc ary arz as ast atj av avk awa
+    ay az azb ba ban bar bat-smg bcl be be-tarask be-x-old bg bh bi bjn bm bn
+    bo bpy br bs bug bxr ca cbk-zam cdo ce ceb ch cho chr chy ckb co cr crh cs
+    csb cu cv cy da de din diq dsb dty dv dz ee el eml eo es et eu ext fa ff fi
+    fiu-vro fj fo fr frp frr fur fy ga gag gan gcr gd gl glk gn gom gor got gu
+    gv ha hak haw he hi hif ho hr hsb ht hu hy hyw hz ia id ie ig ii ik ilo inh
+    io is it iu ja jam jbo jv ka kaa kab kbd kbp kg ki kj kk kl km kn ko koi kr
+    krc ks ksh ku kv kw ky la lad lb lbe lez lfn lg li lij lld lmo ln lo lrc lt
+    ltg lv mad mai map-bms mdf mg mh mhr mi min mk ml mn mni mnw mr mrj ms mt
+    mus mwl my myv mzn na nah nap nds nds-nl ne new ng nia nl nn no nov nqo nrm
+    nso nv ny oc olo om or os pa pag pam pap pcd pdc pfl pi pih pl pms pnb pnt
+    ps pt qu rm rmy rn ro roa-rup roa-tara ru rue rw sa sah sat sc scn sco sd se
+    sg sh shn si simple sk skr sl sm smn sn so sq sr srn ss st stq su sv sw szl
+    szy ta tay tcy te tet tg th ti tk tl tn to tpi tr trv ts tt tum tw ty tyv
+    udm ug uk ur uz ve vec vep vi vls vo wa war wo wuu xal xh xmf yi yo za zea
+    zh zh-classical zh-min-nan zh-yue zu
+    """.split()
+)
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def title_to_href(title: str) -> str:
+    """Convert a title to a '/wiki/...' href as rendered by MediaWiki"""
+
+    title = normalize_title(title).replace(" ", "_")
+
+    # MediaWiki leaves these characters unencoded in article urls
+    return "/wiki/" + quote(title, safe=";@$!*(),/~:")
+
+
+def _strip_nested(text: str, opener: str, closer: str) -> str:
+    """Remove (possibly nested) `opener ... closer` blocks from text"""
+
+    out = []
+    depth = 0
+    i = 0
+    n = len(text)
+
+    while i < n:
+        if text.startswith(opener, i):
+            depth += 1
+            i += len(opener)
+        elif depth > 0 and text.startswith(closer, i):
+            depth -= 1
+            i += len(closer)
+        else:
+            if depth == 0:
+                out.append(text[i])
+            i += 1
+
+    return "".join(out)
+
+
+def _strip_file_links(text: str) -> str:
+    """Remove embedded [[File:...]] style links, which may contain nested links
+
+    Links with a leading colon ([[:Category:Foo|label]]) are not embedded:
+    they are rendered inline, like other links.
+    """
+
+    out = []
+    i = 0
+    n = len(text)
+
+    while i < n:
+        if text.startswith("[[", i):
+            target = text[i + 2 : i + 2 + 12].lstrip().lower()
+            if target.startswith(tuple(ns + ":" for ns in SKIPPED_LINK_NAMESPACES)):
+                # skip until the matching closing brackets
+                depth = 0
+                while i < n:
+                    if text.startswith("[[", i):
+                        depth += 1
+                        i += 2
+                    elif text.startswith("]]", i):
+                        depth -= 1
+                        i += 2
+                        if depth == 0:
+                            break
+                    else:
+                        i += 1
+                continue
+
+        out.append(text[i])
+        i += 1
+
+    return "".join(out)
+
+
+def _interwiki_prefix(target: str) -> str:
+    """Return the interwiki or language prefix of a link target (None if none)"""
+
+    prefix, colon, _ = target.partition(":")
+    prefix = prefix.strip().lower()
+
+    if colon and (prefix in INTERWIKI_PREFIXES or prefix in LANGUAGE_PREFIXES):
+        return prefix
+
+    return None
+
+
+def _render_link(match) -> str:
+    target = match.group(1).strip()
+    label = match.group(2)
+    trail = match.group(3) or ""
+
+    inline = target.startswith(":")
+    if label is None:
+        label = target.lstrip(":")
+    label = escape(unescape(label.strip() + trail), quote=False)
+
+    target = unescape(target.lstrip(":"))
+    if target == "" or target.startswith("#"):
+        return label
+
+    # links to other wikis are not article links
+    prefix = _interwiki_prefix(target)
+    if prefix is not None:
+        if prefix in LANGUAGE_PREFIXES and prefix not in INTERWIKI_PREFIXES and not inline:
+            return ""
+        return label
+
+    title, _, fragment = target.partition("#")
+    href = title_to_href(title)
+    if fragment.strip():
+        href += "#" + quote(fragment.strip().replace(" ", "_"), safe=";@$!*(),/~:.")
+
+    return f'<a href="{escape(href)}" title="{escape(normalize_title(title))}">{label}</a>'
+
+
+def wikitext_to_html(wikitext: str) -> str:
+    """Convert the wikitext of an article to a minimal HTML document
+
+    Only the prose paragraphs are kept: templates, tables, files,
+    references, headings and lists are dropped. Internal links are
+    rendered as anchors the same way MediaWiki renders them.
+    """
+
+    text = re.sub(r"<!--.*?-->", "", wikitext, flags=re.S)
+    text = re.sub(r"<ref[^>]*/>", "", text)
+    text = re.sub(r"<ref[^>]*>.*?</ref>", "", text, flags=re.S)
+    text = _strip_nested(text, "{{", "}}")
+    text = _strip_nested(text, "{|", "|}")
+    text = _strip_file_links(text)
+
+    ### split into paragraphs
+
+    paragraphs = []
+    current = []
+    for line in text.split("\n"):
+        stripped = line.strip()
+
+        if stripped == "" or stripped.startswith(("=", "*", "#", ":", ";", "|", "!", "__")):
+            if current:
+                paragraphs.append(" ".join(current))
+                current = []
+            continue
+
+        current.append(stripped)
+
+    if current:
+        paragraphs.append(" ".join(current))
+
+    ### render paragraphs
+
+    html_paragraphs = []
+    for paragraph in paragraphs:
+        # drop leftover html tags (keep their contents)
+        paragraph = re.sub(r"</?[a-zA-Z][^>]*>", "", paragraph)
+        # bold and italics
+        paragraph = re.sub(r"'{2,}", "", paragraph)
+        # external links [http://... label]
+        paragraph = re.sub(r"\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]", r"\1", paragraph)
+        # internal links [[target|label]]trail
+        paragraph = re.sub(
+            r"\[\[([^\]\|]*)(?:\|([^\]]*))?\]\]([a-z]+)?", _render_link, paragraph
+        )
+
+        if paragraph.strip() == "":
+            continue
+
+        html_paragraphs.append(f"<p>{paragraph}</p>")
+
+    return '<div class="mw-parser-output">' + "\n".join(html_paragraphs) + "</div>"
+
+
+# =============================================================================
+# DUMP READERS
+# =============================================================================
+
+
+def _local_name(tag: str) -> str:
+    """Strip the xml namespace of a tag"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_xml_dump(dump_path: str):
+    """Stream (pageid, title, redirect, html) tuples from an XML dump"""
+
+    opener = bz2.open if dump_path.endswith(".bz2") else open
+
+    with opener(dump_path, "rb") as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+
+        for event, elem in context:
+            if event != "end" or _local_name(elem.tag) != "page":
+                continue
+
+            fields = {}
+            redirect = None
+            for child in elem.iter():
+                name = _local_name(child.tag)
+                if name == "redirect":
+                    redirect = child.get("title")
+                elif name in ("title", "ns", "text") or (name == "id" and "id" not in fields):
+                    fields.setdefault(name, child.text)
+
+            if int(fields.get("ns") or -1) == MAIN_NAMESPACE:
+                html = None
+                if redirect is None:
+                    html = wikitext_to_html(fields.get("text") or "")
+                yield (int(fields["id"]), fields["title"], redirect, html)
+
+            # free memory of already processed pages
+            elem.clear()
+            root.clear()
+
+
+def _iter_ndjson_lines(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+
+        article = json.loads(line)
+
+        namespace = article.get("namespace", {}).get("identifier", MAIN_NAMESPACE)
+        if namespace != MAIN_NAMESPACE:
+            continue
+
+        html = article.get("article_body", {}).get("html")
+        if html is None:
+            continue
+
+        yield (int(article["identifier"]), article["name"], None, html)
+
+
+def iter_html_dump(dump_path: str):
+    """Stream (pageid, title, redirect, html) tuples from an HTML dump"""
+
+    if dump_path.endswith((".tar.gz", ".tgz")):
+        with tarfile.open(dump_path, "r|gz") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                f = tar.extractfile(member)
+                yield from _iter_ndjson_lines(f)
+        return
+
+    with open(dump_path, "rb") as f:
+        yield from _iter_ndjson_lines(f)
+
+
+def iter_dump(dump_path: str):
+    """Stream (pageid, title, redirect, html) tuples from any supported dump"""
+
+    if dump_path.endswith((".xml", ".xml.bz2")):
+        return iter_xml_dump(dump_path)
+
+    if dump_path.endswith((".ndjson", ".json", ".tar.gz", ".tgz")):
+        return iter_html_dump(dump_path)
+
+    raise ValueError(f"Unsupported dump format: {dump_path}")
+
+
+def _html_of_row(html: str, fragment: bytes) -> str:
+    """html of an indexed article, stored in full or as a lead fragment"""
+    return html if html is not None else decode_fragment(fragment)
+
+
+# =============================================================================
+# DUMP INDEX
+# =============================================================================
+
+
+class WikiDump:
+    """Articles of a Wikipedia dump, indexed by title and pageid"""
+
+    def __init__(self, db_path: str, lead_only: bool = STORE_LEAD_FRAGMENTS):
+        """
+        db_path: path of the SQLite database
+        lead_only: index compressed lead fragments instead of the full html
+        """
+
+        self.db_path = db_path
+        self.lead_only = lead_only
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.c = self.conn.cursor()
+
+        self.create_db()
+
+    def close(self):
+        self.conn.close()
+
+    def create_db(self):
+        self.c.execute(
+            """CREATE TABLE IF NOT EXISTS dump_pages (
+            pageid INTEGER PRIMARY KEY,
+            title TEXT,
+            redirect TEXT,
+            html TEXT,
+            fragment BLOB
+        )"""
+        )
+
+        # add the fragment column to indexes created before it existed
+        self.c.execute("PRAGMA table_info(dump_pages)")
+        if "fragment" not in [row[1] for row in self.c.fetchall()]:
+            self.c.execute("ALTER TABLE dump_pages ADD COLUMN fragment BLOB")
+
+        self.c.execute(
+            "CREATE INDEX IF NOT EXISTS dump_pages_title ON dump_pages (title)"
+        )
+        self.conn.commit()
+
+    # ====================================================================================
+    # BUILDING
+    # ====================================================================================
+
+    def build(self, dump_path: str, limit: int = None) -> int:
+        """Index the articles and redirects of a dump file, returns the number
+        of articles added (redirects excluded)
+
+        limit: max number of articles indexed
+        """
+
+        print(f"Indexing dump {dump_path} into {self.db_path}...")
+
+        n_articles = 0
+        n_redirects = 0
+        batch = []
+        for pageid, title, redirect, html in tqdm.tqdm(iter_dump(dump_path)):
+            fragment = None
+            if self.lead_only and html is not None:
+                fragment = encode_lead(html)
+                html = None
+
+            batch.append(
+                (
+                    pageid,
+                    normalize_title(title),
+                    normalize_title(redirect) if redirect else None,
+                    html,
+                    fragment,
+                )
+            )
+
+            if redirect:
+                n_redirects += 1
+            else:
+                n_articles += 1
+
+            if len(batch) >= 1000:
+                self._insert(batch)
+                batch = []
+
+            if limit is not None and n_articles >= limit:
+                break
+
+        self._insert(batch)
+
+        print(f"Done. Indexed {n_articles} articles and {n_redirects} redirects")
+        return n_articles
+
+    def _insert(self, batch: list) -> int:
+        self.c.executemany(
+            "INSERT OR REPLACE INTO dump_pages (pageid, title, redirect, html, fragment) VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+        self.conn.commit()
+        return len(batch)
+
+    # ====================================================================================
+    # GETTERS
+    # ====================================================================================
+
+    def get_by_title(self, title: str) -> tuple:
+        """Return (pageid, title, html) of an article, following redirects"""
+
+        title = normalize_title(title)
+
+        for _ in range(MAX_REDIRECTS + 1):
+            with self.lock:
+                self.c.execute(
+                    "SELECT pageid, title, redirect, html, fragment FROM dump_pages WHERE title = ?",
+                    (title,),
+                )
+                result = self.c.fetchone()
+            if result is None:
+                return None
+
+            if result[2] is None:
+                return (result[0], result[1], _html_of_row(result[3], result[4]))
+
+            title = result[2]
+
+        return None
+
+    def get_by_pageid(self, pageid: int) -> tuple:
+        """Return (pageid, title, html) of an article, following redirects"""
+
+        with self.lock:
+            self.c.execute(
+                "SELECT pageid, title, redirect, html, fragment FROM dump_pages WHERE pageid = ?",
+                (int(pageid),),
+            )
+            result = self.c.fetchone()
+        if result is None:
+            return None
+
+        if result[2] is not None:
+            return self.get_by_title(result[2])
+
+        return (result[0], result[1], _html_of_row(result[3], result[4]))
+
+    def html_of(self, page_url: str) -> str:
+        """Return the HTML of the article behind a url (None if not in the dump)"""
+
+        page = self.get_by_title(page_url)
+        if page is None:
+            return None
+
+        return page[2]
+
+    def iter_articles(self):
+        """Iterate (pageid, title, html) of all articles (redirects excluded)"""
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT pageid, title, html, fragment FROM dump_pages WHERE redirect IS NULL ORDER BY pageid"
+        )
+        for pageid, title, html, fragment in cursor:
+            yield (pageid, title, _html_of_row(html, fragment))
+
+    def iter_redirects(self):
+        """Iterate (title, target title) of all redirects"""
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT title, redirect FROM dump_pages WHERE redirect IS NOT NULL"
+        )
+        for row in cursor:
+            yield row
+
+    def count(self) -> int:
+        self.c.execute("SELECT COUNT(*) FROM dump_pages WHERE redirect IS NULL")
+        return self.c.fetchone()[0]
+
+
+# =============================================================================
+# SCRIPT RUNNER
+# =============================================================================
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python wikidump.py <dump file> [<index db>]")
+        sys.exit(1)
+
+    dump_file = sys.argv[1]
+    db_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DUMP_DB_NAME
+
+    if not os.path.exists(dump_file):
+        print(f"Dump file not found: {dump_file}")
+        sys.exit(1)
+
+    WikiDump(db_file).build(dump_file)
@@ -4,11 +4,11 @@
 
 import numpy as np
 import pandas as pd
-import requests
 import csv
 
 from difflib import SequenceMatcher
 from helpers import *
+from http_client import get_session
 
 tsv_path = "word_concreteness/Concreteness_ratings_Brysbaert_et_al_BRM_processed.txt"
 
@@ -57,7 +57,7 @@ def get_wiki_contents(wiki_url):
     # https://en.wikipedia.org/w/api.php?action=query&prop=extracts&exsentences=10&exlimit=1&titles=Pet_door&explaintext=1&formatversion=2
 
     wiki_url = reduce_full_url(encode_fix(wiki_url))
-    r = requests.get(
+    r = get_session().get(
         url=WIKIPEDIA_API_BASE_URL,
         params={
             "action": "query",